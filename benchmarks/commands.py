@@ -0,0 +1,140 @@
+import argparse
+import csv
+import json
+import sys
+from os.path import dirname, join
+from tempfile import TemporaryDirectory
+
+from click.testing import CliRunner
+
+from benchmarks.fake_server import FakeCluster, FakeServer, FakeServerOptions
+from tarentula.cli import cli
+
+BASELINE_FILE = join(dirname(__file__), 'baseline.json')
+SCENARIOS = ('download', 'download-async', 'export-by-query', 'export-by-query-slices', 'tagging')
+# A scenario is slower than its baseline when it runs this much fewer documents per second
+TOLERANCE = 0.2
+
+
+def scenario_arguments(scenario, server, directory, page_size):
+    elasticsearch = ['--datashare-url', server.url, '--elasticsearch-url', server.url, '--size', str(page_size)]
+    if scenario == 'download':
+        return ['download', '--destination-directory', join(directory, 'files'), *elasticsearch]
+    if scenario == 'download-async':
+        return ['download', '--destination-directory', join(directory, 'files'), '--async', *elasticsearch]
+    if scenario == 'export-by-query':
+        return ['export-by-query', '--output-file', join(directory, 'documents.csv'), *elasticsearch]
+    if scenario == 'export-by-query-slices':
+        return ['export-by-query', '--output-file', join(directory, 'documents.csv'), '--slices', '4',
+                *elasticsearch]
+    tags_file = join(directory, 'tags.csv')
+    with open(tags_file, 'w', newline='', encoding='utf-8') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['tag', 'documentId'])
+        for position in range(len(server.server.cluster.hits)):
+            writer.writerow(['benchmark', f'{position:020d}'])
+    return ['tagging', tags_file, '--datashare-url', server.url]
+
+
+def page_latency(scenario, latencies):
+    # Tagging sends one request per document, the other commands one per page of results
+    page_endpoint = 'tags' if scenario == 'tagging' else '_search'
+    pages = [endpoint for endpoint in latencies if page_endpoint in endpoint]
+    if not pages:
+        return None, None
+    endpoint = max(pages, key=lambda name: latencies[name]['count'])
+    return latencies[endpoint]['p50'], latencies[endpoint]['p99']
+
+
+def run_scenario(scenario, server, page_size):
+    with TemporaryDirectory() as directory:
+        metrics_file = join(directory, 'metrics.json')
+        arguments = [*scenario_arguments(scenario, server, directory, page_size),
+                     '--datashare-project', server.server.cluster.index, '--no-progressbar',
+                     '--bootstrap-cache-ttl', '0',
+                     '--metrics-file', metrics_file, '--no-metrics-summary']
+        result = CliRunner().invoke(cli, arguments, catch_exceptions=False)
+        if result.exit_code != 0:
+            raise RuntimeError(f'{scenario} failed with exit code {result.exit_code}: {result.output}')
+        with open(metrics_file, encoding='utf-8') as json_file:
+            snapshot = json.load(json_file)
+    p50, p99 = page_latency(scenario, snapshot['latencies'])
+    return {
+        'documents': snapshot['counters']['documents'],
+        'errors': snapshot['counters']['errors'],
+        'docs_per_second': round(snapshot['documents_per_second'], 1),
+        'mb_per_second': round(snapshot['bytes_per_second'] / 1e6, 3),
+        'p50_ms': None if p50 is None else round(p50 * 1000, 1),
+        'p99_ms': None if p99 is None else round(p99 * 1000, 1),
+    }
+
+
+def regressions(results, baseline, tolerance):
+    for scenario, result in results.items():
+        expected = baseline.get(scenario)
+        if expected and result['docs_per_second'] < expected['docs_per_second'] * (1 - tolerance):
+            yield scenario, result['docs_per_second'] / expected['docs_per_second'] - 1
+
+
+def milliseconds(value):
+    return '-' if value is None else f'{value:.1f}'
+
+
+def print_results(results, baseline):
+    print(f'{"scenario":<24}{"docs":>8}{"errors":>8}{"docs/s":>10}{"MB/s":>8}{"p50 ms":>9}{"p99 ms":>9}'
+          f'{"baseline":>10}')
+    for scenario, result in results.items():
+        expected = baseline.get(scenario)
+        delta = f'{result["docs_per_second"] / expected["docs_per_second"] - 1:+.0%}' if expected else '-'
+        print(f'{scenario:<24}{result["documents"]:>8}{result["errors"]:>8}{result["docs_per_second"]:>10.0f}'
+              f'{result["mb_per_second"]:>8.2f}{milliseconds(result["p50_ms"]):>9}{milliseconds(result["p99_ms"]):>9}'
+              f'{delta:>10}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the commands against a fake Datashare and compare their'
+                                                 ' throughput with a baseline')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='Scenario to run, all by default')
+    parser.add_argument('--documents', type=int, default=1000, help='Number of documents in the fake project')
+    parser.add_argument('--page-size', type=int, default=100, help='Number of documents per page of results')
+    parser.add_argument('--max-page-size', type=int, default=10000, help='Maximum page size the fake server returns')
+    parser.add_argument('--file-size', type=int, default=16 * 1024, help='Size (in bytes) of the downloaded files')
+    parser.add_argument('--latency', type=float, default=1, help='Delay (in ms) before each response')
+    parser.add_argument('--error-rate', type=float, default=0, help='Share of requests rejected by the server')
+    parser.add_argument('--error-status', type=int, default=429, help='Status of the rejected requests')
+    parser.add_argument('--repeat', type=int, default=3, help='Number of runs per scenario, the fastest one is kept')
+    parser.add_argument('--baseline', default=BASELINE_FILE, help='Baseline file to compare the results with')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE, help='Slowdown tolerated before a scenario'
+                                                                           ' is reported as a regression')
+    parser.add_argument('--save-baseline', action='store_true', help='Write the results in the baseline file')
+    args = parser.parse_args()
+    cluster = FakeCluster(documents=args.documents, file_size=args.file_size, max_page_size=args.max_page_size)
+    options = FakeServerOptions(args.latency / 1000, args.error_rate, args.error_status)
+    results = {}
+    with FakeServer(cluster, options) as server:
+        for scenario in args.scenario or SCENARIOS:
+            runs = [run_scenario(scenario, server, args.page_size) for _ in range(args.repeat)]
+            results[scenario] = max(runs, key=lambda run: run['docs_per_second'])
+    try:
+        with open(args.baseline, encoding='utf-8') as baseline_file:
+            baseline = json.load(baseline_file)
+    except FileNotFoundError:
+        baseline = {}
+    print(f'{args.documents} documents, pages of {args.page_size}, files of {args.file_size / 1024:.0f} KB,'
+          f' {args.latency:g} ms of latency, {args.error_rate:.0%} of errors')
+    print_results(results, baseline)
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as baseline_file:
+            json.dump({**baseline, **results}, baseline_file, indent=2, sort_keys=True)
+            baseline_file.write('\n')
+        print(f'Baseline written in {args.baseline}')
+        return
+    slower = list(regressions(results, baseline, args.tolerance))
+    for scenario, delta in slower:
+        print(f'Regression: {scenario} is {-delta:.0%} slower than its baseline', file=sys.stderr)
+    if slower:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+import json
+import random
+import threading
+import time
+from bisect import bisect_right
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from uuid import uuid4
+
+# Prefix of the Elasticsearch proxy of Datashare
+DATASHARE_SEARCH_PREFIX = '/api/index/search'
+
+
+def document_hit(position, index):
+    number = f'{position:020d}'
+    return {
+        '_index': index,
+        '_id': number,
+        '_routing': number,
+        '_source': {
+            'type': 'Document',
+            'name': f'document-{position}.pdf',
+            'path': f'/vault/documents/{position % 100}/document-{position}.pdf',
+            'contentType': 'application/pdf',
+            'contentLength': position * 1024,
+            'extractionDate': '2023-01-01T00:00:00.000Z',
+        },
+        'sort': [position],
+    }
+
+
+# Documents of the fake project, encoded once so the server isn't what's measured
+class FakeCluster:
+    def __init__(self, index='benchmark', documents=10000, file_size=64 * 1024, max_page_size=10000):
+        self.index = index
+        self.max_page_size = max_page_size
+        self.hits = [json.dumps(document_hit(position, index)).encode('utf-8') for position in range(documents)]
+        self.file = b'%PDF' + b'0' * max(0, file_size - 4)
+        self.lock = threading.Lock()
+        self.scrolls = {}
+
+    @staticmethod
+    def positions(documents, body):
+        positions = range(documents)
+        # Documents of a slice are picked by their position, like Elasticsearch does with their id
+        if 'slice' in body:
+            positions = range(body['slice']['id'], documents, body['slice']['max'])
+        return positions
+
+    def page(self, body, positions, start):
+        size = min(body.get('size', 10), self.max_page_size)
+        page = positions[start:start + size]
+        hits = b','.join(self.hits[position] for position in page)
+        return page, hits
+
+    def search(self, body, scroll=False):
+        positions = self.positions(len(self.hits), body)
+        start = body.get('from', 0)
+        if 'search_after' in body:
+            start = bisect_right(positions, body['search_after'][-1])
+        page, hits = self.page(body, positions, start)
+        fields = {'took': 1}
+        if 'pit' in body:
+            fields['pit_id'] = body['pit']['id']
+        if scroll:
+            scroll_id = uuid4().hex
+            with self.lock:
+                self.scrolls[scroll_id] = {'positions': positions, 'start': start + len(page), 'body': body}
+            fields['_scroll_id'] = scroll_id
+        return self.response(fields, hits, len(positions))
+
+    def scroll(self, scroll_id):
+        with self.lock:
+            context = self.scrolls[scroll_id]
+            page, hits = self.page(context['body'], context['positions'], context['start'])
+            context['start'] += len(page)
+        return self.response({'_scroll_id': scroll_id, 'took': 1}, hits, len(context['positions']))
+
+    def clear_scroll(self, scroll_ids):
+        with self.lock:
+            for scroll_id in scroll_ids:
+                self.scrolls.pop(scroll_id, None)
+
+    def mget(self, body):
+        docs = []
+        for doc in body['docs']:
+            position = int(doc['_id']) if doc['_id'].isdigit() else -1
+            if 0 <= position < len(self.hits):
+                docs.append(self.hits[position][:-1] + b',"found":true}')
+            else:
+                docs.append(json.dumps({'_id': doc['_id'], 'found': False}).encode('utf-8'))
+        return b'{"docs":[' + b','.join(docs) + b']}'
+
+    @staticmethod
+    def response(fields, hits, total):
+        head = json.dumps(fields).encode('utf-8')[:-1]
+        return head + b',"hits":{"total":{"value":%d,"relation":"eq"},"hits":[' % total + hits + b']}}'
+
+
+class FakeHandler(BaseHTTPRequestHandler):
+    # pylint: disable=invalid-name
+    protocol_version = 'HTTP/1.1'
+    # Headers and bodies are written separately, they must not wait for each other
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_PUT(self):
+        self.handle_request('PUT')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
+
+    def read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length > 0 else b''
+
+    def reply(self, status, body=b'{}', content_type='application/json', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self, method):
+        options = self.server.options
+        body = self.read_body()
+        time.sleep(options.latency)
+        # Injected errors are rejections the client is expected to retry
+        if options.error_rate > 0 and options.random.random() < options.error_rate:
+            self.reply(options.error_status, headers={'Retry-After': '0'})
+            return
+        url = urlsplit(self.path)
+        path = url.path
+        if path.startswith(DATASHARE_SEARCH_PREFIX):
+            path = path[len(DATASHARE_SEARCH_PREFIX):]
+        self.route(method, path, parse_qs(url.query), json.loads(body) if body else {})
+
+    def route(self, method, path, params, body):
+        # pylint: disable=too-many-return-statements
+        cluster = self.server.cluster
+        segments = [segment for segment in path.split('/') if segment]
+        if path == '/':
+            return self.reply(200, b'{"version":{"number":"7.17.3"}}')
+        if segments[:1] == ['api'] and 'documents' in segments:
+            if 'src' in segments:
+                return self.reply(200, cluster.file, 'application/pdf')
+            return self.reply(201 if method == 'PUT' else 200)
+        if segments[:2] == ['api', 'index']:
+            return self.reply(200)
+        if segments == ['_search', 'scroll']:
+            if method == 'DELETE':
+                cluster.clear_scroll(body.get('scroll_id', []))
+                return self.reply(200, b'{"succeeded":true}')
+            return self.reply(200, cluster.scroll(body['scroll_id']))
+        if segments == ['_pit']:
+            return self.reply(200, b'{"succeeded":true}')
+        if segments[-1:] == ['_pit']:
+            return self.reply(200, json.dumps({'id': uuid4().hex}).encode('utf-8'))
+        if segments[-1:] == ['_count']:
+            return self.reply(200, b'{"count":%d}' % len(cluster.hits))
+        if segments[-1:] == ['_search']:
+            return self.reply(200, cluster.search(body, 'scroll' in params))
+        if segments[-1:] == ['_mget']:
+            return self.reply(200, cluster.mget(body))
+        return self.reply(404, json.dumps({'error': f'Unknown endpoint {method} {path}'}).encode('utf-8'))
+
+
+class FakeServerOptions:
+    def __init__(self, latency=0.0, error_rate=0.0, error_status=429, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_status = error_status
+        self.random = random.Random(seed)
+
+
+# A fake Datashare and Elasticsearch in a thread of the current process, answering
+# the requests of the commands after `latency` seconds
+class FakeServer:
+    def __init__(self, cluster=None, options=None):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeHandler)
+        self.server.daemon_threads = True
+        self.server.cluster = cluster or FakeCluster()
+        self.server.options = options or FakeServerOptions()
+        self.thread = threading.Thread(target=self.server.serve_forever, name='benchmark-server', daemon=True)
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.server.server_port}'
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *args):
+        self.server.shutdown()
+        self.server.server_close()
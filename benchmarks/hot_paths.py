@@ -0,0 +1,122 @@
+import argparse
+import csv
+import json
+import tracemalloc
+from itertools import cycle, islice
+from os.path import join
+from tempfile import TemporaryDirectory
+from time import perf_counter
+
+from tarentula.command import Command
+from tarentula.download import Download
+from tarentula.export_by_query import ExportByQuery
+from tarentula.tagging import Tagger
+
+# Hits are picked from a pool of distinct documents so a million of them doesn't
+# need gigabytes of memory before anything is measured
+HITS_POOL_SIZE = 10000
+# Commands are created without reaching Datashare or writing a bootstrap cache
+OFFLINE_OPTIONS = {'datashare_url': 'http://localhost:8080', 'bootstrap_cache_ttl': 0}
+
+
+def search_hit(number):
+    return {
+        '_id': f'{number:020d}',
+        '_routing': f'{number:020d}',
+        '_source': {
+            'type': 'Document',
+            'path': f'/vault/documents/{number % 100}/document-{number}.pdf',
+            'contentType': 'application/pdf',
+            'contentLength': number * 1024,
+            'extractionDate': '2023-01-01T00:00:00.000Z',
+            'metadata': {'tika_metadata_author': 'ICIJ', 'tika_metadata_title': f'Document {number}'},
+        },
+    }
+
+
+def write_tags_file(path, rows):
+    # A few tags per document, like a reviewed export
+    with open(path, 'w', newline='', encoding='utf-8') as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(['tag', 'documentId', 'routing'])
+        for number in range(rows):
+            writer.writerow([f'tag-{number % 7}', f'{number // 3:020d}', f'{number // 30:020d}'])
+
+
+def per_hit(function, rows):
+    pool = [search_hit(number) for number in range(min(rows, HITS_POOL_SIZE))]
+
+    def run():
+        for hit in islice(cycle(pool), rows):
+            function(hit)
+    return run
+
+
+def repeated(function, rows):
+    def run():
+        for _ in range(rows):
+            function()
+    return run
+
+
+def operations(directory, rows):
+    tags_file = join(directory, 'tags.csv')
+    write_tags_file(tags_file, rows)
+    tagger = Tagger(csv_path=tags_file, **OFFLINE_OPTIONS)
+    export = ExportByQuery(output_file=join(directory, 'documents.csv'),
+                           source='contentType,contentLength:0,extractionDate,path,metadata.tika_metadata_author',
+                           **OFFLINE_OPTIONS)
+    download = Download(destination_directory=join(directory, 'files'), path_format='{id_2b}/{id_4b}/{id}/{basename}',
+                        **OFFLINE_OPTIONS)
+    command = Command('tika_metadata_author:ICIJ AND contentType:"application/pdf"', 'Document')
+    return {
+        'Tagger.csv_rows': (1, lambda: tagger.csv_rows),
+        'Tagger.tree': (1, lambda: tagger.tree),
+        'ExportByQuery.document_source_values': (rows, per_hit(export.document_source_values, rows)),
+        'Download.document_file_options': (rows, per_hit(download.document_file_options, rows)),
+        # Folders are not created, only the path is formatted
+        'Download.raw_file_path': (rows, per_hit(lambda hit: download.raw_file_path(hit, parents=False), rows)),
+        'Command.query_body': (rows, repeated(lambda: command.query_body, rows)),
+    }
+
+
+def measure(function):
+    start = perf_counter()
+    function()
+    elapsed = perf_counter() - start
+    # Memory is measured on another run since tracing allocations slows them down a lot
+    tracemalloc.start()
+    try:
+        function()
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the time and the peak memory of the commands hot paths'
+                                                 ' on synthetic inputs')
+    parser.add_argument('--rows', type=int, default=1000000, help='Number of CSV rows or search hits per operation')
+    parser.add_argument('--operation', action='append', help='Operation to measure, all by default')
+    parser.add_argument('--output', help='Write the results in this JSON file')
+    args = parser.parse_args()
+    results = {}
+    with TemporaryDirectory() as directory:
+        print(f'{args.rows} rows or hits per operation')
+        print(f'{"operation":<40}{"total s":>10}{"us/row":>10}{"peak MB":>10}')
+        for name, (calls, function) in operations(directory, args.rows).items():
+            if args.operation and name not in args.operation:
+                continue
+            elapsed, peak = measure(function)
+            results[name] = {'rows': args.rows, 'seconds': round(elapsed, 3),
+                             'us_per_row': round(elapsed / args.rows * 1e6, 3), 'peak_bytes': peak, 'calls': calls}
+            print(f'{name:<40}{elapsed:>10.2f}{elapsed / args.rows * 1e6:>10.2f}{peak / 1e6:>10.1f}')
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as json_file:
+            json.dump(results, json_file, indent=2)
+            json_file.write('\n')
+
+
+if __name__ == '__main__':
+    main()
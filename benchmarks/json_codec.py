@@ -0,0 +1,51 @@
+import argparse
+from timeit import repeat
+
+from tarentula.json_codec import JsonCodec, create_codec
+
+
+def search_page(size=1000):
+    hits = []
+    for number in range(size):
+        hits.append({
+            '_id': f'{number:020d}',
+            '_routing': f'{number:020d}',
+            '_source': {
+                'type': 'Document',
+                'path': f'/vault/documents/{number % 100}/document-{number}.pdf',
+                'contentType': 'application/pdf',
+                'contentLength': number * 1024,
+                'extractionDate': '2023-01-01T00:00:00.000Z',
+                'tags': ['spider', 'atypidae'],
+                'metadata': {'tika_metadata_author': 'ICIJ', 'tika_metadata_title': f'Document {number}'},
+            },
+            'sort': [number],
+        })
+    return {'_scroll_id': 'c2Nhbj', 'took': 12, 'hits': {'total': {'value': 10 ** 6}, 'hits': hits}}
+
+
+def measure(function, number, repeats):
+    return min(repeat(function, number=number, repeat=repeats)) / number
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare the JSON codecs on search pages')
+    parser.add_argument('--size', type=int, default=1000, help='Number of hits per page')
+    parser.add_argument('--number', type=int, default=20, help='Number of pages per measure')
+    parser.add_argument('--repeat', type=int, default=5, help='Number of measures')
+    args = parser.parse_args()
+    page = search_page(args.size)
+    codecs = [JsonCodec()]
+    # The fastest available codec is only compared when it's not the standard library
+    if create_codec().name != JsonCodec.name:
+        codecs.append(create_codec())
+    body = codecs[0].dumps(page)
+    print(f'Page of {args.size} hits, {len(body) / 1024:.0f} KB')
+    for codec in codecs:
+        decode = measure(lambda codec=codec: codec.loads(body), args.number, args.repeat)
+        encode = measure(lambda codec=codec: codec.dumps(page), args.number, args.repeat)
+        print(f'{codec.name:>8}  decode {decode * 1000:7.2f} ms/page  encode {encode * 1000:7.2f} ms/page')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+import argparse
+import statistics
+import subprocess
+import sys
+from time import perf_counter
+
+from benchmarks.fake_server import FakeCluster, FakeServer
+
+# Modules a command must not import: the dependencies of the other commands
+UNEXPECTED_MODULES = {
+    '--help': ('requests', 'rich', 'httpx', 'coloredlogs', 'tarentula.datashare_client'),
+    'count --help': ('rich', 'httpx', 'tarentula.async_datashare_client', 'tarentula.download',
+                     'tarentula.tagging', 'tarentula.aggregate'),
+    'count': ('rich', 'httpx', 'tarentula.async_datashare_client', 'tarentula.download',
+              'tarentula.tagging', 'tarentula.aggregate'),
+}
+
+
+def command_line(name, server):
+    if name == 'count':
+        return ['count', '--datashare-url', server.url, '--elasticsearch-url', server.url,
+                '--datashare-project', server.server.cluster.index, '--bootstrap-cache-ttl', '0']
+    return name.split(' ')
+
+
+def run(arguments, importtime=False):
+    options = ['-X', 'importtime'] if importtime else []
+    start = perf_counter()
+    result = subprocess.run([sys.executable, *options, '-m', 'tarentula.cli', *arguments],
+                            capture_output=True, text=True, check=True)
+    return perf_counter() - start, result.stderr
+
+
+def imported_modules(importtime):
+    # Lines look like `import time: self [us] | cumulative | imported package`
+    return {line.split('|')[-1].strip() for line in importtime.splitlines() if line.startswith('import time:')}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure how long the CLI takes to start and which modules it'
+                                                 ' imports')
+    parser.add_argument('--repeat', type=int, default=10, help='Number of runs per command line')
+    parser.add_argument('--max-ms', type=float, default=0, help='Fail when a median startup time is longer,'
+                                                                ' 0 to disable')
+    args = parser.parse_args()
+    failures = []
+    print(f'{"command":<16}{"min ms":>10}{"median ms":>12}{"modules":>10}')
+    with FakeServer(FakeCluster(documents=10)) as server:
+        for name, unexpected in UNEXPECTED_MODULES.items():
+            arguments = command_line(name, server)
+            durations = [run(arguments)[0] * 1000 for _ in range(args.repeat)]
+            modules = imported_modules(run(arguments, importtime=True)[1])
+            median = statistics.median(durations)
+            print(f'{name:<16}{min(durations):>10.0f}{median:>12.0f}{len(modules):>10}')
+            failures += [f'{name} imports {module}' for module in unexpected if module in modules]
+            if 0 < args.max_ms < median:
+                failures.append(f'{name} takes {median:.0f}ms to start')
+    for failure in failures:
+        print(failure, file=sys.stderr)
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,6 @@
-from importlib import metadata
-
-__version__ = metadata.version(__package__)
+def __getattr__(name):  # pylint: disable=invalid-name
+    # The package metadata is only read when the version is asked for
+    if name == '__version__':
+        from importlib import metadata
+        return metadata.version(__package__)
+    raise AttributeError(f'module {__name__!r} has no attribute {name!r}')
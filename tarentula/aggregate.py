@@ -19,8 +19,8 @@ class Aggregate(Command):
                  group_by: str = 'contentType',
                  operation_field: str = None,
                  run: str = 'count',
-                 calendar_interval: str = 'year'
-                 ):
+                 calendar_interval: str = 'year',
+                 **client_options):
         super().__init__(query, type)
         self.datashare_url = datashare_url
         self.datashare_project = datashare_project
@@ -37,7 +37,8 @@ class Aggregate(Command):
                                                     elasticsearch_url,
                                                     datashare_project,
                                                     cookies,
-                                                    apikey)
+                                                    apikey,
+                                                    **client_options)
         except (ConnectionRefusedError, ConnectionError):
             logger.critical('Unable to connect to Datashare', exc_info=self.traceback)
             sys.exit()
@@ -56,8 +57,10 @@ class Aggregate(Command):
         return self.datashare_client.query(index=index, query=self.query_body).get('aggregations')
 
     def start(self):
-        agg = self.aggregate_matches()
-        print(json.dumps(agg, indent=4))
+        # Connections and the trace file are released once the command is over
+        with self.datashare_client:
+            agg = self.aggregate_matches()
+            print(json.dumps(agg, indent=4))
 
 
 class AggCount(Aggregate):
@@ -0,0 +1,257 @@
+import asyncio
+
+import requests
+
+from tarentula.datashare_client import BaseDatashareClient, response_hits, pit_sort, pit_pagination, scan_args, \
+    is_index_order, first_page_args, next_page_args, follow_pit, count_body, batches, found_documents, MGET_BATCH_SIZE, \
+    DATASHARE_DEFAULT_PROJECT, DATASHARE_DEFAULT_URL, ELASTICSEARCH_DEFAULT_URL, HITS_FILTER_PATH, PIT_KEEP_ALIVE, \
+    PIT_THRESHOLD, PIT_MIN_VERSION
+from tarentula.json_codec import loads
+from tarentula.logger import logger
+from tarentula.transport import create_async_transport
+
+DEFAULT_CONCURRENCY = 10
+
+
+async def run_concurrently(coroutines, concurrency=DEFAULT_CONCURRENCY):
+    # Coroutines can come from a regular or an asynchronous iterable, they are
+    # only created when a slot is free so memory stays bounded. The concurrency
+    # can be a callable to adapt the number of slots while running.
+    limit = concurrency if callable(concurrency) else lambda: concurrency
+    pending = set()
+    errors = []
+
+    def done(task):
+        pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            errors.append(task.exception())
+
+    async def schedule(coroutine):
+        while len(pending) >= max(1, limit()) and not errors:
+            await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        if errors:
+            coroutine.close()
+            raise errors[0]
+        task = asyncio.ensure_future(coroutine)
+        pending.add(task)
+        task.add_done_callback(done)
+
+    try:
+        if hasattr(coroutines, '__aiter__'):
+            async for coroutine in coroutines:
+                await schedule(coroutine)
+        else:
+            for coroutine in coroutines:
+                await schedule(coroutine)
+        await asyncio.gather(*pending, return_exceptions=True)
+        if errors:
+            raise errors[0]
+    finally:
+        for task in list(pending):
+            task.cancel()
+
+
+class AsyncDatashareClient(BaseDatashareClient):
+    def __init__(self, datashare_url=DATASHARE_DEFAULT_URL, elasticsearch_url=ELASTICSEARCH_DEFAULT_URL,
+                 datashare_project=DATASHARE_DEFAULT_PROJECT, cookies='', apikey=None, **client_options):
+        super().__init__(create_async_transport, datashare_url, elasticsearch_url, cookies, apikey,
+                         **client_options)
+        self.datashare_project = datashare_project
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *args):
+        await self.close()
+
+    async def close(self):
+        await self.transport.close()
+        if self.trace is not None:
+            self.trace.close()
+
+    async def query(self, index=DATASHARE_DEFAULT_PROJECT, query=None, q=None, source=None, scroll=None,
+                    filter_path=None, pit=None, **kwargs):
+        response = await self.transport.post(**self.search_request(index, query, q, source, scroll, filter_path, pit,
+                                                                   **kwargs))
+        response.raise_for_status()
+        return loads(response.content)
+
+    async def scroll(self, scroll_id, scroll=None, filter_path=None):
+        response = await self.transport.post(**self.scroll_request(scroll_id, scroll, filter_path))
+        response.raise_for_status()
+        return loads(response.content)
+
+    async def clear_scroll(self, scroll_ids):
+        try:
+            self.closed_context(await self.transport.delete(**self.clear_scroll_request(scroll_ids)))
+        except requests.RequestException as error:
+            logger.warning('Unable to clear scroll context, it will expire on its own: %s', error)
+        logger.debug('Cleared %s scroll context(s), %s search context(s) still open', len(scroll_ids),
+                     len(self.open_contexts))
+
+    async def open_pit(self, index=DATASHARE_DEFAULT_PROJECT, keep_alive=PIT_KEEP_ALIVE):
+        return self.opened_pit(await self.transport.post(**self.open_pit_request(index, keep_alive)), keep_alive)
+
+    async def close_pit(self, pit_id):
+        try:
+            self.closed_context(await self.transport.delete(**self.close_pit_request(pit_id)))
+        except requests.RequestException as error:
+            logger.warning('Unable to close point in time, it will expire on its own: %s', error)
+        logger.debug('Closed point in time, %s search context(s) still open', len(self.open_contexts))
+
+    async def count(self, index=DATASHARE_DEFAULT_PROJECT, query=None):
+        return loads((await self.transport.post(**self.count_request(index, query))).content)
+
+    async def document(self, index=DATASHARE_DEFAULT_PROJECT, id=None, routing=None, source=None):
+        return loads((await self.transport.get(**self.document_request(index, id, routing, source))).content)
+
+    async def documents(self, index=DATASHARE_DEFAULT_PROJECT, ids=None, source=None, batch_size=MGET_BATCH_SIZE):
+        for batch in batches(ids or [], batch_size):
+            response = await self.transport.post(**self.mget_request(index, batch, source))
+            response.raise_for_status()
+            for document in found_documents(loads(response.content)):
+                yield document
+
+    async def download(self, index=DATASHARE_DEFAULT_PROJECT, id=None, routing=None, path=None):
+        # The raw file is streamed to the disk chunk by chunk
+        await self.transport.download(path=path, **self.download_request(index, id, routing))
+
+    async def tag(self, index=DATASHARE_DEFAULT_PROJECT, id=None, routing=None, tags=None):
+        return await self.transport.put(**self.tag_request(index, id, routing, tags))
+
+    async def pages(self, first_page, next_page):
+        # The next page is requested while the hits of the current one are consumed
+        response = await first_page
+        prefetch = None
+        try:
+            while len(response_hits(response)) > 0:
+                hits = response_hits(response)
+                next_coroutine = next_page(response)
+                prefetch = None if next_coroutine is None else asyncio.ensure_future(next_coroutine)
+                for item in hits:
+                    yield item
+                if prefetch is None:
+                    break
+                response = await prefetch
+        finally:
+            if prefetch is not None and not prefetch.done():
+                prefetch.cancel()
+
+    async def scan_all(self, scroll='10m', limit=0, filter_path=HITS_FILTER_PATH, slices=1, on_slice_hit=None,
+                       **kwargs):
+        # pylint: disable=unused-argument
+        # Slices are only read concurrently by the synchronous client
+        if slices > 1:
+            logger.warning('"slices" will not be used in async mode')
+        kwargs = scan_args(kwargs, limit)
+        num_yielded = 0
+        scroll_ids = set()
+
+        async def tracked(request, *args, **request_kwargs):
+            # Every scroll id is recorded, even the one of an empty first page. The request
+            # is only created once the page is awaited, a cancelled prefetch sends nothing.
+            response = await request(*args, **request_kwargs)
+            self.track_scroll(scroll_ids, response)
+            return response
+
+        def next_page(response):
+            scroll_id = response.get('_scroll_id')
+            if scroll_id is None:
+                return None
+            return tracked(self.scroll, scroll_id, scroll, filter_path)
+
+        pages = self.pages(tracked(self.query, scroll=scroll, filter_path=filter_path, **kwargs), next_page)
+        # The scroll context is cleared when the scan is over, stopped or interrupted
+        try:
+            async for item in pages:
+                yield item
+                num_yielded += 1
+                if limit != 0 and num_yielded >= limit:
+                    break
+        finally:
+            await pages.aclose()
+            if scroll_ids:
+                await self.clear_scroll(scroll_ids)
+
+    async def use_pit(self, pagination='auto', index=DATASHARE_DEFAULT_PROJECT, query=None, limit=0, matches=None,
+                      **kwargs):
+        # Point in time needs Elasticsearch 7.12 or later
+        version = self.bootstrap_cache.get('version', self.elasticsearch_host)
+        if pagination == 'auto' and version and tuple(version) < PIT_MIN_VERSION:
+            return False
+        use_pit = pit_pagination(pagination, kwargs.get('sort'))
+        if use_pit is not None:
+            return use_pit
+        # Deep pages are cheaper to reach from a point in time than with from/size. Documents
+        # are only counted when the caller doesn't already know how many it will read.
+        if limit == 0:
+            limit = matches if matches is not None else (await self.count(index, count_body(query))).get('count', 0)
+        return kwargs.get('from', 0) + limit > PIT_THRESHOLD
+
+    async def query_all(self, limit=0, filter_path=HITS_FILTER_PATH, pagination='auto', slices=1, on_slice_hit=None,
+                        matches=None, **kwargs):
+        # pylint: disable=unused-argument
+        # Slices are only read concurrently by the synchronous client
+        if slices > 1:
+            logger.warning('"slices" will not be used in async mode')
+        pagination = self.search_pagination(pagination)
+        pit = pit_id = None
+        if await self.use_pit(pagination, limit=limit, matches=matches, **kwargs):
+            try:
+                pit = await self.open_pit(kwargs.get('index', DATASHARE_DEFAULT_PROJECT))
+                pit_id = pit['id']
+                kwargs['sort'] = pit_sort(kwargs.get('sort'))
+            except requests.HTTPError:
+                # Point in time needs Elasticsearch 7.12 or later
+                if pagination == 'pit':
+                    raise
+                logger.warning('Unable to open a point in time, reading results without it')
+        # Without a point in time, the index order is only stable in a scroll context
+        if pit is None and is_index_order(kwargs.get('sort')):
+            hits = self.scroll_hits(limit, filter_path, **kwargs)
+        else:
+            hits = self.query_pages(limit, filter_path, pit, **kwargs)
+        # The point in time is closed when the search is over, stopped or interrupted
+        try:
+            async for item in hits:
+                yield item
+        finally:
+            await hits.aclose()
+            if pit is not None:
+                self.open_contexts.discard(pit_id)
+                await self.close_pit(pit['id'])
+
+    async def scroll_hits(self, limit=0, filter_path=HITS_FILTER_PATH, **kwargs):
+        # A scroll can't start from an offset, the first hits are read and skipped
+        from_ = kwargs.pop('from', 0)
+        hits = self.scan_all(limit=limit + from_ if limit else 0, filter_path=filter_path, **kwargs)
+        position = 0
+        try:
+            async for hit in hits:
+                if position >= from_:
+                    yield hit
+                position += 1
+        finally:
+            await hits.aclose()
+
+    async def query_pages(self, limit=0, filter_path=HITS_FILTER_PATH, pit=None, **kwargs):
+        kwargs = first_page_args(kwargs, limit)
+        from_ = kwargs.get('from', 0)
+        num_requested = 0
+
+        def next_page(response):
+            nonlocal num_requested
+            hits = response_hits(response)
+            num_requested += len(hits)
+            follow_pit(pit, response)
+            page_args = next_page_args(kwargs, hits[-1], num_requested, limit, from_)
+            if page_args is None:
+                return None
+            return self.query(filter_path=filter_path, pit=pit, **page_args)
+
+        pages = self.pages(self.query(filter_path=filter_path, pit=pit, **kwargs), next_page)
+        try:
+            async for item in pages:
+                yield item
+        finally:
+            await pages.aclose()
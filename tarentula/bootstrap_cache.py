@@ -0,0 +1,83 @@
+import json
+import os
+from os.path import dirname, join
+from pathlib import Path
+from tempfile import NamedTemporaryFile
+from time import time
+
+from tarentula.logger import logger
+
+BOOTSTRAP_CACHE_TTL_SEC = 600
+
+
+def default_cache_path():
+    cache_home = os.getenv('XDG_CACHE_HOME') or join(Path.home(), '.cache')
+    return join(cache_home, 'tarentula', 'bootstrap.json')
+
+
+# Facts about the cluster which rarely change (Elasticsearch version, mappings...)
+# kept on disk so they are not requested on every run
+class BootstrapCache:
+    def __init__(self, ttl=BOOTSTRAP_CACHE_TTL_SEC, path=None):
+        self.ttl = ttl
+        self.path = path or default_cache_path()
+        self._entries = None
+
+    @property
+    def enabled(self):
+        return self.ttl > 0
+
+    @property
+    def entries(self):
+        # The file is only read once, the first time it's needed
+        if self._entries is None:
+            self._entries = self.load()
+        return self._entries
+
+    def load(self):
+        if not self.enabled:
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as cache_file:
+                entries = json.load(cache_file)
+        except (OSError, ValueError):
+            return {}
+        now = time()
+        return {key: entry for key, entry in entries.items() if entry.get('expires', 0) > now}
+
+    @staticmethod
+    def key(*parts):
+        return '|'.join(str(part) for part in parts)
+
+    def get(self, *parts, default=None):
+        entry = self.entries.get(self.key(*parts))
+        if entry is None or entry['expires'] <= time():
+            return default
+        return entry['value']
+
+    def set(self, value, *parts):
+        if not self.enabled:
+            return value
+        self.entries[self.key(*parts)] = {'value': value, 'expires': time() + self.ttl}
+        self.save()
+        return value
+
+    def invalidate(self, *parts):
+        # Without parts, the whole cache is invalidated
+        if not parts:
+            self.entries.clear()
+        elif self.entries.pop(self.key(*parts), None) is None:
+            return
+        self.save()
+
+    def save(self):
+        if not self.enabled:
+            return
+        # The file is replaced at once so concurrent runs never read half of it
+        try:
+            os.makedirs(dirname(self.path), exist_ok=True)
+            with NamedTemporaryFile('w', dir=dirname(self.path), delete=False, encoding='utf-8') as cache_file:
+                json.dump(self.entries, cache_file)
+            os.replace(cache_file.name, self.path)
+        except OSError as error:
+            logger.debug('Unable to write the bootstrap cache in %s: %s', self.path, error)
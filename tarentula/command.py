@@ -2,16 +2,25 @@ import json
 
 
 class Command:
+    # Commands sorting results set the field they sort by
+    sort_by = None
+
     def __init__(self, query: str, type: str) -> None:
         self.query = query
         self.type = type
 
+    @property
+    def scored(self):
+        return self.sort_by == '_score'
+
     @property
     def query_body_from_string(self):
+        # Constraints are cached by Elasticsearch in filter context, the
+        # relevance of documents is only computed when they are sorted by it
         return {
             "query": {
                 "bool": {
-                    "must": [
+                    "must" if self.scored else "filter": [
                         {
                             "match": {
                                 "type": self.type
@@ -38,3 +47,11 @@ class Command:
         with open(self.query[1:]) as json_file:
             query_body = json.load(json_file)
         return query_body
+
+    @staticmethod
+    def slices_progress(progress, slices):
+        # One progress bar per slice, advanced as the documents of the slice are read
+        if slices <= 1:
+            return None
+        tasks = [progress.add_task(f'Slice {slice_id + 1}/{slices}', total=None) for slice_id in range(slices)]
+        return lambda slice_id: progress.advance(tasks[slice_id])
@@ -0,0 +1,43 @@
+import click
+
+from tarentula.commands.options import client_options
+from tarentula.config_file_reader import ConfigFileReader
+from tarentula.aggregate import AggCount, GeneralStats, DateHistogram, NumUnique
+
+
+@click.command()
+@click.option('--apikey', help='Datashare authentication apikey', default=ConfigFileReader('apikey'))
+@click.option('--datashare-url', help='Datashare URL',
+              default=ConfigFileReader('datashare_url', 'http://localhost:8080'))
+@click.option('--datashare-project', help='Datashare project',
+              default=ConfigFileReader('datashare_project', 'local-datashare'))
+@click.option('--elasticsearch-url', help='You can additionally pass the Elasticsearch URL in order to use scrolling'
+                                          'capabilities of Elasticsearch (useful when dealing with a lot of results)',
+              default=None)
+@click.option('--query', help='The query string to filter documents', default='*')
+@click.option('--cookies', help='Key/value pair to add a cookie to each request to the API. You can separate'
+                                'semicolons: key1=val1;key2=val2;...', default='')
+@click.option('--traceback/--no-traceback', help='Display a traceback in case of error', default=False)
+@click.option('--type', help='Type of indexed documents to download', default='Document',
+              type=click.Choice(['Document', 'NamedEntity'], case_sensitive=True))
+@click.option('--group_by', help='Field to use to aggregate results', default=None)
+@click.option('--operation_field', help='Field to run the operation on', default=None)
+@click.option('--run', help='Operation to run ', default='count',
+              type=click.Choice(
+                  ['count', 'nunique', 'date_histogram', 'sum', 'stats', 'string_stats', 'min', 'max', 'avg']))
+@click.option('--calendar_interval', help='Calendar interval for date histogram aggregation', default='year',
+              type=click.Choice(['year', 'month']))
+@client_options
+def aggregate(**options):
+    agg_operation = options['run']
+
+    if agg_operation == 'count':
+        agg = AggCount(**options)
+    elif agg_operation == 'nunique':
+        agg = NumUnique(**options)
+    elif agg_operation == 'date_histogram':
+        agg = DateHistogram(**options)
+    elif agg_operation in ['sum', 'stats', 'string_stats', 'min', 'max', 'avg']:
+        agg = GeneralStats(**options)
+
+    agg.start()
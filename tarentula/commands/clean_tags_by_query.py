@@ -0,0 +1,23 @@
+import click
+
+from tarentula.commands.options import client_options
+from tarentula.config_file_reader import ConfigFileReader
+from tarentula.tag_cleaning_by_query import TagsCleanerByQuery
+
+
+@click.command()
+@click.option('--apikey', help='Datashare authentication apikey', default=ConfigFileReader('apikey'))
+@click.option('--datashare-project', help='Datashare project',
+              default=ConfigFileReader('datashare_project', 'local-datashare'))
+@click.option('--elasticsearch-url', help='Elasticsearch URL which is used to perform update by query',
+              default='http://localhost:9200')
+@click.option('--cookies', help='Key/value pair to add a cookie to each request to the API. You can separate'
+                                'semicolons: key1=val1;key2=val2;...', default='')
+@click.option('--wait-for-completion/--no-wait-for-completion', help='Create a Elasticsearch task to perform the update'
+                                                                     'asynchronously', default=True)
+@click.option('--query', help='Give a JSON query to filter documents that will have their tags cleaned. It can be a'
+                              'file with @path/to/file. Default to all.', default=None)
+@client_options
+def clean_tags_by_query(**options):
+    tagger = TagsCleanerByQuery(**options)
+    tagger.start()
@@ -0,0 +1,60 @@
+import click
+
+from tarentula.commands.options import client_options, metrics_options, validate_progressbar
+from tarentula.config_file_reader import ConfigFileReader
+from tarentula.export_by_query import ExportByQuery
+from tarentula.metrics import reported
+from tarentula.datashare_client import PAGINATIONS
+
+
+@click.command()
+@click.option('--apikey', help='Datashare authentication apikey', default=ConfigFileReader('apikey'))
+@click.option('--datashare-url', help='Datashare URL',
+              default=ConfigFileReader('datashare_url', 'http://localhost:8080'))
+@click.option('--datashare-project', help='Datashare project',
+              default=ConfigFileReader('datashare_project', 'local-datashare'))
+@click.option('--elasticsearch-url', help='You can additionally pass the Elasticsearch URL in order to use scrolling'
+                                          'capabilities of Elasticsearch (useful when dealing with a lot of results)',
+              default=None)
+@click.option('--query', help='The query string to filter documents', default='*')
+@click.option('--output-file', help='Path to the CSV file', default='tarentula_documents.csv')
+@click.option('--throttle', help='Request throttling (in ms)', default=0)
+@click.option('--target-latency', type=int, help='Adapt the concurrency and the throttling to keep requests under'
+                                                  ' this latency (in ms), 0 to keep them fixed',
+              default=ConfigFileReader('target_latency', 0, 'client'))
+@click.option('--cookies', help='Key/value pair to add a cookie to each request to the API. You can separate'
+                                'semicolons: key1=val1;key2=val2;...', default='')
+@click.option('--scroll', help='Scroll duration', default=None)
+@click.option('--source', help='A comma-separated list of field to include in the export',
+              default='contentType,contentLength:0,extractionDate,path')
+@click.option('--sort-by', help='Field to use to sort results, `_score` to sort them by relevance', default='_doc')
+@click.option('--order-by', help='Order to use to sort results (ascending for _doc, descending otherwise by default)',
+              default=None, type=click.Choice(['asc', 'desc']))
+@click.option('--traceback/--no-traceback', help='Display a traceback in case of error', default=False)
+@click.option('--progressbar/--no-progressbar', help='Display a progressbar', default=None,
+              callback=validate_progressbar)
+@click.option('--type', help='Type of indexed documents to download', default='Document',
+              type=click.Choice(['Document', 'NamedEntity', 'Duplicate'], case_sensitive=True))
+@click.option('--size', help='Size of the scroll request that powers the operation.', default=1000)
+@click.option('--from', '-f', 'from_', type=int, help='Passed to the search it will bypass the first n documents',
+              default=0)
+@click.option('--limit', '-l', type=int, help='Limit the total results to return', default=0)
+@click.option('--query-field/--no-query-field', help='Add the query to the export CSV', default=True)
+@click.option('--stream-hits/--no-stream-hits', help='Decode each page of results hit by hit while it is received'
+                                                    ' to bound memory usage', default=False)
+@click.option('--prefetch', type=int, help='Number of pages of results fetched in the background while the current'
+                                            ' one is processed, 0 to disable',
+              default=ConfigFileReader('prefetch', 0, 'client'))
+@click.option('--pagination', help='How to page through results without --scroll: from a point in time, with'
+                                    ' search_after, or from a point in time only for large result sets',
+              default='auto', type=click.Choice(PAGINATIONS))
+@click.option('--slices', type=int, help='Number of slices of results read concurrently', default=1)
+@click.option('--async/--no-async', 'async_mode', help='Fetch the next page of results while writing the current'
+                                                        ' one', default=False)
+@client_options
+@metrics_options
+def export_by_query(metrics_file, metrics_interval, metrics_summary, progress_interval, **options):
+    with reported('export-by-query', metrics_file, metrics_interval, metrics_summary, progress_interval):
+        # Instantiate an ExportByQuery class with all the options
+        export = ExportByQuery(**options)
+        export.start()
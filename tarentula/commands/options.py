@@ -0,0 +1,80 @@
+import click
+
+from tarentula.config_file_reader import ConfigFileReader
+from tarentula.metrics import METRICS_INTERVAL_SEC, PROGRESS_INTERVAL_SEC
+from tarentula.trace import SLOW_REQUEST_MS
+from tarentula.transport import TRANSPORT_BACKENDS, HTTP_REQUEST_TIMEOUT_SEC
+from tarentula.retry import RETRY_MAX_RETRIES, RETRY_BACKOFF_FACTOR, CIRCUIT_BREAKER_THRESHOLD, \
+    CIRCUIT_BREAKER_TIMEOUT_SEC
+from tarentula.bootstrap_cache import BOOTSTRAP_CACHE_TTL_SEC
+
+
+def validate_progressbar(ctx, param, value):
+    # pylint: disable=unused-argument
+    # If no value given, we activate the progress bar only when the
+    # stdout_loglevel value is higher than INFO (20)
+    return value if value is not None else ctx.obj['stdout_loglevel'] > 20
+
+
+def client_options(command):
+    options = [
+        click.option('--pool-connections', type=int, help='Number of hosts to keep a connection pool for',
+                     default=ConfigFileReader('pool_connections', 10, 'client')),
+        click.option('--pool-maxsize', type=int, help='Maximum number of connections kept alive per host',
+                     default=ConfigFileReader('pool_maxsize', 10, 'client')),
+        click.option('--pool-block/--no-pool-block', help='Wait for a free connection instead of opening a new one'
+                                                          ' when the pool of a host is full',
+                     default=ConfigFileReader('pool_block', False, 'client')),
+        click.option('--keep-alive/--no-keep-alive', help='Reuse connections between requests',
+                     default=ConfigFileReader('keep_alive', True, 'client')),
+        click.option('--transport', help='HTTP backend used to reach Datashare and Elasticsearch',
+                     type=click.Choice(TRANSPORT_BACKENDS),
+                     default=ConfigFileReader('transport', 'requests', 'client')),
+        click.option('--request-timeout', type=float, help='Give up on a request after this duration (in seconds)',
+                     default=ConfigFileReader('request_timeout', HTTP_REQUEST_TIMEOUT_SEC, 'client')),
+        click.option('--max-retries', type=int, help='Retry failed or rejected requests this many times, 0 to disable',
+                     default=ConfigFileReader('max_retries', RETRY_MAX_RETRIES, 'client')),
+        click.option('--retry-backoff', type=float, help='Base delay (in seconds) of the exponential backoff between'
+                                                         ' retries',
+                     default=ConfigFileReader('retry_backoff', RETRY_BACKOFF_FACTOR, 'client')),
+        click.option('--circuit-breaker-threshold', type=int, help='Pause all requests after this many consecutive'
+                                                                   ' failures, 0 to disable',
+                     default=ConfigFileReader('circuit_breaker_threshold', CIRCUIT_BREAKER_THRESHOLD, 'client')),
+        click.option('--circuit-breaker-timeout', type=float, help='Pause duration (in seconds) once the circuit'
+                                                                   ' breaker is open',
+                     default=ConfigFileReader('circuit_breaker_timeout', CIRCUIT_BREAKER_TIMEOUT_SEC, 'client')),
+        click.option('--bootstrap-cache-ttl', type=int, help='Keep the Elasticsearch version and the mappings on disk'
+                                                             ' for this duration (in seconds), 0 to disable',
+                     default=ConfigFileReader('bootstrap_cache_ttl', BOOTSTRAP_CACHE_TTL_SEC, 'client')),
+        click.option('--trace-file', type=click.Path(dir_okay=False), help='Append every request with its status,'
+                                                                          ' size and timings to this JSONL file',
+                     default=ConfigFileReader('trace_file', None, 'client')),
+        click.option('--slow-request-ms', type=int, help='Log requests slower than this duration (in milliseconds),'
+                                                         ' 0 to disable',
+                     default=ConfigFileReader('slow_request_ms', SLOW_REQUEST_MS, 'client')),
+    ]
+    # Options are applied in reverse order so they are listed in the same order in the help
+    for option in reversed(options):
+        command = option(command)
+    return command
+
+
+def metrics_options(command):
+    options = [
+        click.option('--metrics-file', type=click.Path(dir_okay=False), help='Write the metrics of the run in this'
+                                                                            ' file periodically, as JSON if its'
+                                                                            ' name ends with .json or in the'
+                                                                            ' Prometheus text format otherwise',
+                     default=ConfigFileReader('metrics_file', None, 'metrics')),
+        click.option('--metrics-interval', type=float, help='Delay (in seconds) between two writes of the metrics'
+                                                            ' file',
+                     default=ConfigFileReader('metrics_interval', METRICS_INTERVAL_SEC, 'metrics')),
+        click.option('--metrics-summary/--no-metrics-summary', help='Print a summary of the metrics on completion',
+                     default=ConfigFileReader('metrics_summary', True, 'metrics')),
+        click.option('--progress-interval', type=float, help='Log the number of documents processed so far every this'
+                                                             ' many seconds, 0 to disable',
+                     default=ConfigFileReader('progress_interval', PROGRESS_INTERVAL_SEC, 'metrics')),
+    ]
+    for option in reversed(options):
+        command = option(command)
+    return command
@@ -0,0 +1,36 @@
+import click
+
+from tarentula.commands.options import client_options, metrics_options, validate_progressbar
+from tarentula.config_file_reader import ConfigFileReader
+from tarentula.tagging import Tagger
+from tarentula.metrics import reported
+from tarentula.async_datashare_client import DEFAULT_CONCURRENCY
+
+
+@click.command()
+@click.option('--apikey', help='Datashare authentication apikey', default=ConfigFileReader('apikey'))
+@click.option('--datashare-url', help='Datashare URL',
+              default=ConfigFileReader('datashare_url', 'http://localhost:8080'))
+@click.option('--datashare-project', help='Datashare project',
+              default=ConfigFileReader('datashare_project', 'local-datashare'))
+@click.option('--throttle', help='Request throttling (in ms)', default=0)
+@click.option('--target-latency', type=int, help='Adapt the concurrency and the throttling to keep requests under'
+                                                  ' this latency (in ms), 0 to keep them fixed',
+              default=ConfigFileReader('target_latency', 0, 'client'))
+@click.option('--cookies', help='Key/value pair to add a cookie to each request to the API. You can separate'
+                                'semicolons: key1=val1;key2=val2;...', default='')
+@click.option('--traceback/--no-traceback', help='Display a traceback in case of error', default=False)
+@click.option('--progressbar/--no-progressbar', help='Display a progressbar', default=None,
+              callback=validate_progressbar)
+@click.option('--async/--no-async', 'async_mode', help='Send requests concurrently with asyncio', default=False)
+@click.option('--concurrency', type=int, help='Maximum number of concurrent requests in async mode',
+              default=ConfigFileReader('concurrency', DEFAULT_CONCURRENCY, 'client'))
+@click.argument('csv-path', type=click.Path(exists=True))
+@client_options
+@metrics_options
+def tagging(metrics_file, metrics_interval, metrics_summary, progress_interval, **options):
+    with reported('tagging', metrics_file, metrics_interval, metrics_summary, progress_interval):
+        # Instantiate a Tagger class with all the options
+        tagger = Tagger(**options)
+        # Proceed to tagging
+        tagger.start()
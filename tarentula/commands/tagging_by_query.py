@@ -0,0 +1,31 @@
+import click
+
+from tarentula.commands.options import client_options, validate_progressbar
+from tarentula.config_file_reader import ConfigFileReader
+from tarentula.tagging_by_query import TaggerByQuery
+
+
+@click.command()
+@click.option('--apikey', help='Datashare authentication apikey', default=ConfigFileReader('apikey'))
+@click.option('--datashare-project', help='Datashare project',
+              default=ConfigFileReader('datashare_project', 'local-datashare'))
+@click.option('--elasticsearch-url', help='Elasticsearch URL which is used to perform update by query',
+              default='http://localhost:9200')
+@click.option('--throttle', help='Request throttling (in ms)', default=0)
+@click.option('--target-latency', type=int, help='Adapt the concurrency and the throttling to keep requests under'
+                                                  ' this latency (in ms), 0 to keep them fixed',
+              default=ConfigFileReader('target_latency', 0, 'client'))
+@click.option('--cookies', help='Key/value pair to add a cookie to each request to the API. You can separate'
+                                'semicolons: key1=val1;key2=val2;...', default='')
+@click.option('--traceback/--no-traceback', help='Display a traceback in case of error', default=False)
+@click.option('--progressbar/--no-progressbar', help='Display a progressbar', default=None,
+              callback=validate_progressbar)
+@click.option('--wait-for-completion/--no-wait-for-completion', help='Create a Elasticsearch task to perform the update'
+                                                                     'asynchronously', default=True)
+@click.option('--scroll-size', help='Size of the scroll request that powers the operation.', default=1000)
+@click.argument('json-path', type=click.Path(exists=True))
+@client_options
+def tagging_by_query(**options):
+    # Instantiate a TaggerByQuery class with all the options
+    tagger = TaggerByQuery(**options)
+    tagger.start()
@@ -1,10 +1,76 @@
 from typing import Optional
 from pathlib import Path
 from os.path import join, isfile
+from threading import Lock
 
 import configparser
 import os
 
+import click
+
+
+# The configuration file is found and parsed once, then shared by every reader
+# of the process until it moves (another working directory or TARENTULA_CONFIG)
+# or it's explicitly invalidated
+class ConfigStore:
+    def __init__(self):
+        self.lock = Lock()
+        self.invalidate()
+
+    def invalidate(self):
+        self.paths = None
+        self.path = None
+        self.config = None
+
+    @property
+    def config_paths(self) -> list:
+        env_value = os.getenv('TARENTULA_CONFIG', None)
+        return [
+            None if env_value is None else os.path.abspath(env_value),
+            join(os.getcwd(), 'tarentula.ini'),
+            join(Path.home(), '.tarentula.ini'),
+            '/etc/tarentua/tarentua.ini'
+        ]
+
+    def load(self):
+        paths = self.config_paths
+        with self.lock:
+            if self.config is None or paths != self.paths:
+                self.paths = paths
+                self.path = next((path for path in paths if path is not None and isfile(path)), None)
+                # DEFAULT is parsed as any other section so a section only has its own values
+                self.config = configparser.ConfigParser(default_section=None)
+                if self.path is not None:
+                    self.config.read(self.path)
+            return self.config
+
+    def has_section(self, section) -> bool:
+        return section == 'DEFAULT' or self.load().has_section(section)
+
+    def get(self, name, default_value=None, sections=(), value_type=None):
+        # The first section defining the value wins, DEFAULT values are shared by all
+        config = self.load()
+        for section in dict.fromkeys((*sections, 'DEFAULT')):
+            if config.has_section(section) and config.has_option(section, name):
+                return self.typed(config[section][name], value_type or type(default_value))
+        return default_value
+
+    @staticmethod
+    def typed(value, value_type):
+        # Values which can't be converted are left as they are for click to report them
+        converters = {
+            bool: lambda value: configparser.ConfigParser.BOOLEAN_STATES[value.lower()],
+            int: int,
+            float: float,
+        }
+        try:
+            return converters.get(value_type, str)(value)
+        except (KeyError, ValueError):
+            return value
+
+
+config_store = ConfigStore()
+
 
 class ConfigFileReader:
     def __init__(self, name, default_value=None, section='DEFAULT'):
@@ -13,52 +79,24 @@ class ConfigFileReader:
         self.section = section
 
     def __call__(self) -> Optional[str]:
-        if self.config_has_section:
-            return self.config[self.section].get(self.name, self.default_value)
-        return self.default_value
+        # A section named after the running command overrides the other ones
+        context = click.get_current_context(silent=True)
+        sections = (self.section,) if context is None else (context.info_name, self.section)
+        return config_store.get(self.name, self.default_value, sections)
 
     @property
     def config(self):
-        config = configparser.ConfigParser()
-        if self.config_path is not None:
-            config.read(self.config_path)
-        return config
+        return config_store.load()
 
     @property
     def config_has_section(self):
-        return self.section == 'DEFAULT' or self.config.has_section(self.section)
+        return config_store.has_section(self.section)
 
     @property
     def config_path(self) -> Optional[str]:
-        for path in self.config_paths:
-            if path is not None and isfile(path):
-                return path
-        return None
+        config_store.load()
+        return config_store.path
 
     @property
     def config_paths(self) -> list:
-        return [
-            self.env_path,
-            self.current_directory_path,
-            self.home_directory_path,
-            self.system_directory_path
-        ]
-
-    @property
-    def env_path(self) -> Optional[str]:
-        env_value = os.getenv('TARENTULA_CONFIG', None)
-        if env_value is not None:
-            return os.path.abspath(env_value)
-        return None
-
-    @property
-    def home_directory_path(self) -> str:
-        return join(Path.home(), '.tarentula.ini')
-
-    @property
-    def current_directory_path(self) -> str:
-        return join(os.getcwd(), 'tarentula.ini')
-
-    @property
-    def system_directory_path(self) -> str:
-        return '/etc/tarentua/tarentua.ini'
+        return config_store.config_paths
@@ -14,7 +14,8 @@ class Count(Command):
                  apikey: str = None,
                  elasticsearch_url: str = None,
                  traceback: bool = False,
-                 type: str = 'Document'):
+                 type: str = 'Document',
+                 **client_options):
         super().__init__(query, type)
         self.datashare_url = datashare_url
         self.datashare_project = datashare_project
@@ -26,7 +27,8 @@ class Count(Command):
                                                     elasticsearch_url,
                                                     datashare_project,
                                                     cookies,
-                                                    apikey)
+                                                    apikey,
+                                                    **client_options)
         except (ConnectionRefusedError, ConnectionError):
             logger.critical('Unable to connect to Datashare', exc_info=self.traceback)
             sys.exit()
@@ -42,6 +44,8 @@ class Count(Command):
         return count
 
     def start(self):
-        count = self.log_matches()
-        logger.info('Number of matched elements: %s', count)
-        print(f'Number of matched elements: {count}')
+        # Connections and the trace file are released once the command is over
+        with self.datashare_client:
+            count = self.log_matches()
+            logger.info('Number of matched elements: %s', count)
+            print(f'Number of matched elements: {count}')
@@ -1,46 +1,302 @@
 from contextlib import contextmanager
 from datetime import datetime
 from http.cookies import SimpleCookie
+from itertools import islice
+from time import sleep
 from uuid import uuid4
 import requests
 
+from tarentula.bootstrap_cache import BootstrapCache, BOOTSTRAP_CACHE_TTL_SEC
+from tarentula.json_codec import dumps, loads
 from tarentula.logger import logger
+from tarentula.prefetch import merged, prefetched, PREFETCH_DEPTH
+from tarentula.streaming import StreamedResponse
+from tarentula.retry import RetryPolicy, CircuitBreaker, RETRY_MAX_RETRIES, RETRY_BACKOFF_FACTOR, \
+    CIRCUIT_BREAKER_THRESHOLD, CIRCUIT_BREAKER_TIMEOUT_SEC
+from tarentula.trace import RequestTrace, SLOW_REQUEST_MS
+from tarentula.transport import create_transport, HTTP_REQUEST_TIMEOUT_SEC, HTTP_POOL_CONNECTIONS, \
+    HTTP_POOL_MAXSIZE, HTTP_GZIP_MIN_SIZE
 
 
 def urljoin(*args):
     return '/'.join(s.strip('/') for s in args if s is not None)
 
 
+def filter_params(filter_path):
+    # Elasticsearch expects a comma-separated list of paths
+    return ','.join(filter_path) if filter_path else None
+
+
+def parse_cookies(cookies_string):
+    cookies = SimpleCookie()
+    try:
+        cookies.load(cookies_string)
+        return {key: morsel.value for (key, morsel) in cookies.items()}
+    except (TypeError, AttributeError):
+        return {}
+
+
+def page_summary(response):
+    # Number of hits and last hit of a page, once it has been read
+    if isinstance(response, StreamedResponse):
+        response.drain()
+        return response.num_hits, response.last_hit
+    hits = response_hits(response)
+    return len(hits), hits[-1] if hits else None
+
+
+def page_scroll_id(response):
+    # The scroll id comes before the hits, it's known even if a streamed page isn't read to its end
+    if isinstance(response, StreamedResponse):
+        return response.fields.get('_scroll_id')
+    return response.get('_scroll_id')
+
+
+def scan_sort(sort_by='_doc', order_by=None):
+    # Index order is the cheapest to read and is ascending, other fields
+    # (like the relevance) are descending unless told otherwise
+    if order_by is None:
+        order_by = 'asc' if sort_by in INDEX_ORDER_FIELDS else 'desc'
+    return {sort_by: order_by}
+
+
+def sort_fields(sort=None):
+    return [] if sort is None else list(sort) if isinstance(sort, list) else [sort]
+
+
+def sort_field_name(field):
+    return field if isinstance(field, str) else next(iter(field), None)
+
+
+def is_index_order(sort=None):
+    return any(sort_field_name(field) in INDEX_ORDER_FIELDS for field in sort_fields(sort))
+
+
+def pit_sort(sort=None):
+    sort = sort_fields(sort)
+    # In a point in time, the index order is the position of documents in shards
+    sort = [{'_shard_doc': field['_doc']} if isinstance(field, dict) and '_doc' in field
+            else '_shard_doc' if field == '_doc' else field for field in sort]
+    # Documents with the same sort values are ordered by their position in shards
+    if not any('_shard_doc' in field for field in sort):
+        sort.append({'_shard_doc': 'asc'})
+    return sort
+
+
+def pit_pagination(pagination='auto', sort=None):
+    # Whether results are read from a point in time, None when it depends on their number
+    if pagination != 'auto':
+        return pagination == 'pit'
+    # The index order is only stable from a point in time
+    if is_index_order(sort):
+        return True
+    return None
+
+
+def scan_args(kwargs, limit=0):
+    # "from" cannot be used in a scroll context and the limit is applied on hits
+    kwargs.pop('from', None)
+    if (limit != 0) and (kwargs.get('size', limit) > limit):
+        kwargs['size'] = limit
+    return kwargs
+
+
+def first_page_args(kwargs, limit=0):
+    # for low limit value cases
+    if (limit != 0) and (kwargs['size'] > limit):
+        kwargs['size'] = limit
+    return kwargs
+
+
+def next_page_args(kwargs, last_hit, num_read, limit=0, from_=0):
+    # update size window for next iteration, there is no next page once the limit is reached
+    if (limit != 0) and (kwargs['size'] + num_read > limit):
+        kwargs['size'] = limit - num_read
+    if kwargs['size'] <= 0:
+        return None
+    if 'sort' in last_hit:
+        return {**{k: v for k, v in kwargs.items() if k != 'from'}, 'search_after': last_hit['sort']}
+    kwargs['from'] = from_ + num_read
+    return kwargs
+
+
+def follow_pit(pit, response):
+    # The point in time id can change from one page to another
+    if pit is not None:
+        pit['id'] = response.get('pit_id', pit['id'])
+
+
+def count_body(query=None):
+    # Query files can have no query at all
+    if query is None or 'query' not in query:
+        return {'query': {'match_all': {}}}
+    return query
+
+
+def batches(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def mget_body(ids, source=None):
+    # Ids are given alone or with their routing, root documents are routed by their own id
+    docs = []
+    for item in ids:
+        document_id, routing = item if isinstance(item, tuple) else (item, None)
+        doc = {'_id': document_id, 'routing': routing or document_id}
+        if source is not None:
+            doc['_source'] = source
+        docs.append(doc)
+    return {'docs': docs}
+
+
+def indexed_source(document=None):
+    # Clone the document to perform changes
+    document = dict(document or {})
+    # Elasticsearch doesn't allow passing the _id as a property in the document
+    document.pop('_id', None)
+    document.pop('_routing', None)
+    if 'content' in document:
+        content_length = len(document.get('content', ''))
+        document.update({'contentLength': content_length})
+    now = datetime.now()
+    extraction_date = now.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
+    document.update({'extractionDate': extraction_date})
+    return document
+
+
+def bulk_action(action, index, id=None, routing=None):  # pylint: disable=redefined-builtin
+    metadata = {'_index': index, '_id': id, 'routing': routing}
+    return dumps({action: {key: value for key, value in metadata.items() if value is not None}}) + b'\n'
+
+
+def bulk_chunks(operations, chunk_size, chunk_bytes):
+    # Operations are grouped until the chunk reaches one of the limits, an
+    # operation bigger than `chunk_bytes` is sent alone. A chunk can be retried
+    # only if all its operations can.
+    chunk, size, idempotent = [], 0, True
+    for operation, operation_idempotent in operations:
+        if chunk and (len(chunk) >= chunk_size or size + len(operation) > chunk_bytes):
+            yield b''.join(chunk), idempotent
+            chunk, size, idempotent = [], 0, True
+        chunk.append(operation)
+        size += len(operation)
+        idempotent = idempotent and operation_idempotent
+    if chunk:
+        yield b''.join(chunk), idempotent
+
+
+def bulk_errors(response):
+    # Failures are reported item by item, the other items of the chunk are applied
+    if not response.get('errors', False):
+        return
+    for item in response.get('items', []):
+        for action, result in item.items():
+            if 'error' in result:
+                error = result['error']
+                reason = error.get('reason', error) if isinstance(error, dict) else error
+                logger.warning('Unable to %s document %s (%s): %s', action, result.get('_id'), result.get('status'),
+                               reason)
+                yield {'action': action, '_id': result.get('_id'), 'status': result.get('status'), 'error': error}
+
+
+def copied_settings(settings):
+    index_settings = settings.get('index', {})
+    return {'index': {key: value for key, value in index_settings.items() if key not in INDEX_PRIVATE_SETTINGS}}
+
+
+def task_progress(task):
+    # Sliced tasks report the sum of their slices
+    status = task.get('task', {}).get('status', {})
+    done = sum(status.get(key, 0) for key in ('created', 'updated', 'deleted', 'version_conflicts'))
+    return done, status.get('total', 0)
+
+
+def found_documents(response):
+    for document in response.get('docs', []):
+        if document.pop('found', False):
+            yield document
+        else:
+            logger.warning('Document %s not found', document.get('_id'))
+
+
+def response_hits(response):
+    if isinstance(response, StreamedResponse):
+        return response.hits()
+    # Filtered responses have no "hits" at all when nothing matched
+    return response.get('hits', {}).get('hits', [])
+
+
 DATASHARE_DEFAULT_PROJECT = 'local-datashare'
 DATASHARE_DEFAULT_URL = 'http://localhost:8080'
 ELASTICSEARCH_DEFAULT_URL = 'local-datashare'
-HTTP_REQUEST_TIMEOUT_SEC = 60
-
-
-class DatashareClient:
-    def __init__(self, datashare_url=DATASHARE_DEFAULT_URL, elasticsearch_url=ELASTICSEARCH_DEFAULT_URL,
-                 datashare_project=DATASHARE_DEFAULT_PROJECT, cookies='', apikey=None):
+# Only the parts of search responses read when iterating over hits
+HITS_FILTER_PATH = ('_scroll_id', 'pit_id', 'hits.hits._id', 'hits.hits._routing', 'hits.hits._source',
+                    'hits.hits.sort', 'took')
+# Only the parts of multi get responses read when iterating over documents
+DOCS_FILTER_PATH = ('docs._id', 'docs._routing', 'docs._source', 'docs.found')
+MGET_BATCH_SIZE = 1000
+BULK_CHUNK_SIZE = 500
+BULK_CHUNK_BYTES = 5 * 1024 * 1024
+CLONE_METHODS = ('reindex', 'clone')
+CLONE_POLL_SEC = 1
+# Settings Elasticsearch sets by itself when an index is created
+INDEX_PRIVATE_SETTINGS = ('creation_date', 'uuid', 'version', 'provided_name', 'routing', 'resize', 'blocks',
+                          'history_uuid', 'verified_before_close')
+INDEX_ORDER_FIELDS = ('_doc', '_shard_doc')
+PAGINATIONS = ('auto', 'pit', 'search-after')
+PIT_KEEP_ALIVE = '5m'
+# Results past this position can't be reached with from/size (default `index.max_result_window`)
+PIT_THRESHOLD = 10000
+# Point in time with a `_shard_doc` tiebreaker
+PIT_MIN_VERSION = (7, 12)
+
+
+# Requests to Datashare and Elasticsearch are built the same way by both
+# clients, which only differ by how they send them: the synchronous client
+# waits for every response, the asynchronous one awaits them.
+class BaseDatashareClient:
+    def __init__(self, transport_factory, datashare_url=DATASHARE_DEFAULT_URL,
+                 elasticsearch_url=ELASTICSEARCH_DEFAULT_URL, cookies='', apikey=None,
+                 pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, pool_block=False,
+                 keep_alive=True, transport='requests', gzip_min_size=HTTP_GZIP_MIN_SIZE,
+                 max_retries=RETRY_MAX_RETRIES, retry_backoff=RETRY_BACKOFF_FACTOR,
+                 circuit_breaker_threshold=CIRCUIT_BREAKER_THRESHOLD,
+                 circuit_breaker_timeout=CIRCUIT_BREAKER_TIMEOUT_SEC, bootstrap_cache_ttl=BOOTSTRAP_CACHE_TTL_SEC,
+                 trace_file=None, slow_request_ms=SLOW_REQUEST_MS, request_timeout=HTTP_REQUEST_TIMEOUT_SEC):
         self.datashare_url = datashare_url
         self.cookies_string = cookies
         self.apikey = apikey
         self.elasticsearch_url = elasticsearch_url
-        # Create the datashare default index
-        self.create(datashare_project)
+        self.request_timeout = request_timeout
+        # Scroll contexts kept open on the server, cleared once their scan is over
+        self.open_contexts = set()
+        # Cookies and headers are sent with most requests so we parse them only once
+        self.cookies = parse_cookies(cookies)
+        self.headers = None if apikey is None else {'Authorization': f'bearer {apikey}'}
+        # Requests can be recorded with their timings, and logged when they are slow
+        self.trace = RequestTrace(trace_file, slow_request_ms) if trace_file or slow_request_ms > 0 else None
+        # Requests are retried with a backoff and paused all together when the server is overloaded
+        breaker = CircuitBreaker(circuit_breaker_threshold, circuit_breaker_timeout)
+        retry_policy = RetryPolicy(max_retries, retry_backoff, circuit_breaker=breaker)
+        self.transport = transport_factory(transport,
+                                           pool_connections=pool_connections,
+                                           pool_maxsize=pool_maxsize,
+                                           pool_block=pool_block,
+                                           keep_alive=keep_alive,
+                                           gzip_min_size=gzip_min_size,
+                                           retry_policy=retry_policy,
+                                           trace=self.trace)
+        # Elasticsearch version and mappings are kept between runs
+        self.bootstrap_cache = BootstrapCache(bootstrap_cache_ttl)
 
     @property
-    def cookies(self):
-        cookies = SimpleCookie()
-        try:
-            cookies.load(self.cookies_string)
-            return {key: morsel.value for (key, morsel) in cookies.items()}
-        except (TypeError, AttributeError):
-            return {}
-
-    @property
-    def headers(self):
-        if self.apikey is None:
-            return None
-        return {'Authorization': f'bearer {self.apikey}'}
+    def retry_policy(self):
+        return self.transport.retry_policy
 
     @property
     def elasticsearch_host(self):
@@ -49,31 +305,186 @@ class DatashareClient:
         # @see https://github.com/ICIJ/datashare/wiki/Datashare-API
         return urljoin(self.datashare_url, '/api/index/search/')
 
+    def search_pagination(self, pagination='auto'):
+        # Datashare only proxies the searches of a project, a point in time is
+        # only opened through it when it's explicitly asked for
+        if pagination == 'auto' and self.elasticsearch_url is None:
+            return 'search-after'
+        return pagination
+
+    def request_options(self, **options):
+        # Arguments of a transport request, sent with the credentials of the client
+        return {**options, 'cookies': self.cookies, 'headers': self.headers, 'timeout': self.request_timeout}
+
+    def search_request(self, index=DATASHARE_DEFAULT_PROJECT, query=None, q=None, source=None, scroll=None,
+                       filter_path=None, pit=None, **kwargs):
+        if query is None:
+            query = {}
+        local_query = {**query, **kwargs}
+
+        if source is not None:
+            local_query.update({'_source': source})
+        url = urljoin(self.elasticsearch_host, index, '/_search')
+        # A point in time already targets its index
+        if pit is not None:
+            local_query.update({'pit': pit})
+            url = urljoin(self.elasticsearch_host, '/_search')
+        params = {"q": q, "scroll": scroll, "filter_path": filter_params(filter_path)}
+        return self.request_options(url=url, params=params, json=local_query, idempotent=True)
+
+    def scroll_request(self, scroll_id, scroll=None, filter_path=None):
+        url = urljoin(self.elasticsearch_host, '/_search/scroll')
+        body = {"scroll_id": scroll_id, "scroll": scroll}
+        # A rejected scroll request is sent again with the same scroll id
+        return self.request_options(url=url, json=body, params={"filter_path": filter_params(filter_path)},
+                                    idempotent=True)
+
+    def clear_scroll_request(self, scroll_ids):
+        self.open_contexts.difference_update(scroll_ids)
+        url = urljoin(self.elasticsearch_host, '/_search/scroll')
+        return self.request_options(url=url, json={'scroll_id': list(scroll_ids)})
+
+    def open_pit_request(self, index=DATASHARE_DEFAULT_PROJECT, keep_alive=PIT_KEEP_ALIVE):
+        url = urljoin(self.elasticsearch_host, index, '/_pit')
+        return self.request_options(url=url, params={'keep_alive': keep_alive}, idempotent=True)
+
+    def opened_pit(self, response, keep_alive=PIT_KEEP_ALIVE):
+        response.raise_for_status()
+        pit_id = loads(response.content)['id']
+        self.open_contexts.add(pit_id)
+        logger.debug('Opened point in time, %s search context(s) open', len(self.open_contexts))
+        return {'id': pit_id, 'keep_alive': keep_alive}
+
+    def close_pit_request(self, pit_id):
+        self.open_contexts.discard(pit_id)
+        url = urljoin(self.elasticsearch_host, '/_pit')
+        return self.request_options(url=url, json={'id': pit_id})
+
+    @staticmethod
+    def closed_context(response):
+        # Contexts which already expired are not found
+        if response.status_code != requests.codes.not_found:
+            response.raise_for_status()
+
+    def track_scroll(self, scroll_ids, response):
+        scroll_id = page_scroll_id(response)
+        if scroll_id is not None and scroll_id not in scroll_ids:
+            scroll_ids.add(scroll_id)
+            self.open_contexts.add(scroll_id)
+            logger.debug('Opened scroll context, %s search context(s) open', len(self.open_contexts))
+        return scroll_id
+
+    def count_request(self, index=DATASHARE_DEFAULT_PROJECT, query=None):
+        if query is None: query = {}
+        query = {'query': query['query']}
+        url = urljoin(self.elasticsearch_host, index, '_count')
+        return self.request_options(url=url, json=query, idempotent=True)
+
+    def document_request(self, index=DATASHARE_DEFAULT_PROJECT, id=None, routing=None, source=None):
+        url = urljoin(self.elasticsearch_host, index, '/_doc/', id)
+        return self.request_options(url=url, params={'routing': routing, '_source': source})
+
+    def mget_request(self, index=DATASHARE_DEFAULT_PROJECT, ids=None, source=None):
+        url = urljoin(self.elasticsearch_host, index, '/_mget')
+        return self.request_options(url=url, json=mget_body(ids, source), idempotent=True,
+                                    params={'filter_path': filter_params(DOCS_FILTER_PATH)})
+
+    def download_request(self, index=DATASHARE_DEFAULT_PROJECT, id=None, routing=None):
+        routing = routing or id
+        url = urljoin(self.datashare_url, 'api', index, '/documents/src', id)
+        return self.request_options(url=url, params={'routing': routing})
+
+    def tag_request(self, index=DATASHARE_DEFAULT_PROJECT, id=None, routing=None, tags=None):
+        routing = routing or id
+        # @see https://github.com/ICIJ/datashare/wiki/Datashare-API
+        url = urljoin(self.datashare_url, 'api', index, '/documents/tags', id)
+        return self.request_options(url=url, params={'routing': routing}, json=tags or [])
+
+    def scan_or_query_all(self, datashare_project, source_fields_names, sort_by, order_by, scroll, query_body, from_,
+                          limit, size, filter_path=HITS_FILTER_PATH, pagination='auto', slices=1, on_slice_hit=None,
+                          matches=None):
+        index = datashare_project
+        source = source_fields_names
+        sort = scan_sort(sort_by, order_by)
+        if scroll is None:
+            logger.info('Searching document(s) metadata in %s', index)
+            return self.query_all(
+                **{'index': index, 'query': query_body, 'source': source, 'sort': sort, 'from': from_, 'limit': limit,
+                   'size': size, 'filter_path': filter_path, 'pagination': pagination, 'slices': slices,
+                   'on_slice_hit': on_slice_hit, 'matches': matches})
+
+        logger.info('Scrolling over document(s) metadata in %s', index)
+        if from_ > 0:
+            logger.warning('"from" will not be used when scrolling documents')
+        scroll_after_args = {'size': size, 'from': from_, 'limit': limit, 'sort': sort}
+        return self.scan_all(index=index, query=query_body, source=source, scroll=scroll, filter_path=filter_path,
+                             slices=slices, on_slice_hit=on_slice_hit, **scroll_after_args)
+
+
+class DatashareClient(BaseDatashareClient):
+    def __init__(self, datashare_url=DATASHARE_DEFAULT_URL, elasticsearch_url=ELASTICSEARCH_DEFAULT_URL,
+                 datashare_project=DATASHARE_DEFAULT_PROJECT, cookies='', apikey=None,
+                 stream_hits=False, prefetch=PREFETCH_DEPTH, create_project=False, **client_options):
+        super().__init__(create_transport, datashare_url, elasticsearch_url, cookies, apikey, **client_options)
+        # Search pages are decoded hit by hit instead of being loaded at once
+        self.stream_hits = stream_hits
+        # Number of pages fetched in the background while the current one is consumed
+        self.prefetch = prefetch
+        # Commands only read or change documents of an existing project, it's
+        # only created on demand
+        if create_project:
+            self.create(datashare_project)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def close(self):
+        self.transport.close()
+        if self.trace is not None:
+            self.trace.close()
+
     def create(self, index=DATASHARE_DEFAULT_PROJECT):
         url = urljoin(self.datashare_url, '/api/index/', index)
-        return requests.put(url, timeout=HTTP_REQUEST_TIMEOUT_SEC)
+        return self.transport.put(url, timeout=self.request_timeout)
+
+    @property
+    def version(self):
+        version = self.bootstrap_cache.get('version', self.elasticsearch_host)
+        if version is None:
+            version = self.bootstrap_cache.set(self.request_version(), 'version', self.elasticsearch_host)
+        return tuple(version) if version else None
+
+    def request_version(self):
+        # Only Elasticsearch itself tells its version, not the Datashare proxy
+        if self.elasticsearch_url is None:
+            return []
+        try:
+            response = self.transport.get(self.elasticsearch_url, cookies=self.cookies,
+                                          headers=self.headers, timeout=self.request_timeout)
+            response.raise_for_status()
+            number = loads(response.content)['version']['number']
+            return [int(part) for part in number.split('-')[0].split('.')]
+        except (requests.RequestException, ValueError, KeyError, TypeError):
+            return []
+
+    @property
+    def supports_pit(self):
+        version = self.version
+        # An unknown version might support it
+        return version is None or version >= PIT_MIN_VERSION
 
     def index(self, index=DATASHARE_DEFAULT_PROJECT, document=None, id=None, routing=None):
-        if document is None:
-            document = {}
         params = {'routing': routing}
-        # Clone the document to perform changes
-        document = dict(document)
-        # Elasticsearch doesn't allow passing the _id as a property in the document
-        if '_id' in document:
-            document.pop('_id', None)
-        if '_routing' in document:
-            document.pop('_routing', None)
+        document = indexed_source(document)
+        # New fields might be added to the mappings
+        self.bootstrap_cache.invalidate('mappings', self.elasticsearch_host, index)
         # When no id is provided, we use POST method (to create the resource)
-        if 'content' in document:
-            content_length = len(document.get('content', ''))
-            document.update({'contentLength': content_length})
-        now = datetime.now()
-        extraction_date = now.strftime('%Y-%m-%dT%H:%M:%S.%f')[:-3] + 'Z'
-        document.update({'extractionDate': extraction_date})
         if id is None:
             url = urljoin(self.elasticsearch_url, index, '/_doc?refresh')
-            result = requests.post(url, json=document, params=params, timeout=HTTP_REQUEST_TIMEOUT_SEC)
+            result = self.transport.post(url, json=document, params=params, timeout=self.request_timeout)
         # When an id is provided, we use PUT method (to update the resource)
         else:
             if routing is None:
@@ -81,27 +492,59 @@ class DatashareClient:
             else:
                 query_params = '?refresh&routing=' + routing
             url = urljoin(self.elasticsearch_url, index, '/_doc/', id, query_params)
-            result = requests.put(url, json=document, params=params, timeout=HTTP_REQUEST_TIMEOUT_SEC)
+            result = self.transport.put(url, json=document, params=params, timeout=self.request_timeout)
         result.raise_for_status()
-        return result.json().get('_id')
+        return loads(result.content).get('_id')
 
     def delete(self, index=DATASHARE_DEFAULT_PROJECT, id=None):
         url = urljoin(self.elasticsearch_url, index, '/_doc/', id, '?refresh')
-        return requests.delete(url, timeout=HTTP_REQUEST_TIMEOUT_SEC)
+        return self.transport.delete(url, timeout=self.request_timeout)
+
+    def bulk_index(self, index=DATASHARE_DEFAULT_PROJECT, documents=None, refresh=True,
+                   chunk_size=BULK_CHUNK_SIZE, chunk_bytes=BULK_CHUNK_BYTES):
+        # Documents without id get a new one each time they are sent, so they can't be sent twice
+        operations = ((bulk_action('index', index, document.get('_id'), document.get('_routing'))
+                       + dumps(indexed_source(document)) + b'\n', '_id' in document) for document in documents or [])
+        # New fields might be added to the mappings
+        self.bootstrap_cache.invalidate('mappings', self.elasticsearch_host, index)
+        return self.bulk(index, operations, refresh, chunk_size, chunk_bytes)
+
+    def bulk_delete(self, index=DATASHARE_DEFAULT_PROJECT, ids=None, refresh=True,
+                    chunk_size=BULK_CHUNK_SIZE, chunk_bytes=BULK_CHUNK_BYTES):
+        # Ids are given alone or with their routing
+        operations = ((bulk_action('delete', index, *(item if isinstance(item, tuple) else (item, None))), True)
+                      for item in ids or [])
+        return self.bulk(index, operations, refresh, chunk_size, chunk_bytes)
+
+    def bulk(self, index, operations, refresh=True, chunk_size=BULK_CHUNK_SIZE, chunk_bytes=BULK_CHUNK_BYTES):
+        url = urljoin(self.elasticsearch_url, '/_bulk')
+        errors = []
+        for body, idempotent in bulk_chunks(operations, chunk_size, chunk_bytes):
+            response = self.transport.post(url, data=body, compress=True, idempotent=idempotent,
+                                           params={'filter_path': 'errors,items.*._id,items.*.status,items.*.error'},
+                                           headers={'Content-Type': 'application/x-ndjson'},
+                                           timeout=self.request_timeout)
+            response.raise_for_status()
+            errors.extend(bulk_errors(loads(response.content)))
+        # Documents are made visible to searches once, after every chunk
+        if refresh:
+            self.refresh(index).raise_for_status()
+        return errors
 
     def refresh(self, index=DATASHARE_DEFAULT_PROJECT):
         url = urljoin(self.elasticsearch_url, index, '/_refresh')
-        return requests.post(url, timeout=HTTP_REQUEST_TIMEOUT_SEC)
+        return self.transport.post(url, idempotent=True, timeout=self.request_timeout)
 
     def delete_index(self, index):
         url = urljoin(self.elasticsearch_url, index)
-        return requests.delete(url, timeout=HTTP_REQUEST_TIMEOUT_SEC)
+        self.bootstrap_cache.invalidate('mappings', self.elasticsearch_host, index)
+        return self.transport.delete(url, timeout=self.request_timeout)
 
     def delete_all(self, index):
         url = urljoin(self.elasticsearch_url, index, '_delete_by_query')
         body = {"query": {"match_all": {}}}
         params = {"conflicts": "proceed", "refresh": 'true'}
-        return requests.post(url, json=body, params=params, timeout=HTTP_REQUEST_TIMEOUT_SEC)
+        return self.transport.post(url, json=body, params=params, idempotent=True, timeout=self.request_timeout)
 
     def reindex(self, source=DATASHARE_DEFAULT_PROJECT, dest=None, size=1):
         # Create a default destination index name
@@ -113,7 +556,7 @@ class DatashareClient:
         json = {"source": {"index": source}, "dest": {"index": dest}, "size": size}
         # Send the request to elasticsearch
         url = urljoin(self.elasticsearch_url, '_reindex')
-        result = requests.post(url + '?refresh', json=json, timeout=HTTP_REQUEST_TIMEOUT_SEC)
+        result = self.transport.post(url + '?refresh', json=json, timeout=self.request_timeout)
         # Delete the dummy docs
         self.delete(source, document_id)
         self.delete(dest, document_id)
@@ -121,128 +564,331 @@ class DatashareClient:
         # Return the dest name
         return dest if result.status_code == requests.codes.ok else None
 
-    def query(self, index=DATASHARE_DEFAULT_PROJECT, query=None, q=None, source=None, scroll=None, **kwargs):
-        if query is None:
-            query = {}
-        local_query = {**query, **kwargs}
-
-        if source is not None:
-            local_query.update({'_source': source})
-        url = urljoin(self.elasticsearch_host, index, '/_search')
-        response = requests.post(url, params={"q": q, "scroll": scroll},
-                                 json=local_query,
-                                 headers=self.headers,
-                                 cookies=self.cookies, timeout=HTTP_REQUEST_TIMEOUT_SEC)
+    def clone(self, source=DATASHARE_DEFAULT_PROJECT, dest=None, method='reindex', slices='auto', on_progress=None,
+              poll_interval=CLONE_POLL_SEC):
+        if method not in CLONE_METHODS:
+            raise ValueError(f'Unknown clone method: {method}')
+        # Unlike `reindex`, every document of the source is copied
+        if dest is None:
+            dest = f'{source}-copy-{uuid4().hex[:6]}'
+        try:
+            if method == 'clone':
+                self.clone_index(source, dest)
+            else:
+                self.reindex_all(source, dest, slices, on_progress, poll_interval)
+        except requests.RequestException:
+            # A partial copy is useless
+            self.delete_index(dest)
+            raise
+        return dest
+
+    def clone_index(self, source, dest):
+        # The clone API copies the segments of the source, which must be read-only meanwhile
+        url = urljoin(self.elasticsearch_url, source, '_settings')
+        response = self.transport.get(url, params={'filter_path': '*.settings.index.blocks.write'},
+                                      timeout=self.request_timeout)
         response.raise_for_status()
-        return response.json()
+        read_only = any(str(index['settings']['index']['blocks']['write']) == 'true'
+                        for index in loads(response.content or b'{}').values())
+        if not read_only:
+            self.transport.put(url, json={'index.blocks.write': True},
+                               timeout=self.request_timeout).raise_for_status()
+        try:
+            clone_url = urljoin(self.elasticsearch_url, source, '_clone', dest)
+            body = {'settings': {'index.blocks.write': None}}
+            self.transport.post(clone_url, json=body, params={'wait_for_active_shards': 1},
+                                timeout=self.request_timeout).raise_for_status()
+        finally:
+            # The source is only made writable again if it was before
+            if not read_only:
+                self.transport.put(url, json={'index.blocks.write': None}, timeout=self.request_timeout)
 
-    def scroll(self, scroll_id, scroll=None):
-        url = urljoin(self.elasticsearch_host, '/_search/scroll')
-        body = {"scroll_id": scroll_id, "scroll": scroll}
-        response = requests.post(url, json=body,
-                                 cookies=self.cookies,
-                                 headers=self.headers, timeout=HTTP_REQUEST_TIMEOUT_SEC)
+    def reindex_all(self, source, dest, slices='auto', on_progress=None, poll_interval=CLONE_POLL_SEC):
+        settings = self.create_like(source, dest)
+        url = urljoin(self.elasticsearch_url, '_reindex')
+        body = {'source': {'index': source}, 'dest': {'index': dest}}
+        # The reindex runs as a background task so it isn't bound to the request timeout
+        params = {'slices': slices, 'wait_for_completion': 'false'}
+        response = self.transport.post(url, json=body, params=params, timeout=self.request_timeout)
+        response.raise_for_status()
+        self.wait_for_task(loads(response.content)['task'], on_progress, poll_interval)
+        self.transport.put(urljoin(self.elasticsearch_url, dest, '_settings'), json=settings,
+                           timeout=self.request_timeout).raise_for_status()
+        self.refresh(dest).raise_for_status()
+
+    def create_like(self, source, dest):
+        # The destination gets the settings and the mappings of the source, without
+        # replicas nor refreshes while documents are copied. The settings to restore
+        # once the copy is done are returned.
+        response = self.transport.get(urljoin(self.elasticsearch_url, source), timeout=self.request_timeout)
         response.raise_for_status()
-        return response.json()
-
-    def scan_all(self, scroll='10m', **kwargs):
-        response = self.query(scroll=scroll, **kwargs)
-        while len(response['hits']['hits']) > 0:
-            for item in response['hits']['hits']:
-                yield item
-            if '_scroll_id' not in response:
+        # The source can be an alias
+        definition = next(iter(loads(response.content).values()))
+        settings = copied_settings(definition.get('settings', {}))
+        restored = {'index': {'number_of_replicas': settings['index'].get('number_of_replicas'),
+                              'refresh_interval': settings['index'].get('refresh_interval')}}
+        settings['index'].update({'number_of_replicas': 0, 'refresh_interval': '-1'})
+        body = {'settings': settings, 'mappings': definition.get('mappings', {})}
+        self.transport.put(urljoin(self.elasticsearch_url, dest), json=body,
+                           timeout=self.request_timeout).raise_for_status()
+        return restored
+
+    def wait_for_task(self, task_id, on_progress=None, poll_interval=CLONE_POLL_SEC):
+        url = urljoin(self.elasticsearch_url, '_tasks', task_id)
+        while True:
+            response = self.transport.get(url, timeout=self.request_timeout)
+            response.raise_for_status()
+            task = loads(response.content)
+            done, total = task_progress(task)
+            if on_progress is not None:
+                on_progress(done, total)
+            logger.debug('Task %s: %s/%s documents', task_id, done, total)
+            if task.get('completed', False):
                 break
-            scroll_id = response['_scroll_id']
-            response = self.scroll(scroll_id, scroll)
+            sleep(poll_interval)
+        failures = task.get('response', {}).get('failures', [])
+        if 'error' in task or failures:
+            raise requests.HTTPError(f'Task {task_id} failed: {task.get("error") or failures[0]}')
+        return task
+
+    def query(self, index=DATASHARE_DEFAULT_PROJECT, query=None, q=None, source=None, scroll=None, filter_path=None,
+              stream=False, pit=None, **kwargs):
+        response = self.transport.post(stream=stream, **self.search_request(index, query, q, source, scroll,
+                                                                            filter_path, pit, **kwargs))
+        return self.search_response(response, stream)
+
+    def search_response(self, response, stream=False):
+        response.raise_for_status()
+        # Streamed responses are decoded hit by hit while they are iterated
+        if stream:
+            return StreamedResponse(response)
+        return loads(response.content)
 
-    def query_all(self, **kwargs):
-        # for low limit value cases
-        limit = kwargs.pop('limit', 0)
-        if (limit != 0) and (kwargs['size'] > limit):
-            kwargs['size'] = limit
+    def scroll(self, scroll_id, scroll=None, filter_path=None, stream=False):
+        response = self.transport.post(stream=stream, **self.scroll_request(scroll_id, scroll, filter_path))
+        return self.search_response(response, stream)
 
-        num_yielded = 0
-        response = self.query(**kwargs)
-        while len(response['hits']['hits']) > 0:
+    def clear_scroll(self, scroll_ids):
+        try:
+            self.closed_context(self.transport.delete(**self.clear_scroll_request(scroll_ids)))
+        except requests.RequestException as error:
+            logger.warning('Unable to clear scroll context, it will expire on its own: %s', error)
+        logger.debug('Cleared %s scroll context(s), %s search context(s) still open', len(scroll_ids),
+                     len(self.open_contexts))
+
+    def open_pit(self, index=DATASHARE_DEFAULT_PROJECT, keep_alive=PIT_KEEP_ALIVE):
+        return self.opened_pit(self.transport.post(**self.open_pit_request(index, keep_alive)), keep_alive)
 
-            for item in response['hits']['hits']:
-                yield item
+    def close_pit(self, pit_id):
+        try:
+            self.closed_context(self.transport.delete(**self.close_pit_request(pit_id)))
+        except requests.RequestException as error:
+            logger.warning('Unable to close point in time, it will expire on its own: %s', error)
+        logger.debug('Closed point in time, %s search context(s) still open', len(self.open_contexts))
+
+    def scan_all(self, scroll='10m', filter_path=HITS_FILTER_PATH, slices=1, on_slice_hit=None, **kwargs):
+        limit = kwargs.get('limit', 0)
+        if slices <= 1:
+            return self.iterate_hits(self.scan_pages(scroll, filter_path, **kwargs), limit)
+        slices_pages = [self.scan_pages(scroll, filter_path, slice={'id': slice_id, 'max': slices}, **kwargs)
+                        for slice_id in range(slices)]
+        return self.iterate_slices(slices_pages, kwargs.get('size', 10), limit, on_slice_hit)
+
+    def scan_pages(self, scroll='10m', filter_path=HITS_FILTER_PATH, **kwargs):
+        kwargs = scan_args(kwargs, kwargs.pop('limit', 0))
+        scroll_ids = set()
+        response = None
+        # The scroll context is cleared when the scan is over, stopped or interrupted
+        try:
+            response = self.query(scroll=scroll, filter_path=filter_path, stream=self.stream_hits, **kwargs)
+            while True:
+                yield response
+                num_hits, _ = page_summary(response)
+                scroll_id = self.track_scroll(scroll_ids, response)
+                if num_hits == 0 or scroll_id is None:
+                    break
+                response = self.scroll(scroll_id, scroll, filter_path, stream=self.stream_hits)
+        finally:
+            if response is not None:
+                self.track_scroll(scroll_ids, response)
+            if scroll_ids:
+                self.clear_scroll(scroll_ids)
+
+    def query_all(self, filter_path=HITS_FILTER_PATH, pagination='auto', slices=1, on_slice_hit=None, matches=None,
+                  **kwargs):
+        pagination = self.search_pagination(pagination)
+        if slices > 1 and pagination == 'search-after':
+            logger.warning('Slices can only be used with a point in time, results will be read at once')
+            slices = 1
+        # Slices of results are only consistent from a point in time
+        if slices > 1 or self.use_pit(pagination, matches=matches, **kwargs):
+            return self.pit_hits(filter_path, pagination, slices, on_slice_hit, **kwargs)
+        return self.hits_without_pit(filter_path, **kwargs)
+
+    def hits_without_pit(self, filter_path=HITS_FILTER_PATH, **kwargs):
+        # Without a point in time, the index order is only stable in a scroll context
+        if is_index_order(kwargs.get('sort')):
+            return self.scroll_hits(filter_path, **kwargs)
+        return self.iterate_hits(self.query_pages(filter_path, **kwargs))
+
+    def scroll_hits(self, filter_path=HITS_FILTER_PATH, **kwargs):
+        # A scroll can't start from an offset, the first hits are read and skipped
+        from_ = kwargs.pop('from', 0)
+        limit = kwargs.pop('limit', 0)
+        hits = self.scan_all(filter_path=filter_path, limit=limit + from_ if limit else 0, **kwargs)
+        try:
+            for position, hit in enumerate(hits):
+                if position >= from_:
+                    yield hit
+        finally:
+            hits.close()
+
+    def use_pit(self, pagination='auto', index=DATASHARE_DEFAULT_PROJECT, query=None, limit=0, matches=None,
+                **kwargs):
+        use_pit = pit_pagination(pagination, kwargs.get('sort'))
+        if use_pit is not None:
+            return use_pit
+        # Deep pages are cheaper to reach from a point in time than with from/size. Documents
+        # are only counted when the caller doesn't already know how many it will read.
+        if limit == 0:
+            limit = matches if matches is not None else self.count(index, count_body(query)).get('count', 0)
+        return kwargs.get('from', 0) + limit > PIT_THRESHOLD
+
+    def pit_hits(self, filter_path=HITS_FILTER_PATH, pagination='auto', slices=1, on_slice_hit=None,
+                 index=DATASHARE_DEFAULT_PROJECT, sort=None, **kwargs):
+        try:
+            # Point in time needs Elasticsearch 7.12 or later
+            if pagination != 'pit' and not self.supports_pit:
+                raise requests.HTTPError(f'Point in time is not supported by Elasticsearch {self.version}')
+            pit = self.open_pit(index)
+        except requests.HTTPError:
+            if pagination == 'pit':
+                raise
+            logger.warning('Unable to open a point in time, reading results without it')
+            yield from self.hits_without_pit(filter_path, index=index, sort=sort, **kwargs)
+            return
+        pit_id = pit['id']
+        sort = pit_sort(sort)
+        # The point in time is closed when the search is over, stopped or interrupted
+        try:
+            if slices <= 1:
+                yield from self.iterate_hits(self.query_pages(filter_path, pit=pit, sort=sort, **kwargs))
+                return
+            if kwargs.pop('from', 0) > 0:
+                logger.warning('"from" will not be used when reading slices of documents')
+            slices_pages = [self.query_pages(filter_path, pit=dict(pit), sort=sort,
+                                             slice={'id': slice_id, 'max': slices}, **kwargs)
+                            for slice_id in range(slices)]
+            yield from self.iterate_slices(slices_pages, kwargs.get('size', 10), kwargs.get('limit', 0), on_slice_hit)
+        finally:
+            self.open_contexts.discard(pit_id)
+            self.close_pit(pit['id'])
 
-            # update size window for next iteration
-            num_yielded += len(response['hits']['hits'])
-            if (limit != 0) and (kwargs['size'] + num_yielded > limit):
-                kwargs['size'] = limit - num_yielded
-            if kwargs['size'] == 0:
+    def query_pages(self, filter_path=HITS_FILTER_PATH, pit=None, **kwargs):
+        limit = kwargs.pop('limit', 0)
+        kwargs = first_page_args(kwargs, limit)
+        from_ = kwargs.get('from', 0)
+        num_yielded = 0
+        page_args = kwargs
+        while page_args is not None:
+            response = self.query(filter_path=filter_path, stream=self.stream_hits, pit=pit, **page_args)
+            yield response
+            num_hits, last_item = page_summary(response)
+            follow_pit(pit, response)
+            if num_hits == 0:
                 break
+            num_yielded += num_hits
+            page_args = next_page_args(kwargs, last_item, num_yielded, limit, from_)
 
-            last_item = response['hits']['hits'][-1]
-            if 'sort' in last_item:
-                search_after = last_item['sort']
-                search_after_args = {k: v for k, v in kwargs.items() if k != 'from'}
-                response = self.query(search_after=search_after, **search_after_args)
-            else:
-                if 'from' not in kwargs:
-                    kwargs['from'] = 0
-                kwargs['from'] += kwargs['size']
-                response = self.query(**kwargs)
+    def iterate_hits(self, pages, limit=0, prefetch=None):
+        # Streamed pages must be read before the next one can be requested
+        depth = 0 if self.stream_hits else self.prefetch if prefetch is None else prefetch
+        pages = prefetched(pages, depth)
+        num_yielded = 0
+        try:
+            for response in pages:
+                for hit in response_hits(response):
+                    yield hit
+                    num_yielded += 1
+                    if num_yielded == limit:
+                        return
+        finally:
+            # Stops the pages generator, and any request it would send
+            pages.close()
+
+    def iterate_slices(self, slices_pages, size, limit=0, on_slice_hit=None):
+        # Each slice is read by its own thread, up to a page of hits per slice waits to be consumed
+        slices_hits = [self.iterate_hits(pages, prefetch=0) for pages in slices_pages]
+        hits = merged(slices_hits, len(slices_hits) * size)
+        num_yielded = 0
+        try:
+            for slice_id, hit in hits:
+                if on_slice_hit is not None:
+                    on_slice_hit(slice_id)
+                yield hit
+                num_yielded += 1
+                if num_yielded == limit:
+                    return
+        finally:
+            hits.close()
 
     def mappings(self, index=DATASHARE_DEFAULT_PROJECT):
+        mappings = self.bootstrap_cache.get('mappings', self.elasticsearch_host, index)
+        if mappings is not None:
+            return mappings
         url = urljoin(self.elasticsearch_host, index, '_mappings')
-        return requests.get(url,
-                            cookies=self.cookies,
-                            headers=self.headers, timeout=HTTP_REQUEST_TIMEOUT_SEC).json()
+        response = self.transport.get(url,
+                                      cookies=self.cookies,
+                                      headers=self.headers, timeout=self.request_timeout)
+        mappings = loads(response.content)
+        # Errors are returned without being cached
+        if response.ok:
+            self.bootstrap_cache.set(mappings, 'mappings', self.elasticsearch_host, index)
+        return mappings
 
     def count(self, index=DATASHARE_DEFAULT_PROJECT, query=None):
-        if query is None: query = {}
-        query = {'query': query['query']}
-        url = urljoin(self.elasticsearch_host, index, '_count')
-        return requests.post(url, json=query,
-                             cookies=self.cookies,
-                             headers=self.headers, timeout=HTTP_REQUEST_TIMEOUT_SEC).json()
+        return loads(self.transport.post(**self.count_request(index, query)).content)
 
     def document(self, index=DATASHARE_DEFAULT_PROJECT, id=None, routing=None, source=None):
-        url = urljoin(self.elasticsearch_host, index, '/_doc/', id)
-        params = {'routing': routing, '_source': source}
-        return requests.get(url, params=params,
-                            cookies=self.cookies,
-                            headers=self.headers, timeout=HTTP_REQUEST_TIMEOUT_SEC).json()
+        return loads(self.transport.get(**self.document_request(index, id, routing, source)).content)
+
+    def documents(self, index=DATASHARE_DEFAULT_PROJECT, ids=None, source=None, batch_size=MGET_BATCH_SIZE):
+        # The next batch can be requested while the current one is consumed
+        for response in prefetched(self.mget_batches(index, ids, source, batch_size), self.prefetch):
+            yield from found_documents(response)
+
+    def mget_batches(self, index=DATASHARE_DEFAULT_PROJECT, ids=None, source=None, batch_size=MGET_BATCH_SIZE):
+        for batch in batches(ids or [], batch_size):
+            response = self.transport.post(**self.mget_request(index, batch, source))
+            response.raise_for_status()
+            yield loads(response.content)
 
     def download(self, index=DATASHARE_DEFAULT_PROJECT, id=None, routing=None):
-        routing = routing or id
-        url = urljoin(self.datashare_url, 'api', index, '/documents/src', id)
-        return requests.get(url, params={'routing': routing},
-                            cookies=self.cookies,
-                            headers=self.headers,
-                            stream=True, timeout=HTTP_REQUEST_TIMEOUT_SEC)
+        return self.transport.get(stream=True, **self.download_request(index, id, routing))
+
+    def tag(self, index=DATASHARE_DEFAULT_PROJECT, id=None, routing=None, tags=None):
+        return self.transport.put(**self.tag_request(index, id, routing, tags))
+
+    def update_by_query(self, index=DATASHARE_DEFAULT_PROJECT, body=None, params=None):
+        url = urljoin(self.elasticsearch_host, index, '_update_by_query')
+        params = {'conflicts': 'proceed', **(params or {})}
+        return self.transport.post(url, params=params,
+                                 json=body or {},
+                                 cookies=self.cookies,
+                                 headers=self.headers, timeout=self.request_timeout)
 
     def document_url(self, index=DATASHARE_DEFAULT_PROJECT, id='', routing=None):
         routing = id if routing is None else routing
         return urljoin(self.datashare_url, f'#/d/{index}/{id}/{routing}')
 
     @contextmanager
-    def temporary_project(self, source=DATASHARE_DEFAULT_PROJECT, delete=True):
+    def temporary_project(self, source=DATASHARE_DEFAULT_PROJECT, delete=True, clone=None):
+        # By default the project is empty, documents are copied with a `clone` method
         project = None
         try:
-            project = self.reindex(source)
+            project = self.reindex(source) if clone is None else self.clone(source, method=clone)
             yield project
         finally:
             if delete and project is not None:
                 self.delete_index(project)
         return project
-
-    def scan_or_query_all(self, datashare_project, source_fields_names, sort_by, order_by, scroll, query_body, from_,
-                          limit, size):
-        index = datashare_project
-        source = source_fields_names
-        sort = {sort_by: order_by}
-        if scroll is None:
-            logger.info('Searching document(s) metadata in %s', index)
-            return self.query_all(
-                **{'index': index, 'query': query_body, 'source': source, 'sort': sort, 'from': from_, 'limit': limit,
-                   'size': size})
-
-        logger.info('Scrolling over document(s) metadata in %s', index)
-        if from_ > 0:
-            logger.warning('"from" will not be used when scrolling documents')
-        scroll_after_args = {'size': size, 'from': from_, 'limit': limit, 'sort': sort}
-        return self.scan_all(index=index, query=query_body, source=source, scroll=scroll, **scroll_after_args)
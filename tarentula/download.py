@@ -1,16 +1,28 @@
-import json
+import asyncio
+import csv
 import shutil
 import sys
+from contextlib import closing
+from itertools import islice
 from os import makedirs
 from os.path import join, dirname, basename, exists
-from time import sleep
-from requests.exceptions import HTTPError, ConnectionError
+from requests.exceptions import HTTPError, ConnectionError, Timeout
 from rich.progress import Progress
 from urllib3.exceptions import ProtocolError
 
+from tarentula.async_datashare_client import AsyncDatashareClient, run_concurrently, DEFAULT_CONCURRENCY
 from tarentula.command import Command
-from tarentula.datashare_client import DatashareClient
+from tarentula.datashare_client import DatashareClient, MGET_BATCH_SIZE
+from tarentula.json_codec import dumps
 from tarentula.logger import logger
+from tarentula.metrics import metrics
+from tarentula.retry import STREAM_ERRORS
+from tarentula.throttle import AdaptiveThrottle
+
+# Errors which only prevent one document from being downloaded
+DOCUMENT_ERRORS = (HTTPError, ConnectionError, Timeout) + STREAM_ERRORS
+# Fields always written in the JSON file next to each raw file
+INDEXED_DOCUMENT_FIELDS = ('path', 'parentDocument', 'type')
 
 
 class Download(Command):
@@ -29,13 +41,22 @@ class Download(Command):
                  limit: int = 0,
                  from_: int = 0,
                  size: int = 0,
-                 sort_by: str = '_score',
-                 order_by: str = 'desc',
+                 sort_by: str = '_doc',
+                 order_by: str = None,
                  once: bool = False,
                  traceback: bool = False,
                  progressbar: bool = True,
                  raw_file: bool = True,
-                 type: str = 'Document'):
+                 type: str = 'Document',
+                 async_mode: bool = False,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 target_latency: int = 0,
+                 stream_hits: bool = False,
+                 prefetch: int = 0,
+                 pagination: str = 'auto',
+                 slices: int = 1,
+                 ids_file: str = None,
+                 **client_options):
         super().__init__(query, type)
         self.datashare_url = datashare_url
         self.datashare_project = datashare_project
@@ -55,22 +76,45 @@ class Download(Command):
         self.size = size
         self.sort_by = sort_by
         self.order_by = order_by
+        self.elasticsearch_url = elasticsearch_url
+        self.async_mode = async_mode
+        self.pagination = pagination
+        self.slices = slices
+        self.ids_file = ids_file
+        self.concurrency = concurrency
+        self.client_options = client_options
+        # Concurrency and delay between documents are tuned from the requests' latency
+        self.adaptive_throttle = AdaptiveThrottle(throttle, target_latency, concurrency if async_mode else 1)
         try:
             self.datashare_client = DatashareClient(datashare_url,
                                                     elasticsearch_url,
                                                     datashare_project,
                                                     cookies,
-                                                    apikey)
+                                                    apikey,
+                                                    stream_hits=stream_hits,
+                                                    prefetch=prefetch,
+                                                    **client_options)
         except (ConnectionRefusedError, ConnectionError):
             logger.critical('Unable to connect to Datashare', exc_info=self.traceback)
             sys.exit()
+        self.datashare_client.transport.listeners.append(self.adaptive_throttle)
+        self.datashare_client.transport.listeners.append(metrics)
 
     @property
     def no_progressbar(self):
         return not self.progressbar
 
     def sleep(self):
-        sleep(self.throttle / 1000)
+        self.adaptive_throttle.sleep()
+
+    @property
+    def source_fields(self):
+        # Only request the fields of the JSON files, plus the ones asked with --source
+        fields = list(INDEXED_DOCUMENT_FIELDS)
+        for field in (self.source or '').split(','):
+            if field.strip() and field.strip() not in fields:
+                fields.append(field.strip())
+        return fields
 
     def document_file_options(self, document):
         return {
@@ -99,7 +143,33 @@ class Download(Command):
             makedirs(parents_path, exist_ok=True)
         return file_path
 
+    def ids_file_rows(self):
+        # Rows are streamed so the file can list millions of documents
+        with open(self.ids_file, newline='', encoding='utf-8-sig') as csv_file:
+            reader = csv.DictReader(csv_file)
+            if 'documentId' not in (reader.fieldnames or []):
+                raise ValueError(f'No documentId column in {self.ids_file}')
+            stop = self.from_ + self.limit if self.limit else None
+            for row in islice(reader, self.from_, stop):
+                document_id = row['documentId']
+                yield document_id, row.get('routing') or row.get('rootId') or document_id
+
+    def count_ids(self):
+        return sum(1 for _ in self.ids_file_rows())
+
+    def documents(self, datashare_client, source, on_slice_hit=None, matches=None):
+        if self.ids_file is not None:
+            # Without a size, documents are fetched by batches of the default size
+            return datashare_client.documents(self.datashare_project, self.ids_file_rows(), source,
+                                              self.size or MGET_BATCH_SIZE)
+        return datashare_client.scan_or_query_all(self.datashare_project, source, self.sort_by, self.order_by,
+                                                  self.scroll, self.query_body, self.from_, self.limit, self.size,
+                                                  pagination=self.pagination, slices=self.slices,
+                                                  on_slice_hit=on_slice_hit, matches=matches)
+
     def count_matches(self):
+        if self.ids_file is not None:
+            return self.count_ids()
         index = self.datashare_project
         total_matched = self.datashare_client \
             .count(index=index, query=self.query_body) \
@@ -117,27 +187,40 @@ class Download(Command):
         logger.info('%s matching document(s) in %s', count, index)
         return count
 
-    def download_raw_file(self, document):
+    def raw_file_is_skipped(self, document):
         id = document.get('_id')
-        routing = document.get('_routing', id)
         # Skip raw file
         if not self.raw_file:
-            return None
+            return True
         # Skip existing
         if self.once and self.raw_file_exists(document):
-            logger.info('Skipping existing document %s', document.get('_id'))
-            return None
+            logger.info('Skipping existing document %s', id)
+            return True
         # Skip non-downloadable file
         if document.get('_source', {}).get('type', None) != 'Document':
             logger.warning('Not a raw document. Skipping %s', id)
+            return True
+        return False
+
+    def download_raw_file(self, document):
+        id = document.get('_id')
+        routing = document.get('_routing', id)
+        if self.raw_file_is_skipped(document):
             return None
         logger.info('Downloading raw file %s', id)
-        document_file_stream = self.datashare_client.download(self.datashare_project, id, routing)
-        document_file_stream.raw.decode_content = True
-        document_file_stream.raise_for_status()
-        self.save_raw_file(document, document_file_stream)
+        # The request itself is retried by the client, a stream broken while
+        # the file is written is downloaded again from the start
+        self.datashare_client.retry_policy.call(lambda: self.fetch_raw_file(document, id, routing),
+                                                f'download of raw file {id}', errors=STREAM_ERRORS)
         return None
 
+    def fetch_raw_file(self, document, id, routing):
+        # Closing the stream releases the connection back to the client's pool
+        with self.datashare_client.download(self.datashare_project, id, routing) as document_file_stream:
+            document_file_stream.raw.decode_content = True
+            document_file_stream.raise_for_status()
+            self.save_raw_file(document, document_file_stream)
+
     def raw_file_exists(self, document):
         raw_file_path = self.raw_file_path(document)
         return exists(raw_file_path)
@@ -149,26 +232,82 @@ class Download(Command):
 
     def save_indexed_document(self, indexed_document):
         file_path = self.indexed_document_path(indexed_document)
-        with open(file_path, 'w') as file:
-            json.dump(indexed_document, file)
+        indexed_document.setdefault('_source', {})
+        with open(file_path, 'wb') as file:
+            file.write(dumps(indexed_document))
 
-    def start(self):
-        count = self.log_matches()
-        desc = f'Downloading {count} document(s)'
-        source = ["path", "parentDocument", "type"] + str(self.source).split(',')
+    async def download_raw_file_async(self, datashare_client, document):
+        id = document.get('_id')
+        routing = document.get('_routing', id)
+        if self.raw_file_is_skipped(document):
+            return None
+        logger.info('Downloading raw file %s', id)
+        await datashare_client.download(self.datashare_project, id, routing, self.raw_file_path(document))
+        return None
+
+    async def process_document_async(self, datashare_client, document, progress, task):
         try:
-            with Progress(disable=self.no_progressbar) as progress:
-                task = progress.add_task(desc, total=count)
-                for document in self.datashare_client.scan_or_query_all(self.datashare_project, source, self.sort_by,
-                                                                        self.order_by, self.scroll, self.query_body,
-                                                                        self.from_, self.limit, self.size):
-                    try:
-                        self.download_raw_file(document)
-                        self.save_indexed_document(document)
-                        logger.info('Processed document %s', document.get('_id'))
-                    except HTTPError:
-                        logger.error('Unable to download document %s', document.get('_id'), exc_info=self.traceback)
-                    progress.advance(task)
-                    self.sleep()
-        except ProtocolError:
-            logger.error('Exception while downloading documents', exc_info=self.traceback)
+            await self.download_raw_file_async(datashare_client, document)
+            self.save_indexed_document(document)
+            logger.info('Processed document %s', document.get('_id'))
+        # One document failing after all retries doesn't stop the download of the others
+        except DOCUMENT_ERRORS:
+            metrics.increment('errors')
+            logger.error('Unable to download document %s', document.get('_id'), exc_info=self.traceback)
+        metrics.increment('documents')
+        progress.advance(task)
+
+    async def start_async(self, source, progress, task, matches=None):
+        async with AsyncDatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                        self.cookies_string, self.apikey, **self.client_options) as datashare_client:
+            datashare_client.transport.listeners.append(self.adaptive_throttle)
+            datashare_client.transport.listeners.append(metrics)
+            documents = self.documents(datashare_client, source, matches=matches)
+
+            async def coroutines():
+                async for document in documents:
+                    yield self.process_document_async(datashare_client, document, progress, task)
+                    await self.adaptive_throttle.sleep_async()
+
+            # The scroll context is cleared before the client is closed, even when interrupted
+            try:
+                await run_concurrently(coroutines(), lambda: self.adaptive_throttle.concurrency)
+            finally:
+                await documents.aclose()
+
+    def start(self):
+        # Connections and the trace file are released once the command is over
+        with self.datashare_client:
+            try:
+                count = self.log_matches()
+            except ValueError as error:
+                # The ids file can't be read
+                logger.critical(error)
+                return
+            desc = f'Downloading {count} document(s)'
+            source = self.source_fields
+            try:
+                with Progress(disable=self.no_progressbar) as progress:
+                    task = progress.add_task(desc, total=count)
+                    if self.async_mode:
+                        asyncio.run(self.start_async(source, progress, task, count))
+                        return
+                    documents = self.documents(self.datashare_client, source,
+                                               self.slices_progress(progress, self.slices), count)
+                    # The scroll context is cleared even when the download is interrupted
+                    with closing(documents):
+                        for document in documents:
+                            try:
+                                self.download_raw_file(document)
+                                self.save_indexed_document(document)
+                                logger.info('Processed document %s', document.get('_id'))
+                            # One document failing after all retries doesn't stop the download of the others
+                            except DOCUMENT_ERRORS:
+                                metrics.increment('errors')
+                                logger.error('Unable to download document %s', document.get('_id'),
+                                             exc_info=self.traceback)
+                            metrics.increment('documents')
+                            progress.advance(task)
+                            self.sleep()
+            except (ProtocolError, ConnectionError):
+                logger.error('Exception while downloading documents', exc_info=self.traceback)
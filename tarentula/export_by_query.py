@@ -1,16 +1,19 @@
+import asyncio
 import csv
 import sys
 
 from collections import OrderedDict
-from contextlib import contextmanager
-from time import sleep
-from requests.exceptions import HTTPError
+from contextlib import closing, contextmanager
+from requests.exceptions import HTTPError, ConnectionError
 from rich.progress import Progress
 from urllib3.exceptions import ProtocolError
 
+from tarentula.async_datashare_client import AsyncDatashareClient
 from tarentula.command import Command
 from tarentula.datashare_client import DatashareClient
 from tarentula.logger import logger
+from tarentula.metrics import metrics
+from tarentula.throttle import AdaptiveThrottle
 
 
 class ExportByQuery(Command):
@@ -28,12 +31,19 @@ class ExportByQuery(Command):
                  size: int = 1000,
                  from_: int = 0,
                  limit: int = 0,
-                 sort_by: str = '_score',
-                 order_by: str = 'desc',
+                 sort_by: str = '_doc',
+                 order_by: str = None,
                  traceback: bool = False,
                  progressbar: bool = True,
                  type: str = 'Document',
-                 query_field: bool = True):
+                 query_field: bool = True,
+                 async_mode: bool = False,
+                 target_latency: int = 0,
+                 stream_hits: bool = False,
+                 prefetch: int = 0,
+                 pagination: str = 'auto',
+                 slices: int = 1,
+                 **client_options):
         super().__init__(query, type)
         self.datashare_url = datashare_url
         self.datashare_project = datashare_project
@@ -51,15 +61,27 @@ class ExportByQuery(Command):
         self.sort_by = sort_by
         self.order_by = order_by
         self.query_field = query_field
+        self.elasticsearch_url = elasticsearch_url
+        self.async_mode = async_mode
+        self.pagination = pagination
+        self.slices = slices
+        self.client_options = client_options
+        # Delay between documents is tuned from the requests' latency
+        self.adaptive_throttle = AdaptiveThrottle(throttle, target_latency)
         try:
             self.datashare_client = DatashareClient(datashare_url,
                                                     elasticsearch_url,
                                                     datashare_project,
                                                     cookies,
-                                                    apikey)
+                                                    apikey,
+                                                    stream_hits=stream_hits,
+                                                    prefetch=prefetch,
+                                                    **client_options)
         except (ConnectionRefusedError, ConnectionError):
             logger.critical('Unable to connect to Datashare', exc_info=self.traceback)
             sys.exit()
+        self.datashare_client.transport.listeners.append(self.adaptive_throttle)
+        self.datashare_client.transport.listeners.append(metrics)
 
     @property
     def no_progressbar(self):
@@ -94,7 +116,7 @@ class ExportByQuery(Command):
         return [field_name, field_default]
 
     def sleep(self):
-        sleep(self.throttle / 1000)
+        self.adaptive_throttle.sleep()
 
     def count_matches(self):
         index = self.datashare_project
@@ -151,26 +173,67 @@ class ExportByQuery(Command):
             writer.writeheader()
             yield writer
 
-    def start(self):
-        count = self.log_matches()
-        desc = f'Exporting {count} document(s)'
+    def save_document_row(self, csvwriter, document, index, progress, task):
         try:
-            with Progress(disable=self.no_progressbar) as progress:
-                task = progress.add_task(desc, total=count)
-                documents = self.datashare_client.scan_or_query_all(self.datashare_project, self.source_fields_names,
-                                                                    self.sort_by,
-                                                                    self.order_by, self.scroll, self.query_body,
-                                                                    self.from_, self.limit, self.size)
-                with self.create_csv_file() as csvwriter:
-                    for index, document in enumerate(documents):
-                        try:
-                            self.save_indexed_document(csvwriter, document, index)
-                            logger.info('Saved document %s', document.get('_id', None))
-                        except HTTPError:
-                            logger.error('Unable to export document %s', document.get('_id', None),
-                                         exc_info=self.traceback)
-                        progress.advance(task)
-                        self.sleep()
-                logger.info('Written documents metadata in %s', self.output_file)
-        except ProtocolError:
-            logger.error('Exception while exporting documents', exc_info=self.traceback)
+            self.save_indexed_document(csvwriter, document, index)
+            logger.info('Saved document %s', document.get('_id', None))
+        except HTTPError:
+            metrics.increment('errors')
+            logger.error('Unable to export document %s', document.get('_id', None),
+                         exc_info=self.traceback)
+        metrics.increment('documents')
+        progress.advance(task)
+
+    async def start_async(self, csvwriter, progress, task, matches=None):
+        # The next page of results is fetched while the current one is written
+        async with AsyncDatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                        self.cookies_string, self.apikey, **self.client_options) as datashare_client:
+            datashare_client.transport.listeners.append(self.adaptive_throttle)
+            datashare_client.transport.listeners.append(metrics)
+            documents = datashare_client.scan_or_query_all(self.datashare_project, self.source_fields_names,
+                                                           self.sort_by,
+                                                           self.order_by, self.scroll, self.query_body,
+                                                           self.from_, self.limit, self.size,
+                                                           pagination=self.pagination, slices=self.slices,
+                                                           matches=matches)
+            index = 0
+            # The scroll context is cleared before the client is closed, even when interrupted
+            try:
+                async for document in documents:
+                    self.save_document_row(csvwriter, document, index, progress, task)
+                    index += 1
+                    await self.adaptive_throttle.sleep_async()
+            finally:
+                await documents.aclose()
+
+    def start(self):
+        # Connections and the trace file are released once the command is over
+        with self.datashare_client:
+            count = self.log_matches()
+            desc = f'Exporting {count} document(s)'
+            try:
+                with Progress(disable=self.no_progressbar) as progress:
+                    task = progress.add_task(desc, total=count)
+                    with self.create_csv_file() as csvwriter:
+                        if self.async_mode:
+                            asyncio.run(self.start_async(csvwriter, progress, task, count))
+                        else:
+                            documents = self.datashare_client.scan_or_query_all(self.datashare_project,
+                                                                                self.source_fields_names,
+                                                                                self.sort_by,
+                                                                                self.order_by, self.scroll,
+                                                                                self.query_body,
+                                                                                self.from_, self.limit, self.size,
+                                                                                pagination=self.pagination,
+                                                                                slices=self.slices,
+                                                                                on_slice_hit=self.slices_progress(
+                                                                                    progress, self.slices),
+                                                                                matches=count)
+                            # The scroll context is cleared even when the export is interrupted
+                            with closing(documents):
+                                for index, document in enumerate(documents):
+                                    self.save_document_row(csvwriter, document, index, progress, task)
+                                    self.sleep()
+                    logger.info('Written documents metadata in %s', self.output_file)
+            except (ProtocolError, ConnectionError):
+                logger.error('Exception while exporting documents', exc_info=self.traceback)
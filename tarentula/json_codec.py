@@ -0,0 +1,57 @@
+import json
+
+class JsonCodec:
+    name = 'json'
+
+    # Documents are written as compact UTF-8 whatever the codec
+    def dumps(self, obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonCodec(JsonCodec):
+    name = 'orjson'
+
+    def __init__(self):
+        import orjson
+        self.orjson = orjson
+
+    def dumps(self, obj) -> bytes:
+        try:
+            return self.orjson.dumps(obj, option=self.orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # Values orjson can't serialize, like integers bigger than 64 bits
+            return super().dumps(obj)
+
+    def loads(self, data):
+        # Bytes are decoded directly, without an intermediate string. Integers
+        # bigger than 64 bits, which Elasticsearch can't index, become floats.
+        try:
+            return self.orjson.loads(data)
+        except ValueError:
+            return super().loads(data)
+
+
+def create_codec(name='auto'):
+    if name not in ('auto', 'orjson', 'json'):
+        raise ValueError(f'Unknown JSON codec: {name}')
+    if name in ('auto', 'orjson'):
+        try:
+            return OrjsonCodec()
+        except ImportError:
+            if name == 'orjson':
+                raise
+    return JsonCodec()
+
+
+codec = create_codec()
+
+
+def dumps(obj) -> bytes:
+    return codec.dumps(obj)
+
+
+def loads(data):
+    return codec.loads(data)
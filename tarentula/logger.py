@@ -1,14 +1,45 @@
 import logging
+import queue
 import sys
+import threading
 
 from syslog import LOG_LOCAL7
-from logging.handlers import SysLogHandler
-import coloredlogs
+from logging.handlers import QueueHandler, QueueListener, SysLogHandler
+from time import monotonic
+
+# Records logged per second with the same message below WARNING, the other ones
+# are dropped and counted. All of them are logged by default.
+LOG_RATE = 0
 
 logger = logging.getLogger('tarentula')
 logger.setLevel(logging.INFO)
 
 
+# Per-document messages are sampled with a token bucket per message, so the
+# cost of logging stops growing with the number of documents
+class RateLimitFilter(logging.Filter):
+    def __init__(self, rate=LOG_RATE):
+        super().__init__()
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.buckets = {}
+
+    def filter(self, record):
+        if self.rate <= 0 or record.levelno >= logging.WARNING:
+            return True
+        now = monotonic()
+        with self.lock:
+            tokens, updated, dropped = self.buckets.get(record.msg, (self.rate, now, 0))
+            tokens = min(self.rate, tokens + (now - updated) * self.rate)
+            if tokens < 1:
+                self.buckets[record.msg] = (tokens, now, dropped + 1)
+                return False
+            self.buckets[record.msg] = (tokens - 1, now, 0)
+        if dropped:
+            record.msg = f'{record.msg} ({dropped} similar message(s) dropped)'
+        return True
+
+
 def default_log_formatter() -> logging.Formatter:
     return logging.Formatter('%(asctime)s :: %(name)s :: %(levelname)s :: %(message)s')
 
@@ -22,6 +53,38 @@ def add_syslog_handler(address: str = 'localhost', port: int = 514, facility: in
 
 
 def add_stdout_handler(level: int = logging.ERROR) -> None:
+    # Imported once a command runs, the help doesn't need colors
+    import coloredlogs
     fmt = '%(levelname)s %(message)s'
     logger.addHandler(logging.StreamHandler(sys.stdout))
     coloredlogs.install(level=level, logger=logger, fmt=fmt, field_styles={ 'levelname': { 'faint': True } })
+
+
+def add_rate_limit(rate: int = LOG_RATE) -> None:
+    for log_filter in logger.filters:
+        if isinstance(log_filter, RateLimitFilter):
+            logger.removeFilter(log_filter)
+    logger.addFilter(RateLimitFilter(rate))
+
+
+# Records are queued as they are, their message is only formatted by the
+# handlers of the listener's thread
+class UnformattedQueueHandler(QueueHandler):
+    def prepare(self, record):
+        return record
+
+
+def start_log_queue():
+    # Handlers format and send records from a background thread, logging a
+    # record only puts it in a queue
+    handlers = list(logger.handlers)
+    records = queue.SimpleQueue()
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    logger.handlers = [UnformattedQueueHandler(records)]
+    listener.start()
+
+    def stop_log_queue():
+        # Queued records are handled before the handlers are given back to the logger
+        listener.stop()
+        logger.handlers = handlers
+    return stop_log_queue
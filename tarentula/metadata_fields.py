@@ -16,7 +16,8 @@ class MetadataFields:
                  traceback: bool = False,
                  type: str = 'Document',
                  filter_by: str = '',
-                 count: bool = True):
+                 count: bool = True,
+                 **client_options):
         self.datashare_url = datashare_url
         self.elasticsearch_url = elasticsearch_url
         self.datashare_project = datashare_project
@@ -40,7 +41,8 @@ class MetadataFields:
                                                     elasticsearch_url,
                                                     datashare_project,
                                                     cookies,
-                                                    apikey)
+                                                    apikey,
+                                                    **client_options)
         except (ConnectionRefusedError, ConnectionError):
             logger.critical('Unable to connect to Datashare', exc_info=self.traceback)
             sys.exit()
@@ -90,7 +92,9 @@ class MetadataFields:
         return results
 
     def start(self):
-        mapping = self.query_mappings()
+        # Connections and the trace file are released once the command is over
+        with self.datashare_client:
+            mapping = self.query_mappings()
 
-        fields = self.get_fields(mapping, [])
-        print(dumps(fields))
+            fields = self.get_fields(mapping, [])
+            print(dumps(fields))
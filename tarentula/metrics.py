@@ -0,0 +1,218 @@
+import json
+import os
+import random
+import sys
+import threading
+from contextlib import contextmanager
+from os.path import abspath, dirname
+from tempfile import NamedTemporaryFile
+from time import monotonic
+
+from tarentula.logger import logger
+from tarentula.trace import endpoint_template, response_size
+
+METRICS_INTERVAL_SEC = 15
+PROGRESS_INTERVAL_SEC = 30
+# Latencies kept per endpoint to compute percentiles, a random sample of them
+# once there are more
+METRICS_MAX_SAMPLES = 10000
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values, rank):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * rank / 100))]
+
+
+def rate(value, seconds):
+    return value / seconds if seconds > 0 else 0.0
+
+
+# Latencies of one endpoint, with a reservoir sample so memory stays bounded on long runs
+class Samples:
+    def __init__(self, max_samples=METRICS_MAX_SAMPLES):
+        self.max_samples = max_samples
+        self.values = []
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value):
+        self.count += 1
+        self.sum += value
+        if len(self.values) < self.max_samples:
+            self.values.append(value)
+        else:
+            index = random.randrange(self.count)
+            if index < self.max_samples:
+                self.values[index] = value
+
+    def percentiles(self):
+        return {rank: percentile(self.values, rank) for rank in PERCENTILES}
+
+
+# Counters and request latencies of the current command, shared by all its
+# clients. The registry is also a transport listener.
+class Metrics:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, command=None):
+        with self.lock:
+            self.command = command
+            self.started = monotonic()
+            self.counters = {'documents': 0, 'errors': 0, 'bytes': 0, 'requests': 0, 'request_errors': 0}
+            self.latencies = {}
+
+    def increment(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, endpoint, seconds):
+        with self.lock:
+            self.latencies.setdefault(endpoint, Samples()).add(seconds)
+
+    def __call__(self, elapsed, response=None, error=None, streamed=False):
+        self.increment('requests')
+        if response is None or error is not None or response.status_code >= 400:
+            self.increment('request_errors')
+        if response is None:
+            return
+        self.observe(endpoint_template(response.url or ''), elapsed)
+        if not streamed:
+            self.increment('bytes', response_size(response))
+            return
+        # Streamed bodies are not read yet, they are counted once closed
+        close = response.close
+
+        def counted_close():
+            close()
+            self.increment('bytes', response_size(response, streamed))
+        response.close = counted_close
+
+    def snapshot(self):
+        with self.lock:
+            elapsed = monotonic() - self.started
+            counters = dict(self.counters)
+            latencies = {endpoint: {'count': samples.count, 'sum': samples.sum, **{
+                f'p{rank}': value for rank, value in samples.percentiles().items()}}
+                         for endpoint, samples in self.latencies.items()}
+        return {'command': self.command, 'elapsed': elapsed, 'counters': counters,
+                'documents_per_second': rate(counters['documents'], elapsed),
+                'bytes_per_second': rate(counters['bytes'], elapsed), 'latencies': latencies}
+
+    def summary(self):
+        snapshot = self.snapshot()
+        counters = snapshot['counters']
+        lines = [f'{counters["documents"]} document(s) in {snapshot["elapsed"]:.1f}s'
+                 f' ({snapshot["documents_per_second"]:.1f} docs/s),'
+                 f' {counters["bytes"] / 1e6:.1f} MB received ({snapshot["bytes_per_second"] / 1e6:.2f} MB/s),'
+                 f' {counters["errors"]} error(s)',
+                 f'{counters["requests"]} request(s), {counters["request_errors"]} failed']
+        for endpoint, latency in sorted(snapshot['latencies'].items()):
+            percentiles = ' '.join(f'p{rank} {latency[f"p{rank}"] * 1000:.0f}ms' for rank in PERCENTILES)
+            lines.append(f'  {endpoint} {latency["count"]} request(s) {percentiles}')
+        return '\n'.join(lines)
+
+    def progress(self):
+        snapshot = self.snapshot()
+        counters = snapshot['counters']
+        return (f'{counters["documents"]} document(s) in {snapshot["elapsed"]:.0f}s'
+                f' ({snapshot["documents_per_second"]:.1f} docs/s), {counters["errors"]} error(s)')
+
+    def prometheus(self):
+        snapshot = self.snapshot()
+        command = snapshot['command'] or ''
+        lines = []
+        for name, value in snapshot['counters'].items():
+            lines += [f'# TYPE tarentula_{name}_total counter',
+                      f'tarentula_{name}_total{{command="{command}"}} {value}']
+        lines += ['# TYPE tarentula_elapsed_seconds gauge',
+                  f'tarentula_elapsed_seconds{{command="{command}"}} {snapshot["elapsed"]:.3f}',
+                  '# TYPE tarentula_request_duration_seconds summary']
+        for endpoint, latency in sorted(snapshot['latencies'].items()):
+            labels = f'command="{command}",endpoint="{endpoint}"'
+            lines += [f'tarentula_request_duration_seconds{{{labels},quantile="{rank / 100}"}} {latency[f"p{rank}"]}'
+                      for rank in PERCENTILES]
+            lines += [f'tarentula_request_duration_seconds_count{{{labels}}} {latency["count"]}',
+                      f'tarentula_request_duration_seconds_sum{{{labels}}} {latency["sum"]:.6f}']
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        # JSON files are written as they are, any other file in the Prometheus text format
+        content = json.dumps(self.snapshot()) if path.endswith('.json') else self.prometheus()
+        directory = dirname(abspath(path))
+        # The file is replaced at once so the exporter never reads half of it
+        try:
+            with NamedTemporaryFile('w', dir=directory, delete=False, encoding='utf-8') as metrics_file:
+                metrics_file.write(content)
+            os.replace(metrics_file.name, path)
+        except OSError as error:
+            logger.warning('Unable to write metrics in %s: %s', path, error)
+
+
+# Registry shared by every command of the process
+metrics = Metrics()
+
+
+class MetricsWriter:
+    def __init__(self, registry, path, interval=METRICS_INTERVAL_SEC):
+        self.registry = registry
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='tarentula-metrics', daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.registry.write(self.path)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+        # Final values are written once the command is over
+        self.registry.write(self.path)
+
+
+# One record every few seconds instead of a line per document
+class ProgressLogger:
+    def __init__(self, registry, interval=PROGRESS_INTERVAL_SEC):
+        self.registry = registry
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='tarentula-progress', daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            logger.info('Progress of %s: %s', self.registry.command, self.registry.progress())
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+
+@contextmanager
+def reported(command, metrics_file=None, metrics_interval=METRICS_INTERVAL_SEC, metrics_summary=True,
+             progress_interval=PROGRESS_INTERVAL_SEC):
+    metrics.reset(command)
+    writer = None if metrics_file is None else MetricsWriter(metrics, metrics_file, metrics_interval)
+    progress = None if progress_interval <= 0 else ProgressLogger(metrics, progress_interval)
+    for thread in (writer, progress):
+        if thread is not None:
+            thread.start()
+    try:
+        yield metrics
+    finally:
+        for thread in (writer, progress):
+            if thread is not None:
+                thread.stop()
+        if metrics_summary:
+            print(metrics.summary(), file=sys.stderr)
@@ -0,0 +1,71 @@
+import threading
+from queue import Queue, Full
+
+PREFETCH_DEPTH = 0
+PREFETCH_POLL_SEC = 0.1
+
+_ITEM, _ERROR, _DONE = range(3)
+
+
+def prefetched(iterable, depth=PREFETCH_DEPTH):
+    # Items are produced by a background thread, at most `depth` items ahead
+    # of the consumer so memory stays bounded
+    if depth <= 0:
+        yield from iterable
+        return
+    items = merged([iterable], depth)
+    try:
+        for _, item in items:
+            yield item
+    finally:
+        items.close()
+
+
+def merged(iterables, depth):
+    # Each iterable is produced by its own thread, items are yielded with the
+    # index of their iterable as soon as they are produced
+    items = Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def put(index, kind, item=None):
+        # Blocks while the queue is full, unless the consumer is gone
+        while not stop.is_set():
+            try:
+                items.put((index, kind, item), timeout=PREFETCH_POLL_SEC)
+                return True
+            except Full:
+                continue
+        return False
+
+    def produce(index, iterable):
+        try:
+            for item in iterable:
+                if not put(index, _ITEM, item):
+                    return
+            put(index, _DONE)
+        except Exception as error:  # pylint: disable=broad-except
+            put(index, _ERROR, error)
+        finally:
+            # The iterable is closed from the thread iterating over it
+            close = getattr(iterable, 'close', None)
+            if close is not None:
+                close()
+
+    threads = [threading.Thread(target=produce, args=(index, iterable), name=f'tarentula-prefetch-{index}',
+                                daemon=True) for index, iterable in enumerate(iterables)]
+    for thread in threads:
+        thread.start()
+    try:
+        running = len(threads)
+        while running > 0:
+            index, kind, item = items.get()
+            if kind == _DONE:
+                running -= 1
+            elif kind == _ERROR:
+                raise item
+            else:
+                yield index, item
+    finally:
+        stop.set()
+        for thread in threads:
+            thread.join()
@@ -0,0 +1,95 @@
+import cProfile
+import pstats
+import sys
+import threading
+from collections import Counter
+from time import perf_counter, process_time
+
+from tarentula.logger import logger
+
+PROFILE_MODES = ('cpu', 'wall', 'sampling')
+PROFILE_INTERVAL_MS = 5
+PROFILE_TOP = 25
+
+
+def frame_name(frame):
+    code = frame.f_code
+    return f'{code.co_name} ({code.co_filename}:{code.co_firstlineno})'
+
+
+# Stacks of every thread sampled at a fixed interval, so time spent waiting
+# (on the network, the disk or a lock) is seen as well as time spent computing
+class SamplingProfiler:
+    def __init__(self, interval_ms=PROFILE_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        self.stacks = Counter()
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, name='tarentula-profiler', daemon=True)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.sample()
+
+    def sample(self):
+        for thread_id, frame in sys._current_frames().items():  # pylint: disable=protected-access
+            if thread_id == self.thread.ident:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(frame_name(frame))
+                frame = frame.f_back
+            self.stacks[tuple(reversed(stack))] += 1
+
+    def enable(self):
+        self.thread.start()
+
+    def disable(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def dump_stats(self, path):
+        # Collapsed stacks, the input format of flame graph tools
+        with open(path, 'w', encoding='utf-8') as stacks_file:
+            for stack, count in self.stacks.most_common():
+                stacks_file.write(f'{";".join(stack)} {count}\n')
+
+    def print_stats(self, stream, top=PROFILE_TOP):
+        total = sum(self.stacks.values())
+        cumulative = Counter()
+        own = Counter()
+        for stack, count in self.stacks.items():
+            # Recursive functions are only counted once per sample
+            for name in set(stack):
+                cumulative[name] += count
+            own[stack[-1]] += count
+        print(f'{total} samples, every {self.interval * 1000:g}ms', file=stream)
+        if total == 0:
+            return
+        print(f'{"cumulative":>12} {"own":>12}  function', file=stream)
+        for name, count in cumulative.most_common(top):
+            print(f'{count:>6} {count / total:>5.0%} {own[name]:>6} {own[name] / total:>5.0%}  {name}', file=stream)
+
+
+class Profile:
+    def __init__(self, path, mode='cpu', interval_ms=PROFILE_INTERVAL_MS, top=PROFILE_TOP):
+        self.path = path
+        self.mode = mode
+        self.top = top
+        if mode == 'sampling':
+            self.profiler = SamplingProfiler(interval_ms)
+        else:
+            # Only the main thread is profiled, with the time it computes or the time it takes
+            self.profiler = cProfile.Profile(process_time if mode == 'cpu' else perf_counter)
+
+    def start(self):
+        self.profiler.enable()
+
+    def stop(self, stream=None):
+        stream = stream or sys.stderr
+        self.profiler.disable()
+        self.profiler.dump_stats(self.path)
+        logger.info('Profile written in %s', self.path)
+        if self.mode == 'sampling':
+            self.profiler.print_stats(stream, self.top)
+        else:
+            pstats.Stats(self.profiler, stream=stream).sort_stats('cumulative').print_stats(self.top)
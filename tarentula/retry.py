@@ -0,0 +1,161 @@
+import asyncio
+import random
+import threading
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from time import monotonic, sleep
+
+import requests
+from urllib3.exceptions import ProtocolError, ReadTimeoutError
+
+from tarentula.logger import logger
+
+RETRY_MAX_RETRIES = 3
+RETRY_BACKOFF_FACTOR = 0.5
+RETRY_MAX_BACKOFF_SEC = 60
+RETRY_STATUSES = (429, 502, 503, 504)
+CIRCUIT_BREAKER_THRESHOLD = 5
+CIRCUIT_BREAKER_TIMEOUT_SEC = 30
+
+# Errors raised while reading a streamed body, after the request succeeded
+STREAM_ERRORS = (requests.exceptions.ChunkedEncodingError, ProtocolError, ReadTimeoutError)
+# Errors raised before or while reading a response, the request can be sent again
+RETRYABLE_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout) + STREAM_ERRORS
+
+
+def retry_after(response):
+    value = response.headers.get('Retry-After') if response is not None else None
+    if value is None:
+        return 0
+    try:
+        return max(0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return 0
+
+
+class CircuitBreaker:
+    def __init__(self, threshold=CIRCUIT_BREAKER_THRESHOLD, timeout=CIRCUIT_BREAKER_TIMEOUT_SEC):
+        self.threshold = threshold
+        self.timeout = timeout
+        self.failures = 0
+        self.opened_at = None
+        # The breaker is shared by the threads reading pages and slices concurrently
+        self.lock = threading.Lock()
+
+    @property
+    def is_open(self):
+        return self.opened_at is not None
+
+    @property
+    def remaining(self):
+        if not self.is_open:
+            return 0
+        return max(0, self.opened_at + self.timeout - monotonic())
+
+    def wait_time(self):
+        with self.lock:
+            remaining = self.remaining
+            # Once the pause is over a single request probes the server, the
+            # others wait for another pause unless it succeeds
+            if self.is_open and remaining == 0:
+                self.opened_at = monotonic()
+            return remaining
+
+    def record_success(self):
+        with self.lock:
+            if self.is_open:
+                logger.warning('Circuit breaker closed, resuming requests')
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.threshold > 0 and self.failures >= self.threshold:
+                # A failure while half-open pauses the requests again
+                if not self.is_open:
+                    logger.warning('Circuit breaker opened after %s consecutive failures, pausing requests for %ss',
+                                   self.failures, self.timeout)
+                self.opened_at = monotonic()
+
+
+class RetryPolicy:
+    def __init__(self, max_retries=RETRY_MAX_RETRIES, backoff_factor=RETRY_BACKOFF_FACTOR,
+                 max_backoff=RETRY_MAX_BACKOFF_SEC, statuses=RETRY_STATUSES, circuit_breaker=None):
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.max_backoff = max_backoff
+        self.statuses = statuses
+        self.circuit_breaker = circuit_breaker or CircuitBreaker()
+        self.retries = 0
+
+    def backoff(self, attempt):
+        # Exponential backoff with "full jitter" so concurrent clients don't retry in lockstep
+        return random.uniform(0, min(self.max_backoff, self.backoff_factor * (2 ** attempt)))
+
+    def is_retryable(self, response=None, error=None, idempotent=True):
+        if error is not None:
+            # Only a connection that was never established is safe to retry for non-idempotent requests
+            return isinstance(error, RETRYABLE_ERRORS) and (idempotent or
+                                                           isinstance(error, requests.exceptions.ConnectTimeout))
+        status_code = getattr(response, 'status_code', None)
+        # A 429 means the request was rejected before being processed
+        return status_code in self.statuses and (idempotent or status_code == 429)
+
+    def delay(self, attempt, response=None, error=None, idempotent=True):
+        if not self.is_retryable(response, error, idempotent):
+            if error is None:
+                self.circuit_breaker.record_success()
+            return None
+        self.circuit_breaker.record_failure()
+        if attempt >= self.max_retries:
+            return None
+        return min(self.max_backoff, max(self.backoff(attempt), retry_after(response)))
+
+    def log_retry(self, description, attempt, delay, response=None, error=None):
+        self.retries += 1
+        reason = type(error).__name__ if error is not None else f'HTTP {response.status_code}'
+        logger.warning('Retrying %s in %.2fs after %s (attempt %s/%s, %s retries so far)',
+                       description, delay, reason, attempt + 1, self.max_retries, self.retries)
+        if response is not None:
+            response.close()
+
+    def call(self, function, description='request', idempotent=True, errors=RETRYABLE_ERRORS):
+        attempt = 0
+        while True:
+            sleep(self.circuit_breaker.wait_time())
+            response, error = None, None
+            try:
+                response = function()
+            except errors as exc:
+                error = exc
+            delay = self.delay(attempt, response, error, idempotent)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            self.log_retry(description, attempt, delay, response, error)
+            sleep(delay)
+            attempt += 1
+
+    async def call_async(self, function, description='request', idempotent=True, errors=RETRYABLE_ERRORS):
+        attempt = 0
+        while True:
+            await asyncio.sleep(self.circuit_breaker.wait_time())
+            response, error = None, None
+            try:
+                response = await function()
+            except errors as exc:
+                error = exc
+            delay = self.delay(attempt, response, error, idempotent)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            self.log_retry(description, attempt, delay, response, error)
+            await asyncio.sleep(delay)
+            attempt += 1
@@ -0,0 +1,199 @@
+import re
+
+from tarentula.json_codec import loads
+
+STREAM_CHUNK_SIZE = 64 * 1024
+# Bytes already read are dropped from the buffer past this size
+STREAM_COMPACT_SIZE = 1024 * 1024
+# Path of the hits array in search responses
+HITS_PATH = ('hits', 'hits')
+
+STRUCTURE = re.compile(rb'["{}\[\]]')
+PRIMITIVE_END = re.compile(rb'[,}\]\s]')
+WHITESPACE = b' \t\n\r'
+BACKSLASH = ord('\\')
+
+
+# Reads JSON values one by one from an iterable of bytes, only keeping in
+# memory the current chunk and the value being read
+class JsonStream:
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.buffer = bytearray()
+        self.position = 0
+
+    def fill(self):
+        chunk = next(self.chunks, None)
+        if chunk is None:
+            return False
+        # Bytes already read are only dropped once they are most of the buffer, so a
+        # large value is never copied again for every chunk. Offsets relative to the
+        # position stay valid.
+        if self.position >= STREAM_COMPACT_SIZE and self.position * 2 >= len(self.buffer):
+            del self.buffer[:self.position]
+            self.position = 0
+        self.buffer += chunk
+        return True
+
+    def fill_or_fail(self):
+        if not self.fill():
+            raise ValueError('Unexpected end of JSON stream')
+
+    def peek(self):
+        while True:
+            while self.position < len(self.buffer) and self.buffer[self.position] in WHITESPACE:
+                self.position += 1
+            if self.position < len(self.buffer):
+                return self.buffer[self.position:self.position + 1]
+            self.fill_or_fail()
+
+    def expect(self, token):
+        if self.peek() != token:
+            raise ValueError(f'Expected {token.decode()} in JSON stream, got {self.peek().decode()}')
+        self.position += 1
+
+    def next_item(self, end):
+        # Consume the separator after a value, return False at the end of the container
+        token = self.peek()
+        self.position += 1
+        if token == b',':
+            return True
+        if token == end:
+            return False
+        raise ValueError(f'Unexpected {token.decode()} in JSON stream')
+
+    def is_empty(self, end):
+        if self.peek() == end:
+            self.position += 1
+            return True
+        return False
+
+    def read_value(self):
+        token = self.peek()
+        if token == b'"':
+            end = self.scan_string(1)
+        elif token in (b'{', b'['):
+            end = self.scan_container()
+        else:
+            end = self.scan_primitive()
+        value = self.buffer[self.position:self.position + end]
+        self.position += end
+        return value
+
+    def scan_string(self, offset):
+        start = offset
+        while True:
+            index = self.buffer.find(b'"', self.position + offset)
+            if index < 0:
+                offset = len(self.buffer) - self.position
+                self.fill_or_fail()
+                continue
+            # A quote preceded by an odd number of backslashes is escaped
+            backslashes = 0
+            while index - backslashes > self.position + start and self.buffer[index - backslashes - 1] == BACKSLASH:
+                backslashes += 1
+            offset = index - self.position + 1
+            if backslashes % 2 == 0:
+                return offset
+
+    def scan_container(self):
+        depth = 0
+        offset = 0
+        while True:
+            match = STRUCTURE.search(self.buffer, self.position + offset)
+            if match is None:
+                offset = len(self.buffer) - self.position
+                self.fill_or_fail()
+                continue
+            index = match.start() - self.position
+            token = match.group()
+            if token == b'"':
+                offset = self.scan_string(index + 1)
+                continue
+            depth += 1 if token in b'{[' else -1
+            if depth == 0:
+                return index + 1
+            offset = index + 1
+
+    def scan_primitive(self):
+        offset = 0
+        while True:
+            match = PRIMITIVE_END.search(self.buffer, self.position + offset)
+            if match is not None:
+                return match.start() - self.position
+            offset = len(self.buffer) - self.position
+            # A number can end the stream
+            if not self.fill():
+                return offset
+
+
+# A search response decoded while it's read from the socket: hits are yielded
+# one by one and the other fields (like `_scroll_id`) are collected on the way
+class StreamedResponse:
+    def __init__(self, response, chunk_size=STREAM_CHUNK_SIZE):
+        self.response = response
+        self.stream = JsonStream(response.iter_content(chunk_size))
+        self.fields = {}
+        self.consumed = False
+        self.num_hits = 0
+        self.last_hit = None
+
+    def hits(self):
+        # Hits can only be read once
+        if self.consumed:
+            return
+        self.consumed = True
+        try:
+            yield from self.read_object(())
+        finally:
+            self.response.close()
+
+    def read_object(self, path):
+        self.stream.expect(b'{')
+        if self.stream.is_empty(b'}'):
+            return
+        while True:
+            key = loads(self.stream.read_value())
+            self.stream.expect(b':')
+            if path + (key,) == HITS_PATH:
+                yield from self.read_hits()
+            elif path + (key,) == HITS_PATH[:len(path) + 1] and self.stream.peek() == b'{':
+                yield from self.read_object(path + (key,))
+            else:
+                self.container(path)[key] = loads(self.stream.read_value())
+            if not self.stream.next_item(b'}'):
+                return
+
+    def read_hits(self):
+        self.stream.expect(b'[')
+        if self.stream.is_empty(b']'):
+            return
+        while True:
+            self.last_hit = loads(self.stream.read_value())
+            self.num_hits += 1
+            yield self.last_hit
+            if not self.stream.next_item(b']'):
+                return
+
+    def container(self, path):
+        container = self.fields
+        for key in path:
+            container = container.setdefault(key, {})
+        return container
+
+    def drain(self):
+        # Remaining hits are skipped to reach the fields after them
+        for _ in self.hits():
+            pass
+
+    def __contains__(self, key):
+        self.drain()
+        return key in self.fields
+
+    def __getitem__(self, key):
+        self.drain()
+        return self.fields[key]
+
+    def get(self, key, default=None):
+        self.drain()
+        return self.fields.get(key, default)
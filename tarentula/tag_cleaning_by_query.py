@@ -1,9 +1,6 @@
 import json
-from http.cookies import SimpleCookie
 
-import requests
-
-from tarentula.datashare_client import HTTP_REQUEST_TIMEOUT_SEC
+from tarentula.datashare_client import DatashareClient
 from tarentula.logger import logger
 
 
@@ -14,7 +11,8 @@ class TagsCleanerByQuery:
                  cookies: str = '',
                  apikey: str = None,
                  wait_for_completion: bool = True,
-                 query: str = None):
+                 query: str = None,
+                 **client_options):
         if query is None:
             self.query = {"query": {"match_all": {}}}
         elif query.startswith('@'):
@@ -27,42 +25,30 @@ class TagsCleanerByQuery:
         self.cookies_string = cookies
         self.apikey = apikey
         self.wait_for_completion = wait_for_completion
+        self.datashare_client = DatashareClient(elasticsearch_url=elasticsearch_url,
+                                                datashare_project=datashare_project,
+                                                cookies=cookies,
+                                                apikey=apikey,
+                                                **client_options)
 
     @property
     def cookies(self):
-        cookies = SimpleCookie()
-        try:
-            cookies.load(self.cookies_string)
-            return {key: morsel.value for (key, morsel) in cookies.items()}
-        except (TypeError, AttributeError):
-            return {}
+        return self.datashare_client.cookies
 
     @property
     def headers(self):
-        if self.apikey is not None:
-            return {
-                'Authorization': f'bearer {self.apikey}'
-            }
-        return None
-
-    @property
-    def tagging_by_query_endpoint(self):
-        url_template = '{elasticsearch_url}/{datashare_project}/_update_by_query?conflicts=proceed'
-        return url_template.format(elasticsearch_url=self.elasticsearch_url, datashare_project=self.datashare_project)
+        return self.datashare_client.headers
 
     def start(self):
-        logger.info("This action will remove all tags for documents matching query")
-        script = {"script": {"source": "ctx._source['tags'] = []"}}
-        params = {"wait_for_completion": str(self.wait_for_completion).lower()}
-        result = requests.post(self.tagging_by_query_endpoint,
-                               params=params,
-                               json={**script, **self.query},
-                               cookies=self.cookies,
-                               headers=self.headers,
-                               timeout=HTTP_REQUEST_TIMEOUT_SEC)
-        result.raise_for_status()
-        if self.wait_for_completion:
-            logger.info('updated %s documents', result.json()['updated'])
-        else:
-            logger.info('task created: [%s]', result.json()['task'])
-        return result
+        # Connections and the trace file are released once the command is over
+        with self.datashare_client:
+            logger.info("This action will remove all tags for documents matching query")
+            script = {"script": {"source": "ctx._source['tags'] = []"}}
+            params = {"wait_for_completion": str(self.wait_for_completion).lower()}
+            result = self.datashare_client.update_by_query(self.datashare_project, {**script, **self.query}, params)
+            result.raise_for_status()
+            if self.wait_for_completion:
+                logger.info('updated %s documents', result.json()['updated'])
+            else:
+                logger.info('task created: [%s]', result.json()['task'])
+            return result
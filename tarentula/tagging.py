@@ -1,13 +1,15 @@
+import asyncio
 import csv
 import re
-from time import sleep
-from http.cookies import SimpleCookie
 from rich.progress import Progress
 import requests
 from requests.exceptions import HTTPError, ConnectionError
 
-from tarentula.datashare_client import HTTP_REQUEST_TIMEOUT_SEC
+from tarentula.async_datashare_client import AsyncDatashareClient, run_concurrently, DEFAULT_CONCURRENCY
+from tarentula.datashare_client import DatashareClient
 from tarentula.logger import logger
+from tarentula.metrics import metrics
+from tarentula.throttle import AdaptiveThrottle
 
 DATASHARE_DOCUMENT_ROUTE = re.compile(r'/#/d/[a-zA-Z0-9_-]+/(\w+)(?:/(\w+))?$')
 
@@ -21,7 +23,11 @@ class Tagger:
                  cookies: str = '',
                  apikey: str = None,
                  traceback: bool = False,
-                 progressbar: bool = True):
+                 progressbar: bool = True,
+                 async_mode: bool = False,
+                 concurrency: int = DEFAULT_CONCURRENCY,
+                 target_latency: int = 0,
+                 **client_options):
         self.datashare_url = datashare_url
         self.datashare_project = datashare_project
         self.cookies_string = cookies
@@ -30,6 +36,20 @@ class Tagger:
         self.csv_path = csv_path
         self.traceback = traceback
         self.progressbar = progressbar
+        self.async_mode = async_mode
+        self.concurrency = concurrency
+        self.client_options = client_options
+        self.failed_tags = []
+        # Concurrency and delay between tags are tuned from the requests' latency
+        self.adaptive_throttle = AdaptiveThrottle(throttle, target_latency, concurrency if async_mode else 1)
+        self.datashare_client = DatashareClient(datashare_url,
+                                                None,
+                                                datashare_project,
+                                                cookies,
+                                                apikey,
+                                                **client_options)
+        self.datashare_client.transport.listeners.append(self.adaptive_throttle)
+        self.datashare_client.transport.listeners.append(metrics)
 
     @property
     def no_progressbar(self):
@@ -64,27 +84,18 @@ class Tagger:
 
     @property
     def cookies(self):
-        cookies = SimpleCookie()
-        try:
-            cookies.load(self.cookies_string)
-            return {key: morsel.value for (key, morsel) in cookies.items()}
-        except (TypeError, AttributeError):
-            return {}
+        return self.datashare_client.cookies
 
     @property
     def headers(self):
-        if self.apikey is not None:
-            return {
-                'Authorization': f'bearer {self.apikey}'
-            }
-        return None
+        return self.datashare_client.headers
 
     @property
     def total_steps(self):
         return sum(len(leaf['tags']) for _, leaf in self.tree.items())
 
     def sleep(self):
-        sleep(self.throttle / 1000)
+        self.adaptive_throttle.sleep()
 
     def sanitize_row(self, row):
         if 'documentUrl' in row:
@@ -93,42 +104,76 @@ class Tagger:
                 row['documentId'], row['routing'] = groups[0]
         return row
 
-    def leaf_tagging_endpoint(self, leaf):
+    def tag_leaf(self, leaf, tag):
         document_id, routing = (leaf['document_id'], leaf['routing'])
-        # @see https://github.com/ICIJ/datashare/wiki/Datashare-API
-        url_template = '{datashare_url}/api/{datashare_project}/documents/tags/{document_id}?routing={routing}'
-        return url_template.format(
-            datashare_url=self.datashare_url,
-            datashare_project=self.datashare_project,
-            document_id=document_id,
-            routing=routing
-        )
+        return self.datashare_client.tag(self.datashare_project, document_id, routing, [tag])
 
     def summarize(self):
         summary = f'Adding {len(self.tags)} tags to {len(self.document_ids)} documents'
         logger.info(summary)
         return summary
 
+    def log_tag_result(self, result, tag, document_id):
+        result.raise_for_status()
+        if result.status_code == requests.codes.ok:
+            logger.info('Tag "%s" already exists on document "%s"', tag, document_id)
+        elif result.status_code == requests.codes.created:
+            logger.info('Added "%s" to document "%s"', tag, document_id)
+
+    def log_tag_failure(self, tag, document_id):
+        # Requests are already retried by the client, failed tags are listed at the end
+        self.failed_tags.append((document_id, tag))
+        metrics.increment('errors')
+        logger.warning('Unable to add "%s" to document "%s"', tag, document_id, exc_info=self.traceback)
+
+    def log_failures(self):
+        if self.failed_tags:
+            logger.error('Unable to add %s tag(s): %s', len(self.failed_tags),
+                         ', '.join(f'"{tag}" to "{document_id}"' for document_id, tag in self.failed_tags))
+
+    async def tag_leaf_async(self, datashare_client, leaf, tag, progress, task):
+        document_id, routing = (leaf['document_id'], leaf['routing'])
+        try:
+            result = await datashare_client.tag(self.datashare_project, document_id, routing, [tag])
+            self.log_tag_result(result, tag, document_id)
+        except (HTTPError, ConnectionError):
+            self.log_tag_failure(tag, document_id)
+        metrics.increment('documents')
+        progress.advance(task)
+
+    async def start_async(self, progress, task):
+        async with AsyncDatashareClient(self.datashare_url, None, self.datashare_project, self.cookies_string,
+                                        self.apikey, **self.client_options) as datashare_client:
+            datashare_client.transport.listeners.append(self.adaptive_throttle)
+            datashare_client.transport.listeners.append(metrics)
+            async def coroutines():
+                for leaf in self.tree.values():
+                    for tag in leaf['tags']:
+                        yield self.tag_leaf_async(datashare_client, leaf, tag, progress, task)
+                        await self.adaptive_throttle.sleep_async()
+
+            await run_concurrently(coroutines(), lambda: self.adaptive_throttle.concurrency)
+
     def start(self):
-        with Progress(disable=self.no_progressbar) as progress:
-            desc = self.summarize()
-            task = progress.add_task(desc, total=self.total_steps)
-            for document_id, leaf in self.tree.items():
-                endpoint_url = self.leaf_tagging_endpoint(leaf)
-                for tag in leaf['tags']:
-                    try:
-                        result = requests.put(endpoint_url,
-                                              json=[tag],
-                                              cookies=self.cookies,
-                                              headers=self.headers,
-                                              timeout=HTTP_REQUEST_TIMEOUT_SEC)
-                        result.raise_for_status()
-                        if result.status_code == requests.codes.ok:
-                            logger.info('Tag "%s" already exists on document "%s"', tag, document_id)
-                        elif result.status_code == requests.codes.created:
-                            logger.info('Added "%s" to document "%s"', tag, document_id)
-                        self.sleep()
-                    except (HTTPError, ConnectionError):
-                        logger.warning('Unable to add "%s" to document "%s"', tag, document_id,
-                                       exc_info=self.traceback)
-                    progress.advance(task)
+        # Connections and the trace file are released once the command is over
+        with self.datashare_client:
+            with Progress(disable=self.no_progressbar) as progress:
+                desc = self.summarize()
+                task = progress.add_task(desc, total=self.total_steps)
+                if self.async_mode:
+                    asyncio.run(self.start_async(progress, task))
+                else:
+                    self.start_sync(progress, task)
+            self.log_failures()
+
+    def start_sync(self, progress, task):
+        for document_id, leaf in self.tree.items():
+            for tag in leaf['tags']:
+                try:
+                    result = self.tag_leaf(leaf, tag)
+                    self.log_tag_result(result, tag, document_id)
+                    self.sleep()
+                except (HTTPError, ConnectionError):
+                    self.log_tag_failure(tag, document_id)
+                metrics.increment('documents')
+                progress.advance(task)
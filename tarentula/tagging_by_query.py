@@ -1,13 +1,11 @@
 import json
 
-from http.cookies import SimpleCookie
-from time import sleep
 from requests.exceptions import HTTPError, ConnectionError
 from rich.progress import Progress
-import requests
 
-from tarentula.datashare_client import HTTP_REQUEST_TIMEOUT_SEC
+from tarentula.datashare_client import DatashareClient
 from tarentula.logger import logger
+from tarentula.throttle import AdaptiveThrottle
 
 
 class TaggerByQuery:
@@ -21,7 +19,9 @@ class TaggerByQuery:
                  progressbar: bool = True,
                  traceback: bool = False,
                  wait_for_completion: bool = True,
-                 scroll_size: int = 1000):
+                 scroll_size: int = 1000,
+                 target_latency: int = 0,
+                 **client_options):
         self.datashare_project = datashare_project
         self.elasticsearch_url = elasticsearch_url
         self.cookies_string = cookies
@@ -32,6 +32,15 @@ class TaggerByQuery:
         self.progressbar = progressbar
         self.wait_for_completion = wait_for_completion
         self.scroll_size = scroll_size
+        # Delay between tags is tuned from the requests' latency
+        self.adaptive_throttle = AdaptiveThrottle(throttle, target_latency)
+        # Update by query only talks to Elasticsearch, the project must already exist
+        self.datashare_client = DatashareClient(elasticsearch_url=elasticsearch_url,
+                                                datashare_project=datashare_project,
+                                                cookies=cookies,
+                                                apikey=apikey,
+                                                **client_options)
+        self.datashare_client.transport.listeners.append(self.adaptive_throttle)
 
     @property
     def no_progressbar(self):
@@ -39,20 +48,11 @@ class TaggerByQuery:
 
     @property
     def cookies(self):
-        cookies = SimpleCookie()
-        try:
-            cookies.load(self.cookies_string)
-            return {key: morsel.value for (key, morsel) in cookies.items()}
-        except (TypeError, AttributeError):
-            return {}
+        return self.datashare_client.cookies
 
     @property
     def headers(self):
-        if self.apikey is not None:
-            return {
-                'Authorization': f'bearer {self.apikey}'
-            }
-        return None
+        return self.datashare_client.headers
 
     @property
     def tags(self):
@@ -60,13 +60,8 @@ class TaggerByQuery:
             tags = json.loads(json_file.read())
             return tags
 
-    @property
-    def tagging_by_query_endpoint(self):
-        url_template = '{elasticsearch_url}/{datashare_project}/_update_by_query?conflicts=proceed'
-        return url_template.format(elasticsearch_url=self.elasticsearch_url, datashare_project=self.datashare_project)
-
     def sleep(self):
-        sleep(self.throttle / 1000)
+        self.adaptive_throttle.sleep()
 
     def task_url(self, task):
         url_template = '{elasticsearch_url}/_tasks/{task}'
@@ -105,12 +100,7 @@ class TaggerByQuery:
             "wait_for_completion": str(self.wait_for_completion).lower(),
             "scroll_size": self.scroll_size,
         }
-        result = requests.post(self.tagging_by_query_endpoint,
-                               params=params,
-                               json=query,
-                               cookies=self.cookies,
-                               headers=self.headers,
-                               timeout=HTTP_REQUEST_TIMEOUT_SEC)
+        result = self.datashare_client.update_by_query(self.datashare_project, query, params)
         result.raise_for_status()
         return result
 
@@ -119,21 +109,23 @@ class TaggerByQuery:
         return len(self.tags.keys())
 
     def start(self):
-        count = self.tags_count
-        desc = f'This action will add {count} tag(s)'
-        with Progress(disable=self.no_progressbar) as progress:
-            task = progress.add_task(desc, total=count)
-            for (tag, query) in self.tags.items():
-                try:
-                    progress.console.print(f'Adding "{tag}" tag')
-                    result = self.tag_documents(tag, query).json()
-                    if self.wait_for_completion:
-                        progress.console.print(f'└── documents updated in {result["took"]}ms')
-                        logger.info('Documents tagged with [%s] in %sms', tag, result['took'])
-                    else:
-                        progress.console.print(f'└── task created: {self.task_url(result["task"])}')
-                        logger.info('Task [%s] created for tag [%s]', result['task'], tag)
-                    progress.advance(task)
-                    self.sleep()
-                except (HTTPError, ConnectionError):
-                    logger.error('Unable to add tag [%s] (connection error)', tag, exc_info=self.traceback)
+        # Connections and the trace file are released once the command is over
+        with self.datashare_client:
+            count = self.tags_count
+            desc = f'This action will add {count} tag(s)'
+            with Progress(disable=self.no_progressbar) as progress:
+                task = progress.add_task(desc, total=count)
+                for (tag, query) in self.tags.items():
+                    try:
+                        progress.console.print(f'Adding "{tag}" tag')
+                        result = self.tag_documents(tag, query).json()
+                        if self.wait_for_completion:
+                            progress.console.print(f'└── documents updated in {result["took"]}ms')
+                            logger.info('Documents tagged with [%s] in %sms', tag, result['took'])
+                        else:
+                            progress.console.print(f'└── task created: {self.task_url(result["task"])}')
+                            logger.info('Task [%s] created for tag [%s]', result['task'], tag)
+                        progress.advance(task)
+                        self.sleep()
+                    except (HTTPError, ConnectionError):
+                        logger.error('Unable to add tag [%s] (connection error)', tag, exc_info=self.traceback)
@@ -0,0 +1,81 @@
+import asyncio
+from time import sleep
+
+from tarentula.logger import logger
+
+THROTTLE_MAX_DELAY_SEC = 10
+THROTTLE_DELAY_STEP_SEC = 0.01
+THROTTLE_LATENCY_SMOOTHING = 0.3
+# Statuses meaning the cluster is overloaded
+THROTTLE_CONGESTION_STATUSES = (429, 502, 503, 504)
+
+
+class AdaptiveThrottle:
+    def __init__(self, throttle=0, target_latency=0, max_concurrency=1, max_delay=THROTTLE_MAX_DELAY_SEC):
+        # Delays are given in milliseconds like the --throttle option
+        self.delay = throttle / 1000
+        self.target_latency = target_latency / 1000
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_delay = max(max_delay, self.delay)
+        # Without a target latency the throttle is fixed, like before
+        self.concurrency = 1 if self.enabled else self.max_concurrency
+        self.latency = None
+        self.samples = 0
+
+    @property
+    def enabled(self):
+        return self.target_latency > 0
+
+    def __call__(self, elapsed, response=None, error=None, streamed=False):  # pylint: disable=unused-argument
+        self.record(elapsed, getattr(response, 'status_code', None), error)
+
+    def record(self, elapsed, status_code=None, error=None):
+        if not self.enabled:
+            return
+        # The latency is smoothed so a single slow request doesn't slow down everything
+        if self.latency is None:
+            self.latency = elapsed
+        else:
+            self.latency += THROTTLE_LATENCY_SMOOTHING * (elapsed - self.latency)
+        self.samples += 1
+        # Requests sent before the last change are ignored, a window holds one request per concurrent slot
+        if self.samples < self.concurrency:
+            return
+        if error is not None or status_code in THROTTLE_CONGESTION_STATUSES:
+            self.decrease(overloaded=True)
+        elif self.latency > self.target_latency:
+            self.decrease(overloaded=False)
+        else:
+            self.increase()
+
+    def increase(self):
+        self.samples = 0
+        if self.delay > 0:
+            self.delay = max(0, self.delay - max(THROTTLE_DELAY_STEP_SEC, self.delay / 10))
+        elif self.concurrency < self.max_concurrency:
+            self.concurrency += 1
+        else:
+            return
+        logger.debug('Throttle speeding up: concurrency %s, delay %.3fs (latency %.0fms)',
+                     self.concurrency, self.delay, self.latency * 1000)
+
+    def decrease(self, overloaded=False):
+        self.samples = 0
+        if self.concurrency > 1:
+            self.concurrency = max(1, self.concurrency // 2)
+        elif overloaded:
+            # The cluster rejects requests: back off exponentially
+            self.delay = min(self.max_delay, max(THROTTLE_DELAY_STEP_SEC, self.delay * 2))
+        elif self.delay < self.target_latency:
+            # The cluster is only slow: space out requests, never longer than the target latency
+            self.delay = min(self.target_latency, self.delay + THROTTLE_DELAY_STEP_SEC)
+        else:
+            return
+        logger.info('Throttle slowing down: concurrency %s, delay %.3fs (latency %.0fms)',
+                    self.concurrency, self.delay, self.latency * 1000)
+
+    def sleep(self):
+        sleep(self.delay)
+
+    async def sleep_async(self):
+        await asyncio.sleep(self.delay)
@@ -0,0 +1,102 @@
+import re
+import threading
+from datetime import datetime, timedelta, timezone
+from time import monotonic
+from urllib.parse import urlsplit
+
+from tarentula.json_codec import dumps
+from tarentula.logger import logger
+
+SLOW_REQUEST_MS = 0
+# Path segments kept as they are in endpoint templates, the other ones are
+# names of projects or ids of documents
+ENDPOINT_WORDS = ('api', 'index', 'search', 'scroll', 'documents', 'src', 'tags')
+# Elasticsearch writes `took` first in its responses
+TOOK = re.compile(rb'^\s*\{\s*"took"\s*:\s*(\d+)')
+
+
+def endpoint_template(url):
+    segments = urlsplit(url).path.split('/')
+    return '/'.join(segment if segment == '' or segment.startswith('_') or segment in ENDPOINT_WORDS else '*'
+                    for segment in segments)
+
+
+def response_took(response):
+    match = TOOK.match(response.content[:64])
+    return int(match.group(1)) if match else None
+
+
+def response_size(response, streamed=False):
+    # Streamed bodies are counted by the underlying stream, when it can tell
+    tell = getattr(response.raw, 'tell', None) if streamed else None
+    if tell is not None:
+        return tell()
+    if not streamed and response.content:
+        return len(response.content)
+    # Bodies written to files by the async transport are gone
+    return int(response.headers.get('Content-Length', 0))
+
+
+def response_ttfb(response):
+    # Requests measures the time until the headers are parsed, other backends don't
+    elapsed = getattr(response, 'elapsed', None)
+    return elapsed.total_seconds() if elapsed else None
+
+
+def milliseconds(seconds):
+    return None if seconds is None else round(seconds * 1000, 1)
+
+
+# Every request is written as a JSON line, HAR-like, with its timings. Requests
+# slower than `slow_request_ms` are also logged as warnings.
+class RequestTrace:
+    def __init__(self, path=None, slow_request_ms=SLOW_REQUEST_MS):
+        self.path = path
+        self.slow_request_ms = slow_request_ms
+        self.lock = threading.Lock()
+        # Several clients of the same run can write in the same file
+        self.file = None if path is None else open(path, 'a', encoding='utf-8')  # pylint: disable=consider-using-with
+
+    def record(self, method, url, start, response=None, error=None, streamed=False):
+        duration = monotonic() - start
+        # Responses with a streamed body are written once the body was read
+        if streamed and response is not None:
+            close = response.close
+
+            def traced_close():
+                close()
+                self.write(method, url, start, duration, monotonic() - start, response, error, streamed)
+            response.close = traced_close
+        else:
+            ttfb = None if response is None else response_ttfb(response)
+            self.write(method, url, start, ttfb or duration, duration, response, error, streamed)
+
+    def write(self, method, url, start, ttfb, duration, response=None, error=None, streamed=False):
+        # pylint: disable=too-many-arguments
+        entry = {
+            'startedDateTime': (datetime.now(timezone.utc) - timedelta(seconds=monotonic() - start))
+            .isoformat(timespec='milliseconds'),
+            'method': method,
+            'url': url,
+            'endpoint': endpoint_template(url),
+            'status': None if response is None else response.status_code,
+            'bytes': None if response is None else response_size(response, streamed),
+            'took': None if response is None or streamed else response_took(response),
+            'ttfb_ms': milliseconds(ttfb),
+            'duration_ms': milliseconds(duration),
+            'error': None if error is None else repr(error),
+        }
+        if 0 < self.slow_request_ms <= entry['duration_ms']:
+            logger.warning('Slow request: %s %s took %sms (status %s, took %s)', method, entry['endpoint'],
+                           entry['duration_ms'], entry['status'], entry['took'])
+        if self.file is None:
+            return
+        line = dumps(entry).decode('utf-8')
+        with self.lock:
+            self.file.write(line + '\n')
+            self.file.flush()
+
+    def close(self):
+        if self.file is not None:
+            self.file.close()
+            self.file = None
@@ -0,0 +1,277 @@
+import gzip
+from contextlib import contextmanager
+from functools import partial
+from io import BytesIO
+from time import monotonic
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+from tarentula.json_codec import dumps
+from tarentula.retry import RetryPolicy
+
+HTTP_REQUEST_TIMEOUT_SEC = 60
+HTTP_POOL_CONNECTIONS = 10
+HTTP_POOL_MAXSIZE = 10
+HTTP_GZIP_MIN_SIZE = 1024 * 1024
+TRANSPORT_BACKENDS = ('requests', 'http2')
+
+
+class Transport:
+    def __init__(self, pool_connections=HTTP_POOL_CONNECTIONS, pool_maxsize=HTTP_POOL_MAXSIZE, pool_block=False,
+                 keep_alive=True, gzip_min_size=HTTP_GZIP_MIN_SIZE, retry_policy=None, trace=None):
+        self.pool_connections = pool_connections
+        self.pool_maxsize = pool_maxsize
+        self.pool_block = pool_block
+        self.keep_alive = keep_alive
+        self.gzip_min_size = gzip_min_size
+        self.retry_policy = retry_policy or RetryPolicy()
+        # Callables notified with the duration and the outcome of every attempt, and
+        # whether its body is streamed
+        self.listeners = []
+        # Optional `RequestTrace` recording every attempt with its timings
+        self.trace = trace
+
+    # Backends implement `send` (synchronous or not) and `close`, bodies and
+    # parameters are prepared here the same way for all of them
+    def request(self, method, url, params=None, json=None, data=None, headers=None, cookies=None, stream=False,
+                timeout=HTTP_REQUEST_TIMEOUT_SEC, compress=False, idempotent=None):
+        headers = dict(headers or {})
+        if json is not None:
+            data = self.encode_json(json)
+            headers.setdefault('Content-Type', 'application/json')
+        if compress and data is not None and 0 < self.gzip_min_size <= len(data):
+            data = gzip.compress(data)
+            headers['Content-Encoding'] = 'gzip'
+        # Requests drops parameters without value, we do the same for every backend
+        params = {key: value for key, value in (params or {}).items() if value is not None}
+        send = self.observed(partial(self.send, method, url, params=params, data=data, headers=headers or None,
+                                     cookies=cookies, stream=stream, timeout=timeout), method, url, stream)
+        # Only POST requests can have side effects, callers flag the read-only ones
+        if idempotent is None:
+            idempotent = method != 'POST'
+        return self.retried(send, f'{method} {url}', idempotent)
+
+    def retried(self, send, description, idempotent=True):
+        return self.retry_policy.call(send, description, idempotent)
+
+    def notify(self, start, response=None, error=None, method=None, url=None, stream=False):
+        # pylint: disable=too-many-arguments
+        elapsed = monotonic() - start
+        for listener in self.listeners:
+            listener(elapsed, response, error, stream)
+        if self.trace is not None:
+            self.trace.record(method, url, start, response, error, stream)
+
+    def observed(self, send, method=None, url=None, stream=False):
+        def observed_send():
+            start = monotonic()
+            try:
+                response = send()
+            except Exception as error:
+                self.notify(start, error=error, method=method, url=url)
+                raise
+            self.notify(start, response, method=method, url=url, stream=stream)
+            return response
+        return observed_send
+
+    def encode_json(self, body):
+        return dumps(body)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.request('PUT', url, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.request('DELETE', url, **kwargs)
+
+
+class RequestsTransport(Transport):
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.session = requests.Session()
+        # One adapter for both schemes so every host gets its own pool of reusable connections
+        adapter = HTTPAdapter(pool_connections=self.pool_connections, pool_maxsize=self.pool_maxsize,
+                              pool_block=self.pool_block)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        if not self.keep_alive:
+            self.session.headers.update({'Connection': 'close'})
+
+    def send(self, method, url, params=None, data=None, headers=None, cookies=None, stream=False,
+             timeout=HTTP_REQUEST_TIMEOUT_SEC):
+        return self.session.request(method, url, params=params, data=data, headers=headers, cookies=cookies,
+                                    stream=stream, timeout=timeout)
+
+    def close(self):
+        self.session.close()
+
+
+# File-like access to an httpx streamed body, exposed as `raw` on responses
+class HttpxRawStream:
+    def __init__(self, response):
+        self.response = response
+        self.chunks = response.iter_bytes()
+        self.buffer = b''
+        self.decode_content = True
+
+    def read(self, size=-1):
+        while size < 0 or len(self.buffer) < size:
+            try:
+                self.buffer += next(self.chunks)
+            except StopIteration:
+                break
+        if size < 0:
+            size = len(self.buffer)
+        chunk, self.buffer = self.buffer[:size], self.buffer[size:]
+        return chunk
+
+    def close(self):
+        self.response.close()
+
+
+class HttpxTransport(Transport):
+    def __init__(self, http2=True, **options):
+        super().__init__(**options)
+        try:
+            import httpx
+        except ImportError as exc:
+            message = 'The http2 transport and the async mode require httpx: pip install "tarentula[http2]"'
+            raise ImportError(message) from exc
+        self.httpx = httpx
+        self.http2 = http2
+        max_connections = self.pool_connections * self.pool_maxsize
+        max_keepalive_connections = max_connections if self.keep_alive else 0
+        self.limits = httpx.Limits(max_connections=max_connections,
+                                   max_keepalive_connections=max_keepalive_connections)
+
+    def build_request(self, client, method, url, params=None, data=None, headers=None, cookies=None,
+                      timeout=HTTP_REQUEST_TIMEOUT_SEC):
+        headers = dict(headers or {})
+        # Per-request cookies are deprecated in httpx so we send them as a header
+        if cookies:
+            headers['Cookie'] = '; '.join(f'{key}={value}' for key, value in cookies.items())
+        # Waiting for a free connection must not count as a timeout when the pool is saturated
+        timeout = self.httpx.Timeout(timeout, pool=None)
+        return client.build_request(method, url, params=params, content=data, headers=headers, timeout=timeout)
+
+    @contextmanager
+    def translated_errors(self):
+        try:
+            yield
+        except self.httpx.TimeoutException as exc:
+            raise requests.exceptions.Timeout(exc) from exc
+        except self.httpx.TransportError as exc:
+            raise requests.exceptions.ConnectionError(exc) from exc
+
+    def to_requests_response(self, response, raw=None):
+        # Commands only deal with requests' responses and exceptions, whatever the backend
+        result = requests.Response()
+        result.status_code = response.status_code
+        result.headers = CaseInsensitiveDict(response.headers)
+        # httpx already decoded the body, its encoding and its length no longer apply
+        if 'Content-Encoding' in result.headers:
+            del result.headers['Content-Encoding']
+            result.headers.pop('Content-Length', None)
+        result.encoding = get_encoding_from_headers(result.headers)
+        result.reason = response.reason_phrase
+        result.url = str(response.url)
+        result.raw = raw
+        return result
+
+
+class Http2Transport(HttpxTransport):
+    def __init__(self, **options):
+        super().__init__(http2=True, **options)
+        # With HTTP/2 a single connection per host multiplexes all concurrent requests
+        self.client = self.httpx.Client(http2=True, limits=self.limits)
+
+    def send(self, method, url, params=None, data=None, headers=None, cookies=None, stream=False,
+             timeout=HTTP_REQUEST_TIMEOUT_SEC):
+        request = self.build_request(self.client, method, url, params, data, headers, cookies, timeout)
+        with self.translated_errors():
+            response = self.client.send(request, stream=stream)
+        raw = HttpxRawStream(response) if stream else BytesIO(response.content)
+        return self.to_requests_response(response, raw)
+
+    def close(self):
+        self.client.close()
+
+
+class AsyncTransport(HttpxTransport):
+    def __init__(self, http2=False, **options):
+        super().__init__(http2=http2, **options)
+        self.client = self.httpx.AsyncClient(http2=http2, limits=self.limits)
+
+    async def send(self, method, url, params=None, data=None, headers=None, cookies=None, stream=False,
+                   timeout=HTTP_REQUEST_TIMEOUT_SEC):
+        # pylint: disable=unused-argument
+        # Raw files are streamed with `download` instead
+        request = self.build_request(self.client, method, url, params, data, headers, cookies, timeout)
+        with self.translated_errors():
+            response = await self.client.send(request)
+        return self.to_requests_response(response, BytesIO(response.content))
+
+    def retried(self, send, description, idempotent=True):
+        return self.retry_policy.call_async(send, description, idempotent)
+
+    def observed(self, send, method=None, url=None, stream=False):
+        async def observed_send():
+            start = monotonic()
+            try:
+                response = await send()
+            except Exception as error:
+                self.notify(start, error=error, method=method, url=url)
+                raise
+            self.notify(start, response, method=method, url=url, stream=stream)
+            return response
+        return observed_send
+
+    async def download(self, url, path, params=None, headers=None, cookies=None, timeout=HTTP_REQUEST_TIMEOUT_SEC):
+        params = {key: value for key, value in (params or {}).items() if value is not None}
+        send = self.observed(partial(self.download_once, url, path, params, headers, cookies, timeout), 'GET', url)
+        # The whole file is downloaded again when the stream breaks
+        response = await self.retried(send, f'GET {url}')
+        response.raise_for_status()
+
+    async def download_once(self, url, path, params=None, headers=None, cookies=None,
+                            timeout=HTTP_REQUEST_TIMEOUT_SEC):
+        request = self.build_request(self.client, 'GET', url, params, None, headers, cookies, timeout)
+        with self.translated_errors():
+            response = await self.client.send(request, stream=True)
+            try:
+                # Fail before creating the file, like the synchronous download does
+                if response.is_error:
+                    return self.to_requests_response(response, BytesIO())
+                with open(path, 'wb') as file:
+                    async for chunk in response.aiter_bytes():
+                        file.write(chunk)
+            finally:
+                await response.aclose()
+        # The body is already in the file
+        return self.to_requests_response(response, BytesIO())
+
+    async def close(self):
+        await self.client.aclose()
+
+
+def create_transport(backend='requests', **options):
+    if backend == 'http2':
+        return Http2Transport(**options)
+    if backend == 'requests':
+        return RequestsTransport(**options)
+    raise ValueError(f'Unknown transport backend: {backend}')
+
+
+def create_async_transport(backend='requests', **options):
+    if backend not in TRANSPORT_BACKENDS:
+        raise ValueError(f'Unknown transport backend: {backend}')
+    # Asynchronous requests always go through httpx, the backend only toggles HTTP/2
+    return AsyncTransport(http2=backend == 'http2', **options)
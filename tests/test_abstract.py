@@ -4,7 +4,8 @@ import requests
 
 from contextlib import contextmanager
 from os.path import dirname
-from unittest import TestCase
+from tempfile import TemporaryDirectory
+from unittest import TestCase, mock
 
 from tarentula.datashare_client import DatashareClient
 
@@ -20,6 +21,10 @@ class TestAbstract(TestCase):
 
     @classmethod
     def setUpClass(cls):
+        # Facts about the cluster are cached aside from the ones of the user
+        cls.cache_home = TemporaryDirectory()
+        cls.cache_home_patch = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': cls.cache_home.name})
+        cls.cache_home_patch.start()
         cls.elasticsearch_url = os.environ.get('TEST_ELASTICSEARCH_URL', 'http://elasticsearch:9200')
         cls.datashare_url = os.environ.get('TEST_DATASHARE_URL', 'http://localhost:8080')
         cls.datashare_client = DatashareClient(cls.datashare_url, cls.elasticsearch_url)
@@ -29,6 +34,16 @@ class TestAbstract(TestCase):
     @classmethod
     def tearDownClass(cls):
         cls.datashare_client.delete_index(cls.datashare_project)
+        cls.cache_home_patch.stop()
+        cls.cache_home.cleanup()
+
+    def setUp(self):
+        # Every test starts with an empty cache, whatever ran before it
+        cache_home = TemporaryDirectory()
+        self.addCleanup(cache_home.cleanup)
+        cache_home_patch = mock.patch.dict(os.environ, {'XDG_CACHE_HOME': cache_home.name})
+        cache_home_patch.start()
+        self.addCleanup(cache_home_patch.stop)
 
     @property
     def elasticsearch_version(self):
@@ -43,18 +58,14 @@ class TestAbstract(TestCase):
     def index_documents(self, documents=None):
         if documents is None:
             documents = []
-        for document in documents:
-            id = document.get('_id', None)
-            routing = document.get('_routing', None)
-            self.datashare_client.index(index=self.datashare_project, document=document, id=id, routing=routing)
-        self.datashare_client.refresh(index=self.datashare_project)
+        errors = self.datashare_client.bulk_index(index=self.datashare_project, documents=documents)
+        self.assertEqual(errors, [])
 
     def delete_documents(self, documents=None):
         if documents is None:
             documents = []
-        for document in documents:
-            self.datashare_client.delete(index=self.datashare_project, id=document['_id'])
-        self.datashare_client.refresh(index=self.datashare_project)
+        ids = [(document['_id'], document.get('_routing', None)) for document in documents]
+        self.datashare_client.bulk_delete(index=self.datashare_project, ids=ids)
 
     @contextmanager
     def existing_species_documents(self):
@@ -0,0 +1,173 @@
+import asyncio
+import json
+import uuid
+
+import httpx
+
+from tarentula.async_datashare_client import AsyncDatashareClient, run_concurrently
+from .test_abstract import TestAbstract
+
+
+class TestAsyncDatashareClient(TestAbstract):
+
+    def index_names(self, project, names):
+        for name in names:
+            self.datashare_client.index(index=project, document={'name': name}, id=str(uuid.uuid4()))
+
+    def collect(self, generator):
+        async def consume():
+            return [item async for item in generator]
+        return asyncio.run(consume())
+
+    def async_client(self):
+        return AsyncDatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project)
+
+    def test_query_with_two_docs(self):
+        with self.datashare_client.temporary_project(self.datashare_project) as project:
+            self.index_names(project, ['Atypidae', 'Migidae'])
+
+            async def query():
+                async with self.async_client() as client:
+                    return await client.query(index=project)
+            total = asyncio.run(query()).get('hits', {}).get('total', {}).get('value', None)
+            self.assertEqual(total, 2)
+
+    def test_query_all_is_made_over_all_documents(self):
+        with self.datashare_client.temporary_project(self.datashare_project) as project:
+            names = ['Actinopodidae', 'Antrodiaetidae', 'Atracidae', 'Atypidae', 'Barychelidae']
+            self.index_names(project, names)
+            client = self.async_client()
+            documents = self.collect(client.query_all(index=project, q='name:*', size=2, limit=5))
+            self.assertCountEqual([document['_source']['name'] for document in documents], names)
+
+    def test_query_all_respects_limit(self):
+        with self.datashare_client.temporary_project(self.datashare_project) as project:
+            self.index_names(project, ['Actinopodidae', 'Antrodiaetidae', 'Atracidae', 'Atypidae', 'Barychelidae'])
+            client = self.async_client()
+            documents = self.collect(client.query_all(index=project, q='name:*', size=2, limit=3))
+            self.assertEqual(len(documents), 3)
+
+    def test_scan_is_made_over_all_documents(self):
+        with self.datashare_client.temporary_project(self.datashare_project) as project:
+            self.index_names(project, ['Actinopodidae', 'Antrodiaetidae', 'Atracidae', 'Atypidae', 'Barychelidae'])
+            client = self.async_client()
+            documents = self.collect(client.scan_all(index=project, q='name:*', size=2))
+            self.assertEqual(len(documents), 5)
+
+    def test_scan_respects_limit(self):
+        with self.datashare_client.temporary_project(self.datashare_project) as project:
+            self.index_names(project, ['Actinopodidae', 'Antrodiaetidae', 'Atracidae', 'Atypidae', 'Barychelidae'])
+            client = self.async_client()
+            documents = self.collect(client.scan_all(index=project, q='name:*', size=2, limit=3))
+            self.assertEqual(len(documents), 3)
+
+    def test_concurrency_is_bounded(self):
+        running = []
+        peak = []
+
+        async def work():
+            running.append(1)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.pop()
+
+        asyncio.run(run_concurrently((work() for _ in range(20)), concurrency=4))
+        self.assertEqual(len(peak), 20)
+        self.assertEqual(max(peak), 4)
+
+    def test_concurrency_can_change_while_running(self):
+        running = []
+        peak = []
+        limits = iter([1] * 10 + [3] * 100)
+
+        async def work():
+            running.append(1)
+            peak.append(len(running))
+            await asyncio.sleep(0.01)
+            running.pop()
+
+        asyncio.run(run_concurrently((work() for _ in range(20)), concurrency=lambda: next(limits)))
+        self.assertEqual(peak[0], 1)
+        self.assertEqual(max(peak), 3)
+
+    def mocked_client(self, handler):
+        client = self.async_client()
+        # Requests are answered by the handler instead of Elasticsearch
+        client.transport.client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        return client
+
+    def test_scroll_of_an_empty_scan_is_cleared(self):
+        requests_sent = []
+
+        def handler(request):
+            requests_sent.append((request.method, request.url.path, json.loads(request.content or b'{}')))
+            # Filtered empty pages only have a scroll id
+            return httpx.Response(200, json={'_scroll_id': 'c2Nhbj'})
+        client = self.mocked_client(handler)
+        documents = self.collect(client.scan_all(index=self.datashare_project, q='name:*', size=2))
+        self.assertEqual(documents, [])
+        self.assertIn(('DELETE', '/_search/scroll', {'scroll_id': ['c2Nhbj']}), requests_sent)
+        self.assertEqual(client.open_contexts, set())
+
+    def test_scan_size_is_capped_to_the_limit(self):
+        bodies = []
+
+        def handler(request):
+            bodies.append(json.loads(request.content or b'{}'))
+            hits = [{'_id': f'doc{n}'} for n in range(bodies[0].get('size', 10))]
+            return httpx.Response(200, json={'_scroll_id': 'c2Nhbj', 'hits': {'hits': hits}})
+        client = self.mocked_client(handler)
+        documents = self.collect(client.scan_all(index=self.datashare_project, q='name:*', size=10, limit=3))
+        self.assertEqual(len(documents), 3)
+        self.assertEqual(bodies[0]['size'], 3)
+
+    def test_query_all_without_pit_scrolls_in_index_order(self):
+        requests_sent = []
+
+        def handler(request):
+            requests_sent.append((request.method, request.url, json.loads(request.content or b'{}')))
+            # Point in time isn't supported by this cluster
+            if request.url.path.endswith('/_pit'):
+                return httpx.Response(400, json={'error': 'no handler found'})
+            if request.method == 'DELETE':
+                return httpx.Response(200, json={'num_freed': 1})
+            if request.url.path.endswith('/_search/scroll'):
+                return httpx.Response(200, json={'_scroll_id': 'abc', 'hits': {'hits': [{'_id': 'doc3'}]}})
+            return httpx.Response(200, json={'_scroll_id': 'abc', 'hits': {'hits': [{'_id': 'doc1'}, {'_id': 'doc2'}]}})
+        client = self.mocked_client(handler)
+        documents = self.collect(client.query_all(index=self.datashare_project, sort={'_doc': 'asc'}, size=2,
+                                                  limit=2, **{'from': 1}))
+        self.assertEqual([document['_id'] for document in documents], ['doc2', 'doc3'])
+        searches = [(url, body) for method, url, body in requests_sent if url.path.endswith('/_search')]
+        self.assertEqual(searches[0][0].params['scroll'], '10m')
+        # The index order is kept, nothing is sorted on the fielddata of _id
+        self.assertEqual(searches[0][1]['sort'], {'_doc': 'asc'})
+        self.assertEqual(client.open_contexts, set())
+
+    def test_slices_are_not_read_in_async_mode(self):
+        bodies = []
+
+        def handler(request):
+            bodies.append(json.loads(request.content or b'{}'))
+            return httpx.Response(200, json={'_scroll_id': 'c2Nhbj', 'hits': {'hits': []}})
+        client = self.mocked_client(handler)
+        with self.assertLogs('tarentula', level='WARNING') as logs:
+            documents = self.collect(client.scan_or_query_all(self.datashare_project, ['name'], '_score', None, '10m',
+                                                              {'query': {'match_all': {}}}, 0, 0, 2, slices=2))
+        self.assertEqual(documents, [])
+        self.assertIn('"slices" will not be used in async mode', logs.output[0])
+        self.assertNotIn('slice', bodies[0])
+
+    def test_query_all_through_datashare_does_not_use_pit(self):
+        requests_sent = []
+
+        def handler(request):
+            requests_sent.append((request.url.path, json.loads(request.content or b'{}')))
+            return httpx.Response(200, json={'hits': {'hits': []}})
+        client = self.mocked_client(handler)
+        client.elasticsearch_url = None
+        documents = self.collect(client.query_all(index=self.datashare_project, sort={'_doc': 'asc'}, size=2,
+                                                  limit=20000))
+        self.assertEqual(documents, [])
+        self.assertEqual([path for path, _ in requests_sent], ['/api/index/search/%s/_search' % self.datashare_project])
+        self.assertNotIn('pit', requests_sent[0][1])
@@ -0,0 +1,40 @@
+from os.path import join
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from tarentula.bootstrap_cache import BootstrapCache
+from .test_abstract import TestAbstract
+
+
+class TestBootstrapCache(TestAbstract):
+
+    def test_values_are_kept_between_instances(self):
+        with TemporaryDirectory() as tmp:
+            BootstrapCache(path=join(tmp, 'bootstrap.json')).set([7, 17], 'version', 'http://es')
+            self.assertEqual(BootstrapCache(path=join(tmp, 'bootstrap.json')).get('version', 'http://es'), [7, 17])
+
+    def test_values_expire(self):
+        with TemporaryDirectory() as tmp:
+            cache = BootstrapCache(ttl=10, path=join(tmp, 'bootstrap.json'))
+            cache.set(True, 'version', 'http://es')
+            with mock.patch('tarentula.bootstrap_cache.time', return_value=cache.entries[
+                    'version|http://es']['expires']):
+                self.assertIsNone(cache.get('version', 'http://es'))
+
+    def test_values_can_be_invalidated(self):
+        with TemporaryDirectory() as tmp:
+            cache = BootstrapCache(path=join(tmp, 'bootstrap.json'))
+            cache.set(True, 'version', 'http://es')
+            cache.invalidate('version', 'http://es')
+            self.assertIsNone(BootstrapCache(path=join(tmp, 'bootstrap.json')).get('version', 'http://es'))
+
+    def test_nothing_is_written_when_disabled(self):
+        with TemporaryDirectory() as tmp:
+            BootstrapCache(ttl=0, path=join(tmp, 'bootstrap.json')).set(True, 'version', 'http://es')
+            self.assertIsNone(BootstrapCache(path=join(tmp, 'bootstrap.json')).get('version', 'http://es'))
+
+    def test_corrupted_file_is_ignored(self):
+        with TemporaryDirectory() as tmp:
+            with open(join(tmp, 'bootstrap.json'), 'w') as cache_file:
+                cache_file.write('{')
+            self.assertIsNone(BootstrapCache(path=join(tmp, 'bootstrap.json')).get('version', 'http://es'))
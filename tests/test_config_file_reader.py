@@ -1,7 +1,10 @@
 from .test_abstract import TestAbstract
-from tarentula.config_file_reader import ConfigFileReader
+from tarentula.config_file_reader import ConfigFileReader, config_store
+from contextlib import contextmanager
+from tempfile import TemporaryDirectory
 from unittest import mock
 
+import click
 import os
 
 class TestConfigFileReader(TestAbstract):
@@ -49,3 +52,45 @@ class TestConfigFileReader(TestAbstract):
         with self.working_directory('./tests/fixtures/'):
             reader = ConfigFileReader('syslog_address', 'here', section='logger')
             self.assertEqual(reader(), 'here')
+
+    @contextmanager
+    def config_file(self, content):
+        with TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'tarentula.ini')
+            with open(path, 'w', encoding='utf-8') as ini_file:
+                ini_file.write(content)
+            with mock.patch.dict(os.environ, {'TARENTULA_CONFIG': path}):
+                yield path
+
+    def test_load_typed_values(self):
+        with self.config_file('[client]\npool_maxsize = 20\npool_block = yes\nretry_backoff = 0.1\n'):
+            self.assertEqual(ConfigFileReader('pool_maxsize', 10, 'client')(), 20)
+            self.assertIs(ConfigFileReader('pool_block', False, 'client')(), True)
+            self.assertEqual(ConfigFileReader('retry_backoff', 0.5, 'client')(), 0.1)
+
+    def test_load_invalid_typed_value_as_it_is(self):
+        with self.config_file('[client]\npool_maxsize = many\n'):
+            self.assertEqual(ConfigFileReader('pool_maxsize', 10, 'client')(), 'many')
+
+    def test_load_default_section_value_in_other_sections(self):
+        with self.config_file('[DEFAULT]\nprefetch = 2\n\n[client]\npool_maxsize = 20\n'):
+            self.assertEqual(ConfigFileReader('prefetch', 0, 'client')(), 2)
+
+    def test_load_command_section_first(self):
+        with self.config_file('[client]\nprefetch = 1\n\n[download]\nprefetch = 4\n'):
+            reader = ConfigFileReader('prefetch', 0, 'client')
+            self.assertEqual(reader(), 1)
+            with click.Context(click.Command('download'), info_name='download'):
+                self.assertEqual(reader(), 4)
+            with click.Context(click.Command('export-by-query'), info_name='export-by-query'):
+                self.assertEqual(reader(), 1)
+
+    def test_parse_config_file_once_until_invalidated(self):
+        with self.config_file('[DEFAULT]\ndatashare_url = http://here:8080\n') as path:
+            reader = ConfigFileReader('datashare_url')
+            self.assertEqual(reader(), 'http://here:8080')
+            with open(path, 'w', encoding='utf-8') as ini_file:
+                ini_file.write('[DEFAULT]\ndatashare_url = http://there:8080\n')
+            self.assertEqual(reader(), 'http://here:8080')
+            config_store.invalidate()
+            self.assertEqual(reader(), 'http://there:8080')
@@ -1,6 +1,11 @@
+import re
+from unittest import mock
+
+import responses
 from click.testing import CliRunner
 
 from tarentula.cli import cli
+from tarentula.count import Count
 from .test_abstract import TestAbstract
 
 
@@ -39,3 +44,11 @@ class TestCount(TestAbstract):
                                 self.elasticsearch_url, '--datashare-project', self.datashare_project, '--query',
                                 '_id:6VEdcVlWszkUd94XeuSd'])
             self.assertEqual('1', self.extract_num_docs_from_response(result.output))
+
+    def test_client_is_closed_once_counted(self):
+        count = Count(self.datashare_url, self.datashare_project, elasticsearch_url=self.elasticsearch_url)
+        with responses.RequestsMock() as resp, mock.patch.object(count.datashare_client, 'close') as close:
+            resp.add(responses.POST, re.compile(r'^%s/%s/_count' % (self.elasticsearch_url, self.datashare_project)),
+                     json={'count': 3})
+            count.start()
+        close.assert_called_once()
@@ -1,6 +1,13 @@
+import json
+import re
 import requests
+import responses
 import uuid
 
+from tempfile import TemporaryDirectory
+from unittest import mock
+
+from tarentula.datashare_client import DatashareClient, pit_sort, scan_sort
 from .test_abstract import TestAbstract
 
 
@@ -174,3 +181,382 @@ class TestDatashareClient(TestAbstract):
             except Exception as e:
                 msg = f"Error when counting with a complex query: {e}: {e.__traceback__}"
                 self.fail(msg)
+
+    def test_pool_options_are_applied_to_session(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                 pool_connections=2, pool_maxsize=4, pool_block=True, create_project=False)
+        adapter = client.transport.session.get_adapter(self.elasticsearch_url)
+        self.assertEqual(adapter.poolmanager.connection_pool_kw['maxsize'], 4)
+        self.assertTrue(adapter.poolmanager.connection_pool_kw['block'])
+
+    def test_cookies_and_apikey_are_sent_by_session(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                 cookies='foo=bar', apikey='my_api_key', create_project=False)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, re.compile(r'^%s/%s/_count' % (self.elasticsearch_url, self.datashare_project)),
+                     json={'count': 0})
+            client.count(index=self.datashare_project, query={'query': {'match_all': {}}})
+            client.count(index=self.datashare_project, query={'query': {'match_all': {}}})
+            self.assertEqual(len(resp.calls), 2)
+            self.assertEqual(resp.calls[1].request.headers['Authorization'], 'bearer my_api_key')
+            self.assertEqual(resp.calls[1].request.headers['Cookie'], 'foo=bar')
+
+    def test_project_is_not_created_when_disabled(self):
+        with responses.RequestsMock() as resp:
+            DatashareClient(self.datashare_url, self.elasticsearch_url, 'never-created', create_project=False)
+            self.assertEqual(len(resp.calls), 0)
+
+    def test_scan_only_requests_read_fields(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                 create_project=False)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, re.compile(r'^%s/%s/_search' % (self.elasticsearch_url, self.datashare_project)),
+                     json={'_scroll_id': 'abc', 'hits': {'hits': [{'_id': 'doc'}]}})
+            # Nothing left: the filtered response doesn't even contain "hits"
+            resp.add(responses.POST, '%s/_search/scroll' % self.elasticsearch_url, json={'_scroll_id': 'abc'})
+            resp.add(responses.DELETE, '%s/_search/scroll' % self.elasticsearch_url, json={'num_freed': 1})
+            documents = list(client.scan_all(index=self.datashare_project, size=1))
+            self.assertEqual(len(documents), 1)
+            self.assertIn('filter_path=_scroll_id%2Cpit_id%2Chits.hits._id', resp.calls[0].request.url)
+            self.assertIn('filter_path=_scroll_id%2Cpit_id%2Chits.hits._id', resp.calls[1].request.url)
+
+    def test_scan_clears_scroll_context(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                 create_project=False)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, re.compile(r'^%s/%s/_search' % (self.elasticsearch_url, self.datashare_project)),
+                     json={'_scroll_id': 'abc', 'hits': {'hits': [{'_id': 'doc'}]}})
+            resp.add(responses.POST, '%s/_search/scroll' % self.elasticsearch_url, json={'_scroll_id': 'abc'})
+            resp.add(responses.DELETE, '%s/_search/scroll' % self.elasticsearch_url, json={'num_freed': 1})
+            list(client.scan_all(index=self.datashare_project, size=1))
+            self.assertEqual(resp.calls[2].request.body, b'{"scroll_id":["abc"]}')
+            self.assertEqual(len(client.open_contexts), 0)
+
+    def test_scan_clears_scroll_context_when_limit_is_reached(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                 create_project=False)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, re.compile(r'^%s/%s/_search' % (self.elasticsearch_url, self.datashare_project)),
+                     json={'_scroll_id': 'abc', 'hits': {'hits': [{'_id': 'doc1'}, {'_id': 'doc2'}]}})
+            resp.add(responses.DELETE, '%s/_search/scroll' % self.elasticsearch_url, json={'num_freed': 1})
+            documents = list(client.scan_all(index=self.datashare_project, size=2, limit=1))
+            self.assertEqual(len(documents), 1)
+            self.assertEqual(resp.calls[1].request.method, 'DELETE')
+
+    def test_scan_clears_scroll_context_when_stopped(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                 create_project=False)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, re.compile(r'^%s/%s/_search' % (self.elasticsearch_url, self.datashare_project)),
+                     json={'_scroll_id': 'abc', 'hits': {'hits': [{'_id': 'doc1'}, {'_id': 'doc2'}]}})
+            resp.add(responses.DELETE, '%s/_search/scroll' % self.elasticsearch_url, status=404)
+            documents = client.scan_all(index=self.datashare_project, size=2)
+            next(documents)
+            documents.close()
+            self.assertEqual(resp.calls[1].request.method, 'DELETE')
+            self.assertEqual(len(client.open_contexts), 0)
+
+    def test_scan_can_stream_hits(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                 stream_hits=True, create_project=False)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, re.compile(r'^%s/%s/_search' % (self.elasticsearch_url, self.datashare_project)),
+                     json={'_scroll_id': 'abc', 'hits': {'hits': [{'_id': 'doc1'}, {'_id': 'doc2'}]}})
+            resp.add(responses.POST, '%s/_search/scroll' % self.elasticsearch_url,
+                     json={'_scroll_id': 'abc', 'hits': {'hits': [{'_id': 'doc3'}]}})
+            resp.add(responses.POST, '%s/_search/scroll' % self.elasticsearch_url, json={'_scroll_id': 'abc'})
+            resp.add(responses.DELETE, '%s/_search/scroll' % self.elasticsearch_url, json={'num_freed': 1})
+            documents = list(client.scan_all(index=self.datashare_project, size=2))
+            self.assertEqual([document['_id'] for document in documents], ['doc1', 'doc2', 'doc3'])
+
+    def test_scan_can_prefetch_pages(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                 prefetch=2, create_project=False)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, re.compile(r'^%s/%s/_search' % (self.elasticsearch_url, self.datashare_project)),
+                     json={'_scroll_id': 'abc', 'hits': {'hits': [{'_id': 'doc1'}, {'_id': 'doc2'}]}})
+            resp.add(responses.POST, '%s/_search/scroll' % self.elasticsearch_url,
+                     json={'_scroll_id': 'abc', 'hits': {'hits': [{'_id': 'doc3'}]}})
+            resp.add(responses.POST, '%s/_search/scroll' % self.elasticsearch_url, json={'_scroll_id': 'abc'})
+            resp.add(responses.DELETE, '%s/_search/scroll' % self.elasticsearch_url, json={'num_freed': 1})
+            documents = list(client.scan_all(index=self.datashare_project, size=2))
+            self.assertEqual([document['_id'] for document in documents], ['doc1', 'doc2', 'doc3'])
+
+    def add_version(self, resp, number='7.17.3'):
+        # Elasticsearch is asked for its version before opening a point in time
+        resp.add(responses.GET, re.compile(r'^%s/?$' % self.elasticsearch_url), json={'version': {'number': number}})
+
+    def test_query_all_uses_pit_for_large_result_sets(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                 create_project=False)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, '%s/%s/_count' % (self.elasticsearch_url, self.datashare_project),
+                     json={'count': 20000})
+            self.add_version(resp)
+            resp.add(responses.POST, re.compile(r'^%s/%s/_pit' % (self.elasticsearch_url, self.datashare_project)),
+                     json={'id': 'pit1'})
+            resp.add(responses.POST, re.compile(r'^%s/_search' % self.elasticsearch_url),
+                     json={'pit_id': 'pit2', 'hits': {'hits': [{'_id': 'doc', 'sort': [1, 4]}]}})
+            resp.add(responses.POST, re.compile(r'^%s/_search' % self.elasticsearch_url),
+                     json={'pit_id': 'pit2', 'hits': {'hits': []}})
+            resp.add(responses.DELETE, '%s/_pit' % self.elasticsearch_url, json={'succeeded': True})
+            documents = list(client.query_all(index=self.datashare_project, query={'query': {'match_all': {}}},
+                                              sort={'_score': 'desc'}, size=1))
+            self.assertEqual(len(documents), 1)
+            first_page = json.loads(resp.calls[3].request.body)
+            self.assertEqual(first_page['pit'], {'id': 'pit1', 'keep_alive': '5m'})
+            self.assertEqual(first_page['sort'], [{'_score': 'desc'}, {'_shard_doc': 'asc'}])
+            second_page = json.loads(resp.calls[4].request.body)
+            self.assertEqual(second_page['pit']['id'], 'pit2')
+            self.assertEqual(second_page['search_after'], [1, 4])
+            self.assertEqual(json.loads(resp.calls[5].request.body), {'id': 'pit2'})
+            self.assertEqual(len(client.open_contexts), 0)
+
+    def test_query_all_falls_back_to_search_after_without_pit(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                 create_project=False)
+        with responses.RequestsMock() as resp:
+            self.add_version(resp)
+            resp.add(responses.POST, re.compile(r'^%s/%s/_pit' % (self.elasticsearch_url, self.datashare_project)),
+                     status=400)
+            resp.add(responses.POST, re.compile(r'^%s/%s/_search' % (self.elasticsearch_url, self.datashare_project)),
+                     json={'hits': {'hits': []}})
+            documents = list(client.query_all(index=self.datashare_project, size=1, limit=20000))
+            self.assertEqual(len(documents), 0)
+            self.assertNotIn(b'"pit"', resp.calls[2].request.body)
+
+    def test_query_all_uses_pit_for_index_order(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project)
+        with responses.RequestsMock() as resp:
+            self.add_version(resp)
+            resp.add(responses.POST, re.compile(r'^%s/%s/_pit' % (self.elasticsearch_url, self.datashare_project)),
+                     json={'id': 'pit1'})
+            resp.add(responses.POST, re.compile(r'^%s/_search' % self.elasticsearch_url),
+                     json={'pit_id': 'pit1', 'hits': {'hits': []}})
+            resp.add(responses.DELETE, '%s/_pit' % self.elasticsearch_url, json={'succeeded': True})
+            list(client.query_all(index=self.datashare_project, query={'query': {'match_all': {}}},
+                                  sort={'_doc': 'asc'}, size=1, limit=5))
+            self.assertEqual(json.loads(resp.calls[2].request.body)['sort'], [{'_shard_doc': 'asc'}])
+
+    def test_query_all_through_datashare_does_not_use_pit(self):
+        client = DatashareClient(self.datashare_url, None, self.datashare_project)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, re.compile(r'^%s/api/index/search/%s/_search' % (self.datashare_url,
+                                                                                      self.datashare_project)),
+                     json={'hits': {'hits': []}})
+            documents = list(client.query_all(index=self.datashare_project, query={'query': {'match_all': {}}},
+                                              sort={'_doc': 'asc'}, size=1, limit=20000))
+            self.assertEqual(len(documents), 0)
+            self.assertEqual(len(resp.calls), 1)
+            self.assertNotIn('pit', json.loads(resp.calls[0].request.body))
+
+    def test_query_all_without_pit_scrolls_in_index_order(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, re.compile(r'^%s/%s/_search' % (self.elasticsearch_url, self.datashare_project)),
+                     json={'_scroll_id': 'abc', 'hits': {'hits': [{'_id': 'doc1'}, {'_id': 'doc2'}]}})
+            resp.add(responses.POST, '%s/_search/scroll' % self.elasticsearch_url,
+                     json={'_scroll_id': 'abc', 'hits': {'hits': [{'_id': 'doc3'}]}})
+            resp.add(responses.POST, '%s/_search/scroll' % self.elasticsearch_url, json={'_scroll_id': 'abc'})
+            resp.add(responses.DELETE, '%s/_search/scroll' % self.elasticsearch_url, json={'num_freed': 1})
+            documents = list(client.query_all(index=self.datashare_project, sort={'_doc': 'asc'}, size=2,
+                                              pagination='search-after', **{'from': 1}))
+            self.assertEqual([document['_id'] for document in documents], ['doc2', 'doc3'])
+            first_page = json.loads(resp.calls[0].request.body)
+            self.assertIn('scroll=', resp.calls[0].request.url)
+            # The index order is kept, nothing is sorted on the fielddata of _id
+            self.assertEqual(first_page['sort'], {'_doc': 'asc'})
+            self.assertNotIn('from', first_page)
+            self.assertEqual(len(client.open_contexts), 0)
+
+    def test_query_all_without_pit_pages_after_the_requested_sort(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, re.compile(r'^%s/%s/_search' % (self.elasticsearch_url, self.datashare_project)),
+                     json={'hits': {'hits': [{'_id': 'doc1', 'sort': [2.5]}]}})
+            resp.add(responses.POST, re.compile(r'^%s/%s/_search' % (self.elasticsearch_url, self.datashare_project)),
+                     json={'hits': {'hits': []}})
+            documents = list(client.query_all(index=self.datashare_project, sort={'_score': 'desc'}, size=1,
+                                              pagination='search-after'))
+            self.assertEqual(len(documents), 1)
+            second_page = json.loads(resp.calls[1].request.body)
+            self.assertEqual(second_page['sort'], {'_score': 'desc'})
+            self.assertEqual(second_page['search_after'], [2.5])
+
+    def test_scan_can_read_slices_concurrently(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                 create_project=False)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, re.compile(r'^%s/%s/_search' % (self.elasticsearch_url, self.datashare_project)),
+                     json={'_scroll_id': 'abc', 'hits': {'hits': [{'_id': 'doc1'}, {'_id': 'doc2'}]}})
+            resp.add(responses.POST, '%s/_search/scroll' % self.elasticsearch_url, json={'_scroll_id': 'abc'})
+            resp.add(responses.DELETE, '%s/_search/scroll' % self.elasticsearch_url, json={'num_freed': 1})
+            slices = []
+            documents = list(client.scan_all(index=self.datashare_project, size=2, slices=2,
+                                             on_slice_hit=slices.append))
+            self.assertEqual(len(documents), 4)
+            self.assertEqual(sorted(slices), [0, 0, 1, 1])
+            bodies = [json.loads(call.request.body) for call in resp.calls
+                      if '/%s/_search' % self.datashare_project in call.request.url]
+            self.assertEqual(sorted(body['slice']['id'] for body in bodies), [0, 1])
+
+    def test_scan_applies_limit_over_all_slices(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                 create_project=False)
+        with responses.RequestsMock(assert_all_requests_are_fired=False) as resp:
+            resp.add(responses.POST, re.compile(r'^%s/%s/_search' % (self.elasticsearch_url, self.datashare_project)),
+                     json={'_scroll_id': 'abc', 'hits': {'hits': [{'_id': 'doc1'}, {'_id': 'doc2'}]}})
+            resp.add(responses.POST, '%s/_search/scroll' % self.elasticsearch_url, json={'_scroll_id': 'abc'})
+            resp.add(responses.DELETE, '%s/_search/scroll' % self.elasticsearch_url, json={'num_freed': 1})
+            documents = list(client.scan_all(index=self.datashare_project, size=2, limit=3, slices=2))
+            self.assertEqual(len(documents), 3)
+            self.assertEqual(len(client.open_contexts), 0)
+
+    def test_project_is_not_created_by_default(self):
+        with responses.RequestsMock() as resp:
+            DatashareClient(self.datashare_url, self.elasticsearch_url, 'never-created')
+            self.assertEqual(len(resp.calls), 0)
+
+    def test_project_is_created_when_asked(self):
+        with responses.RequestsMock() as resp:
+            resp.add(responses.PUT, '%s/api/index/created-project' % self.datashare_url, json={})
+            DatashareClient(self.datashare_url, self.elasticsearch_url, 'created-project', create_project=True)
+            self.assertEqual(len(resp.calls), 1)
+
+    def test_query_all_does_not_count_known_matches(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, re.compile(r'^%s/%s/_search' % (self.elasticsearch_url, self.datashare_project)),
+                     json={'hits': {'hits': []}})
+            documents = list(client.scan_or_query_all(self.datashare_project, ['name'], '_score', None, None,
+                                                      {'query': {'match_all': {}}}, 0, 0, 10, matches=5))
+            self.assertEqual(len(documents), 0)
+            self.assertEqual(len(resp.calls), 1)
+            self.assertNotIn('_count', resp.calls[0].request.url)
+
+    def test_mappings_are_cached(self):
+        with TemporaryDirectory() as tmp, mock.patch.dict('os.environ', {'XDG_CACHE_HOME': tmp}), \
+                responses.RequestsMock() as resp:
+            resp.add(responses.GET, '%s/%s/_mappings' % (self.elasticsearch_url, self.datashare_project),
+                     json={'mappings': {}})
+            for _ in range(2):
+                client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                         create_project=False)
+                self.assertEqual(client.mappings(self.datashare_project), {'mappings': {}})
+            self.assertEqual(len(resp.calls), 1)
+
+    def test_documents_are_fetched_in_batches(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                 create_project=False)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, re.compile(r'^%s/%s/_mget' % (self.elasticsearch_url, self.datashare_project)),
+                     json={'docs': [{'_id': 'doc1', 'found': True, '_source': {}}, {'_id': 'doc2', 'found': False}]})
+            resp.add(responses.POST, re.compile(r'^%s/%s/_mget' % (self.elasticsearch_url, self.datashare_project)),
+                     json={'docs': [{'_id': 'doc3', '_routing': 'doc1', 'found': True, '_source': {}}]})
+            ids = [('doc1', None), ('doc2', 'doc2'), ('doc3', 'doc1')]
+            documents = list(client.documents(self.datashare_project, ids, source=['path'], batch_size=2))
+            self.assertEqual([document['_id'] for document in documents], ['doc1', 'doc3'])
+            self.assertEqual(len(resp.calls), 2)
+            self.assertEqual(json.loads(resp.calls[1].request.body),
+                             {'docs': [{'_id': 'doc3', 'routing': 'doc1', '_source': ['path']}]})
+
+    def test_bulk_index_sends_chunks_and_refreshes_once(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                 create_project=False)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, re.compile(r'^%s/_bulk' % self.elasticsearch_url),
+                     json={'errors': False, 'items': [{'index': {'_id': 'doc1', 'status': 201}}] * 2})
+            resp.add(responses.POST, re.compile(r'^%s/_bulk' % self.elasticsearch_url),
+                     json={'errors': True, 'items': [{'index': {'_id': 'doc3', 'status': 400,
+                                                                'error': {'reason': 'failed to parse'}}}]})
+            resp.add(responses.POST, re.compile(r'^%s/%s/_refresh' % (self.elasticsearch_url, self.datashare_project)))
+            documents = [{'_id': 'doc%s' % id, '_routing': 'doc1', 'content': 'foo'} for id in range(1, 4)]
+            errors = client.bulk_index(self.datashare_project, documents, chunk_size=2)
+            self.assertEqual(len(resp.calls), 3)
+            self.assertEqual([error['_id'] for error in errors], ['doc3'])
+            lines = resp.calls[0].request.body.splitlines()
+            self.assertEqual(json.loads(lines[0]), {'index': {'_index': self.datashare_project, '_id': 'doc1',
+                                                              'routing': 'doc1'}})
+            self.assertEqual(json.loads(lines[1])['contentLength'], 3)
+            self.assertNotIn('_id', json.loads(lines[1]))
+            self.assertEqual(resp.calls[0].request.headers['Content-Type'], 'application/x-ndjson')
+
+    def test_bulk_delete_splits_chunks_by_bytes(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                 create_project=False)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, re.compile(r'^%s/_bulk' % self.elasticsearch_url),
+                     json={'errors': False, 'items': []})
+            resp.add(responses.POST, re.compile(r'^%s/%s/_refresh' % (self.elasticsearch_url, self.datashare_project)))
+            ids = ['doc1', ('doc2', 'doc1'), 'doc3']
+            errors = client.bulk_delete(self.datashare_project, ids, chunk_bytes=100)
+            self.assertEqual(errors, [])
+            bodies = [call.request.body for call in resp.calls if '_bulk' in call.request.url]
+            self.assertEqual(len(bodies), 3)
+            self.assertEqual(json.loads(bodies[1]), {'delete': {'_index': self.datashare_project, '_id': 'doc2',
+                                                                'routing': 'doc1'}})
+
+    def test_temporary_project_can_copy_documents(self):
+        with self.existing_species_documents() as species:
+            with self.datashare_client.temporary_project(self.datashare_project, clone='reindex') as project:
+                self.assertEqual(self.datashare_client.count(project).get('count'), len(species))
+
+    def test_clone_polls_the_reindex_task(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                 create_project=False)
+        es_url = self.elasticsearch_url
+        with responses.RequestsMock() as resp:
+            resp.add(responses.GET, '%s/%s' % (es_url, self.datashare_project), json={self.datashare_project: {
+                'settings': {'index': {'uuid': 'abc', 'number_of_shards': '1', 'number_of_replicas': '1'}},
+                'mappings': {'properties': {'name': {'type': 'keyword'}}}}})
+            resp.add(responses.PUT, '%s/copy' % es_url)
+            resp.add(responses.POST, re.compile(r'^%s/_reindex' % es_url), json={'task': 'node:1'})
+            resp.add(responses.GET, '%s/_tasks/node:1' % es_url,
+                     json={'completed': False, 'task': {'status': {'total': 10, 'created': 4}}})
+            resp.add(responses.GET, '%s/_tasks/node:1' % es_url,
+                     json={'completed': True, 'task': {'status': {'total': 10, 'created': 10}}, 'response': {}})
+            resp.add(responses.PUT, '%s/copy/_settings' % es_url)
+            resp.add(responses.POST, '%s/copy/_refresh' % es_url)
+            progress = []
+            dest = client.clone(self.datashare_project, 'copy', slices=2, poll_interval=0,
+                                on_progress=lambda done, total: progress.append((done, total)))
+            self.assertEqual(dest, 'copy')
+            self.assertEqual(progress, [(4, 10), (10, 10)])
+            self.assertEqual(json.loads(resp.calls[1].request.body), {
+                'settings': {'index': {'number_of_shards': '1', 'number_of_replicas': 0, 'refresh_interval': '-1'}},
+                'mappings': {'properties': {'name': {'type': 'keyword'}}}})
+            self.assertIn('slices=2', resp.calls[2].request.url)
+            self.assertEqual(json.loads(resp.calls[5].request.body),
+                             {'index': {'number_of_replicas': '1', 'refresh_interval': None}})
+
+    def test_clone_api_makes_the_source_writable_again(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project,
+                                 create_project=False)
+        settings_url = '%s/%s/_settings' % (self.elasticsearch_url, self.datashare_project)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.GET, re.compile(r'^%s' % settings_url), json={})
+            resp.add(responses.PUT, settings_url)
+            resp.add(responses.POST, re.compile(r'^%s/%s/_clone/copy' % (self.elasticsearch_url,
+                                                                          self.datashare_project)), status=400)
+            resp.add(responses.PUT, settings_url)
+            resp.add(responses.DELETE, '%s/copy' % self.elasticsearch_url)
+            with self.assertRaises(requests.HTTPError):
+                client.clone(self.datashare_project, 'copy', method='clone')
+            self.assertEqual(json.loads(resp.calls[1].request.body), {'index.blocks.write': True})
+            self.assertEqual(json.loads(resp.calls[3].request.body), {'index.blocks.write': None})
+
+    def test_unknown_clone_method_is_refused(self):
+        client = DatashareClient(self.datashare_url, self.elasticsearch_url, self.datashare_project)
+        with responses.RequestsMock() as resp:
+            with self.assertRaises(ValueError):
+                client.clone(self.datashare_project, 'copy', method='snapshot')
+            self.assertEqual(len(resp.calls), 0)
+
+    def test_scan_sort_defaults_to_index_order(self):
+        self.assertEqual(scan_sort('_doc'), {'_doc': 'asc'})
+        self.assertEqual(scan_sort('_score'), {'_score': 'desc'})
+        self.assertEqual(scan_sort('path', 'asc'), {'path': 'asc'})
+
+    def test_pit_sort_reads_index_order_by_shard(self):
+        self.assertEqual(pit_sort({'_doc': 'asc'}), [{'_shard_doc': 'asc'}])
+        self.assertEqual(pit_sort({'path': 'desc'}), [{'path': 'desc'}, {'_shard_doc': 'asc'}])
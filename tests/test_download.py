@@ -1,12 +1,20 @@
+import asyncio
 import glob
 import json
+import re
 from os.path import join
 from tempfile import TemporaryDirectory
 
+import requests
+import responses
 from click.testing import CliRunner
+from rich.progress import Progress
+from unittest import mock
 
 from .test_abstract import TestAbstract
 from tarentula.cli import cli
+from tarentula.download import Download
+from tarentula.metrics import metrics
 
 
 def load_json_file(path):
@@ -50,6 +58,15 @@ class TestDownload(TestAbstract):
             json_file = load_json_file(join(tmp, 'l7/Vn/l7VnZZEzg2fr960NWWEG.json'))
             self.assertEqual(json_file['_id'], 'l7VnZZEzg2fr960NWWEG')
 
+    def test_meta_is_downloaded_for_actinopodidae_in_async_mode(self):
+        with self.existing_species_documents(), TemporaryDirectory() as tmp:
+            runner = CliRunner()
+            runner.invoke(cli, ['download', '--datashare-url', self.datashare_url, '--elasticsearch-url', self.elasticsearch_url, '--datashare-project',
+                                self.datashare_project, '--no-raw-file', '--destination-directory', tmp, '--query', 'name:Actinopodidae',
+                                '--async', '--concurrency', 4])
+            json_file = load_json_file(join(tmp, 'l7/Vn/l7VnZZEzg2fr960NWWEG.json'))
+            self.assertEqual(json_file['_id'], 'l7VnZZEzg2fr960NWWEG')
+
     def test_meta_is_downloaded_for_ctenizidae(self):
         with self.existing_species_documents(), TemporaryDirectory() as tmp:
             runner = CliRunner()
@@ -85,6 +102,70 @@ class TestDownload(TestAbstract):
             self.assertIn('Downloading 15 document(s)', result.output)
             self.assertEqual(15, len(get_document_files(tmp)))
 
+    def test_meta_is_downloaded_with_its_path_without_raw_file(self):
+        with self.existing_species_documents(), TemporaryDirectory() as tmp:
+            runner = CliRunner()
+            runner.invoke(cli, ['download', '--datashare-url', self.datashare_url, '--elasticsearch-url', self.elasticsearch_url, '--datashare-project',
+                                self.datashare_project, '--no-raw-file', '--destination-directory', tmp, '--query', 'name:Actinopodidae'])
+            json_file = load_json_file(join(tmp, 'l7/Vn/l7VnZZEzg2fr960NWWEG.json'))
+            self.assertEqual(json_file['_source']['path'], '/path/to/file.txt')
+            self.assertEqual(json_file['_source']['type'], 'Document')
+
+    def test_source_includes_fields_of_meta_files_without_raw_file(self):
+        download = Download(self.datashare_url, self.datashare_project, raw_file=False)
+        self.assertEqual(download.source_fields, ['path', 'parentDocument', 'type'])
+
+    def test_source_includes_fields_asked_once(self):
+        download = Download(self.datashare_url, self.datashare_project, path_format='{id}/{basename}',
+                            source='name, path')
+        self.assertEqual(download.source_fields, ['path', 'parentDocument', 'type', 'name'])
+
+    def test_query_is_in_filter_context_by_default(self):
+        download = Download(self.datashare_url, self.datashare_project, query='name:*')
+        self.assertEqual(download.query_body['query']['bool']['filter'][1], {'query_string': {'query': 'name:*'}})
+        self.assertNotIn('must', download.query_body['query']['bool'])
+
+    def test_query_is_scored_when_sorted_by_relevance(self):
+        download = Download(self.datashare_url, self.datashare_project, query='name:*', sort_by='_score')
+        self.assertEqual(len(download.query_body['query']['bool']['must']), 2)
+
+    def test_ids_file_rows_are_read_with_their_routing(self):
+        with TemporaryDirectory() as tmp:
+            ids_file = join(tmp, 'ids.csv')
+            with open(ids_file, 'w') as csv_file:
+                csv_file.write('documentId,rootId\ndoc1,\ndoc2,doc1\ndoc3,doc3\n')
+            download = Download(self.datashare_url, self.datashare_project, ids_file=ids_file, from_=1, limit=1)
+            self.assertEqual(list(download.ids_file_rows()), [('doc2', 'doc1')])
+            self.assertEqual(download.count_matches(), 1)
+
+
+    def test_ids_file_is_downloaded_with_default_options(self):
+        with TemporaryDirectory() as tmp:
+            ids_file = join(tmp, 'ids.csv')
+            with open(ids_file, 'w') as csv_file:
+                csv_file.write('documentId,rootId\nl7VnZZEzg2fr960NWWEG,\n')
+            download = Download(self.datashare_url, self.datashare_project, destination_directory=tmp,
+                                elasticsearch_url=self.elasticsearch_url, ids_file=ids_file, raw_file=False,
+                                progressbar=False)
+            with responses.RequestsMock() as resp:
+                resp.add(responses.POST, re.compile(r'^%s/%s/_mget' % (self.elasticsearch_url, self.datashare_project)),
+                         json={'docs': [{'_id': 'l7VnZZEzg2fr960NWWEG', 'found': True, '_source': {'type': 'Document'}}]})
+                download.start()
+                self.assertEqual(len(json.loads(resp.calls[0].request.body)['docs']), 1)
+            json_file = load_json_file(join(tmp, 'l7/Vn/l7VnZZEzg2fr960NWWEG.json'))
+            self.assertEqual(json_file['_source']['type'], 'Document')
+    def test_failed_document_doesnt_stop_the_async_download(self):
+        with TemporaryDirectory() as tmp:
+            download = Download(self.datashare_url, self.datashare_project, destination_directory=tmp,
+                                async_mode=True, progressbar=False)
+            client = mock.Mock(download=mock.AsyncMock(side_effect=requests.exceptions.Timeout()))
+            document = {'_id': 'l7VnZZEzg2fr960NWWEG', '_source': {'type': 'Document'}}
+            metrics.reset('download')
+            with Progress(disable=True) as progress:
+                task = progress.add_task('Downloading', total=1)
+                asyncio.run(download.process_document_async(client, document, progress, task))
+            self.assertEqual(metrics.snapshot()['counters']['errors'], 1)
+            self.assertEqual(metrics.snapshot()['counters']['documents'], 1)
 
 def get_document_files(folder: str, pattern: str = '*/*/*.json'):
     return glob.glob(join(folder, pattern))
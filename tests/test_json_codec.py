@@ -0,0 +1,25 @@
+from tarentula.json_codec import JsonCodec, create_codec
+from .test_abstract import TestAbstract
+
+
+class TestJsonCodec(TestAbstract):
+
+    def test_standard_codec_can_be_forced(self):
+        self.assertIsInstance(create_codec('json'), JsonCodec)
+        self.assertEqual(create_codec('json').name, 'json')
+
+    def test_unknown_codec_is_refused(self):
+        with self.assertRaises(ValueError):
+            create_codec('yaml')
+
+    def test_documents_are_encoded_as_compact_utf8(self):
+        for codec in (JsonCodec(), create_codec()):
+            self.assertEqual(codec.dumps({'name': 'Araignée'}), '{"name":"Araignée"}'.encode('utf-8'))
+
+    def test_bytes_are_decoded(self):
+        for codec in (JsonCodec(), create_codec()):
+            self.assertEqual(codec.loads('{"name":"Araignée"}'.encode('utf-8')), {'name': 'Araignée'})
+
+    def test_big_integers_are_supported(self):
+        for codec in (JsonCodec(), create_codec()):
+            self.assertEqual(codec.loads(codec.dumps({'count': 2 ** 70})), {'count': 2 ** 70})
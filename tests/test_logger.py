@@ -0,0 +1,86 @@
+import logging
+
+from unittest import mock
+
+from tarentula.logger import RateLimitFilter, logger, start_log_queue
+from .test_abstract import TestAbstract
+
+
+def record(message, *args, level=logging.INFO):
+    return logging.LogRecord('tarentula', level, __file__, 1, message, args, None)
+
+
+class CapturingHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = []
+
+    def emit(self, record):
+        self.records.append(record)
+
+
+class TestLogger(TestAbstract):
+
+    def test_rate_limit_drops_repeated_messages(self):
+        rate_limit = RateLimitFilter(rate=2)
+        with mock.patch('tarentula.logger.monotonic', return_value=100):
+            passed = [rate_limit.filter(record('Processed document %s', n)) for n in range(5)]
+        self.assertEqual(passed, [True, True, False, False, False])
+
+    def test_rate_limit_is_applied_by_message(self):
+        rate_limit = RateLimitFilter(rate=1)
+        with mock.patch('tarentula.logger.monotonic', return_value=100):
+            self.assertTrue(rate_limit.filter(record('Processed document %s')))
+            self.assertTrue(rate_limit.filter(record('Saved document %s')))
+            self.assertFalse(rate_limit.filter(record('Processed document %s')))
+
+    def test_rate_limit_keeps_warnings(self):
+        rate_limit = RateLimitFilter(rate=1)
+        with mock.patch('tarentula.logger.monotonic', return_value=100):
+            passed = [rate_limit.filter(record('Unable to download %s', level=logging.WARNING)) for _ in range(5)]
+        self.assertTrue(all(passed))
+
+    def test_rate_limit_counts_dropped_messages(self):
+        rate_limit = RateLimitFilter(rate=1)
+        with mock.patch('tarentula.logger.monotonic', return_value=100):
+            for _ in range(4):
+                rate_limit.filter(record('Processed document %s'))
+        next_record = record('Processed document %s')
+        with mock.patch('tarentula.logger.monotonic', return_value=101):
+            self.assertTrue(rate_limit.filter(next_record))
+        self.assertEqual(next_record.msg, 'Processed document %s (3 similar message(s) dropped)')
+
+    def test_rate_limit_can_be_disabled(self):
+        rate_limit = RateLimitFilter(rate=0)
+        self.assertTrue(all(rate_limit.filter(record('Processed document %s')) for _ in range(100)))
+
+    def test_rate_limit_is_disabled_by_default(self):
+        rate_limit = RateLimitFilter()
+        self.assertTrue(all(rate_limit.filter(record('Processed document %s')) for _ in range(100)))
+
+    def test_log_queue_hands_records_to_the_handlers(self):
+        handler = CapturingHandler()
+        handlers = logger.handlers
+        logger.handlers = [handler]
+        try:
+            stop_log_queue = start_log_queue()
+            self.assertNotIn(handler, logger.handlers)
+            logger.info('Processed document %s', 'foo')
+            stop_log_queue()
+            self.assertEqual(logger.handlers, [handler])
+        finally:
+            logger.handlers = handlers
+        self.assertEqual([r.getMessage() for r in handler.records], ['Processed document foo'])
+
+    def test_log_queue_doesnt_format_records(self):
+        handler = CapturingHandler()
+        handlers = logger.handlers
+        logger.handlers = [handler]
+        try:
+            stop_log_queue = start_log_queue()
+            logger.info('Processed document %s', 'foo')
+            stop_log_queue()
+        finally:
+            logger.handlers = handlers
+        self.assertEqual(handler.records[0].msg, 'Processed document %s')
+        self.assertEqual(handler.records[0].args, ('foo',))
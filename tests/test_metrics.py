@@ -0,0 +1,93 @@
+import json
+import requests
+import responses
+
+from os.path import join
+from tempfile import TemporaryDirectory
+from time import sleep
+
+from tarentula.metrics import Metrics, ProgressLogger, Samples, percentile
+from tarentula.transport import create_transport
+from .test_abstract import TestAbstract
+
+
+def response(url, status_code=200, content_length=10):
+    result = requests.Response()
+    result.url = url
+    result.status_code = status_code
+    result.headers['Content-Length'] = str(content_length)
+    return result
+
+
+class TestMetrics(TestAbstract):
+
+    def test_percentiles_are_read_from_sorted_values(self):
+        values = list(range(100, 0, -1))
+        self.assertEqual(percentile(values, 50), 51)
+        self.assertEqual(percentile(values, 99), 100)
+        self.assertIsNone(percentile([], 50))
+
+    def test_samples_are_bounded(self):
+        samples = Samples(max_samples=10)
+        for value in range(1000):
+            samples.add(value)
+        self.assertEqual(len(samples.values), 10)
+        self.assertEqual(samples.count, 1000)
+        self.assertEqual(samples.sum, sum(range(1000)))
+
+    def test_requests_are_counted_by_endpoint(self):
+        metrics = Metrics()
+        metrics.reset('download')
+        metrics(0.1, response('http://localhost:9200/project/_search'))
+        metrics(0.3, response('http://localhost:9200/project/_search', 503))
+        metrics(0.2, error=requests.ConnectionError())
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['counters']['requests'], 3)
+        self.assertEqual(snapshot['counters']['request_errors'], 2)
+        self.assertEqual(snapshot['counters']['bytes'], 20)
+        self.assertEqual(snapshot['latencies']['/*/_search']['count'], 2)
+
+    def test_bytes_of_bodies_without_length_are_counted(self):
+        metrics = Metrics()
+        transport = create_transport()
+        transport.listeners.append(metrics)
+        with responses.RequestsMock() as resp:
+            # Chunked or compressed responses have no Content-Length
+            resp.add(responses.POST, '%s/project/_search' % self.elasticsearch_url,
+                     body=b'{"hits":{"hits":[]}}', auto_calculate_content_length=False)
+            resp.add(responses.GET, '%s/api/project/documents/src/abc' % self.datashare_url, body=b'content',
+                     auto_calculate_content_length=False)
+            transport.post('%s/project/_search' % self.elasticsearch_url, json={})
+            self.assertEqual(metrics.snapshot()['counters']['bytes'], 20)
+            with transport.get('%s/api/project/documents/src/abc' % self.datashare_url, stream=True) as raw:
+                self.assertEqual(raw.raw.read(), b'content')
+        self.assertEqual(metrics.snapshot()['counters']['bytes'], 27)
+
+    def test_metrics_are_written_in_the_prometheus_format(self):
+        metrics = Metrics()
+        metrics.reset('tagging')
+        metrics.increment('documents', 3)
+        metrics(0.1, response('http://localhost:8080/api/project/documents/tags/abc'))
+        text = metrics.prometheus()
+        self.assertIn('tarentula_documents_total{command="tagging"} 3', text)
+        self.assertIn('tarentula_request_duration_seconds_count{command="tagging",'
+                      'endpoint="/api/*/documents/tags/*"} 1', text)
+
+    def test_metrics_are_written_as_json(self):
+        metrics = Metrics()
+        metrics.increment('errors')
+        with TemporaryDirectory() as directory:
+            metrics.write(join(directory, 'metrics.json'))
+            with open(join(directory, 'metrics.json')) as metrics_file:
+                self.assertEqual(json.load(metrics_file)['counters']['errors'], 1)
+
+    def test_progress_is_logged_periodically(self):
+        metrics = Metrics()
+        metrics.reset('download')
+        metrics.increment('documents', 42)
+        progress = ProgressLogger(metrics, interval=0.01)
+        with self.assertLogs('tarentula', level='INFO') as logs:
+            progress.start()
+            sleep(0.1)
+            progress.stop()
+        self.assertIn('Progress of download: 42 document(s)', logs.output[0])
@@ -0,0 +1,61 @@
+import threading
+from time import sleep
+
+from tarentula.prefetch import merged, prefetched
+from .test_abstract import TestAbstract
+
+
+class TestPrefetch(TestAbstract):
+
+    def test_items_are_yielded_in_order(self):
+        self.assertEqual(list(prefetched(range(10), depth=2)), list(range(10)))
+
+    def test_items_are_yielded_without_thread_when_disabled(self):
+        threads = threading.active_count()
+        items = prefetched(iter(range(3)), depth=0)
+        self.assertEqual(next(items), 0)
+        self.assertEqual(threading.active_count(), threads)
+
+    def test_producer_waits_for_the_consumer(self):
+        produced = []
+
+        def pages():
+            for page in range(10):
+                produced.append(page)
+                yield page
+
+        items = prefetched(pages(), depth=2)
+        self.assertEqual(next(items), 0)
+        sleep(0.5)
+        # One item consumed, two waiting in the queue and one waiting to be queued
+        self.assertLessEqual(len(produced), 4)
+        items.close()
+
+    def test_errors_are_raised_to_the_consumer(self):
+        def pages():
+            yield 1
+            raise ValueError('Search failed')
+
+        items = prefetched(pages(), depth=1)
+        self.assertEqual(next(items), 1)
+        with self.assertRaises(ValueError):
+            next(items)
+
+    def test_source_is_closed_when_the_consumer_stops(self):
+        closed = threading.Event()
+
+        def pages():
+            try:
+                while True:
+                    yield 1
+            finally:
+                closed.set()
+
+        items = prefetched(pages(), depth=1)
+        next(items)
+        items.close()
+        self.assertTrue(closed.is_set())
+
+    def test_merged_items_come_with_the_index_of_their_source(self):
+        items = sorted(merged([iter('ab'), iter('c')], depth=1))
+        self.assertEqual(items, [(0, 'a'), (0, 'b'), (1, 'c')])
@@ -0,0 +1,43 @@
+import io
+import pstats
+
+from os.path import join
+from tempfile import TemporaryDirectory
+from time import sleep
+
+from tarentula.profiling import Profile, SamplingProfiler
+from .test_abstract import TestAbstract
+
+
+def busy(duration):
+    sleep(duration)
+
+
+class TestProfiling(TestAbstract):
+
+    def test_cpu_profile_is_written_as_pstats(self):
+        with TemporaryDirectory() as directory:
+            profile = Profile(join(directory, 'out.pstats'))
+            profile.start()
+            sorted(range(10000), key=lambda value: -value)
+            stream = io.StringIO()
+            profile.stop(stream)
+            self.assertIn('Ordered by: cumulative time', stream.getvalue())
+            self.assertGreater(pstats.Stats(join(directory, 'out.pstats')).total_calls, 0)
+
+    def test_sampling_profile_sees_waiting_functions(self):
+        with TemporaryDirectory() as directory:
+            profile = Profile(join(directory, 'out.stacks'), mode='sampling', interval_ms=1)
+            profile.start()
+            busy(0.1)
+            stream = io.StringIO()
+            profile.stop(stream)
+            self.assertIn('busy (', stream.getvalue())
+            with open(join(directory, 'out.stacks')) as stacks_file:
+                self.assertIn(';busy (', stacks_file.read())
+
+    def test_sampling_profile_without_samples(self):
+        profiler = SamplingProfiler()
+        stream = io.StringIO()
+        profiler.print_stats(stream)
+        self.assertEqual(stream.getvalue(), '0 samples, every 5ms\n')
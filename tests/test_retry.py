@@ -0,0 +1,127 @@
+from concurrent.futures import ThreadPoolExecutor
+from threading import Thread
+from time import sleep
+
+import responses
+from requests.exceptions import ConnectionError
+
+from tarentula.retry import RetryPolicy, CircuitBreaker, retry_after
+from tarentula.transport import create_transport
+from .test_abstract import TestAbstract
+
+
+class TestRetry(TestAbstract):
+
+    def transport(self, max_retries=3, threshold=0):
+        retry_policy = RetryPolicy(max_retries, backoff_factor=0, circuit_breaker=CircuitBreaker(threshold, 0))
+        return create_transport(retry_policy=retry_policy)
+
+    def test_unavailable_server_is_retried(self):
+        url = '%s/_search' % self.elasticsearch_url
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, url, status=503)
+            resp.add(responses.POST, url, status=503)
+            resp.add(responses.POST, url, json={'hits': {'hits': []}})
+            response = self.transport().post(url, json={}, idempotent=True)
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(len(resp.calls), 3)
+
+    def test_retries_are_counted(self):
+        url = '%s/_count' % self.elasticsearch_url
+        transport = self.transport()
+        with responses.RequestsMock() as resp:
+            resp.add(responses.GET, url, status=502)
+            resp.add(responses.GET, url, json={'count': 0})
+            transport.get(url)
+            self.assertEqual(transport.retry_policy.retries, 1)
+
+    def test_last_response_is_returned_once_retries_are_exhausted(self):
+        url = '%s/_search' % self.elasticsearch_url
+        with responses.RequestsMock() as resp:
+            resp.add(responses.GET, url, status=503)
+            response = self.transport(max_retries=2).get(url)
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(len(resp.calls), 3)
+
+    def test_connection_error_is_raised_once_retries_are_exhausted(self):
+        url = '%s/_search' % self.elasticsearch_url
+        with responses.RequestsMock() as resp:
+            resp.add(responses.GET, url, body=ConnectionError('Connection aborted.'))
+            with self.assertRaises(ConnectionError):
+                self.transport(max_retries=1).get(url)
+            self.assertEqual(len(resp.calls), 2)
+
+    def test_client_error_is_not_retried(self):
+        url = '%s/_doc/missing' % self.elasticsearch_url
+        with responses.RequestsMock() as resp:
+            resp.add(responses.GET, url, status=404)
+            self.transport().get(url)
+            self.assertEqual(len(resp.calls), 1)
+
+    def test_non_idempotent_request_is_only_retried_when_rejected(self):
+        url = '%s/_doc' % self.elasticsearch_url
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, url, status=503)
+            self.transport().post(url, json={})
+            self.assertEqual(len(resp.calls), 1)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, url, status=429)
+            resp.add(responses.POST, url, status=201, json={})
+            self.transport().post(url, json={})
+            self.assertEqual(len(resp.calls), 2)
+
+    def test_retry_after_header_is_parsed(self):
+        with responses.RequestsMock() as resp:
+            resp.add(responses.GET, self.elasticsearch_url, status=429, headers={'Retry-After': '2'})
+            response = self.transport(max_retries=0).get(self.elasticsearch_url)
+            self.assertEqual(retry_after(response), 2)
+
+    def test_retry_after_delays_the_next_attempt(self):
+        retry_policy = RetryPolicy(backoff_factor=0)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.GET, self.elasticsearch_url, status=429, headers={'Retry-After': '5'})
+            response = self.transport(max_retries=0).get(self.elasticsearch_url)
+            self.assertEqual(retry_policy.delay(0, response), 5)
+
+    def test_backoff_is_capped(self):
+        retry_policy = RetryPolicy(backoff_factor=1, max_backoff=4)
+        self.assertTrue(all(0 <= retry_policy.backoff(attempt) <= 4 for attempt in range(10)))
+
+    def test_circuit_breaker_opens_after_consecutive_failures(self):
+        circuit_breaker = CircuitBreaker(threshold=2, timeout=30)
+        circuit_breaker.record_failure()
+        self.assertFalse(circuit_breaker.is_open)
+        circuit_breaker.record_failure()
+        self.assertTrue(circuit_breaker.is_open)
+        self.assertGreater(circuit_breaker.remaining, 0)
+
+    def test_circuit_breaker_closes_after_a_success(self):
+        circuit_breaker = CircuitBreaker(threshold=1, timeout=30)
+        circuit_breaker.record_failure()
+        circuit_breaker.record_success()
+        self.assertFalse(circuit_breaker.is_open)
+        self.assertEqual(circuit_breaker.remaining, 0)
+
+    def test_circuit_breaker_counts_concurrent_failures(self):
+        circuit_breaker = CircuitBreaker(threshold=0)
+        threads = [Thread(target=lambda: [circuit_breaker.record_failure() for _ in range(1000)]) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(circuit_breaker.failures, 8000)
+
+    def test_circuit_breaker_half_opens_for_a_single_request(self):
+        circuit_breaker = CircuitBreaker(threshold=1, timeout=0.05)
+        circuit_breaker.record_failure()
+        self.assertGreater(circuit_breaker.wait_time(), 0)
+        sleep(0.05)
+        with ThreadPoolExecutor(4) as executor:
+            waits = list(executor.map(lambda _: circuit_breaker.wait_time(), range(4)))
+        self.assertEqual(waits.count(0), 1)
+
+    def test_circuit_breaker_can_be_disabled(self):
+        circuit_breaker = CircuitBreaker(threshold=0)
+        for _ in range(10):
+            circuit_breaker.record_failure()
+        self.assertFalse(circuit_breaker.is_open)
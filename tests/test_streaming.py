@@ -0,0 +1,85 @@
+import json
+
+from tarentula.streaming import StreamedResponse
+from .test_abstract import TestAbstract
+
+
+class ChunkedResponse:
+    def __init__(self, body, size):
+        self.body = body
+        self.size = size
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for start in range(0, len(self.body), self.size):
+            yield self.body[start:start + self.size]
+
+    def close(self):
+        self.closed = True
+
+
+class TestStreaming(TestAbstract):
+
+    def page(self, hits):
+        return {'_scroll_id': 'c2Nhbj', 'took': 2, 'hits': {'total': {'value': len(hits)}, 'hits': hits}}
+
+    def hits(self):
+        return [{'_id': f'doc{n}', '_source': {'name': 'Atypidae "purse-web" \\ {spiders} [é]', 'legs': 8.0 + n,
+                                               'venomous': n % 2 == 0, 'tags': [], 'parent': None}}
+                for n in range(10)]
+
+    def test_hits_are_decoded_whatever_the_chunk_size(self):
+        body = json.dumps(self.page(self.hits())).encode('utf-8')
+        for size in (1, 2, 7, 1024):
+            response = StreamedResponse(ChunkedResponse(body, size))
+            self.assertEqual(list(response.hits()), self.hits())
+
+    def test_indented_body_is_decoded(self):
+        body = json.dumps(self.page(self.hits()), indent=2).encode('utf-8')
+        response = StreamedResponse(ChunkedResponse(body, 3))
+        self.assertEqual(list(response.hits()), self.hits())
+
+    def test_other_fields_are_collected(self):
+        body = json.dumps(self.page(self.hits())).encode('utf-8')
+        response = StreamedResponse(ChunkedResponse(body, 5))
+        self.assertIn('_scroll_id', response)
+        self.assertEqual(response['_scroll_id'], 'c2Nhbj')
+        self.assertEqual(response.get('took'), 2)
+        self.assertEqual(response.fields['hits']['total']['value'], 10)
+
+    def test_empty_filtered_response_has_no_hits(self):
+        response = StreamedResponse(ChunkedResponse(b'{}', 1))
+        self.assertEqual(list(response.hits()), [])
+        self.assertNotIn('_scroll_id', response)
+
+    def test_response_is_closed_once_hits_are_read(self):
+        raw = ChunkedResponse(json.dumps(self.page(self.hits())).encode('utf-8'), 16)
+        hits = StreamedResponse(raw).hits()
+        next(hits)
+        self.assertFalse(raw.closed)
+        hits.close()
+        self.assertTrue(raw.closed)
+
+    def test_truncated_body_is_an_error(self):
+        body = json.dumps(self.page(self.hits())).encode('utf-8')
+        response = StreamedResponse(ChunkedResponse(body[:-40], 16))
+        with self.assertRaises(ValueError):
+            list(response.hits())
+
+    def test_strings_ending_with_backslashes_are_decoded(self):
+        hits = [{'_id': 'doc', '_source': {'path': 'C:\\Atypidae\\', 'quote': '\\"', 'empty': ''}}]
+        body = json.dumps(self.page(hits)).encode('utf-8')
+        for size in (1, 2, 3, 1024):
+            response = StreamedResponse(ChunkedResponse(body, size))
+            self.assertEqual(list(response.hits()), hits)
+
+    def test_large_sources_are_decoded(self):
+        content = 'Atypidae "purse-web" spiders\\n\n' * 100000
+        hits = [{'_id': f'doc{n}', '_source': {'content': content, 'legs': 8}} for n in range(4)]
+        body = json.dumps(self.page(hits)).encode('utf-8')
+        response = StreamedResponse(ChunkedResponse(body, 64 * 1024))
+        for hit in response.hits():
+            self.assertEqual(hit, hits[response.num_hits - 1])
+            # Hits already read are dropped from the buffer
+            self.assertLess(len(response.stream.buffer), 3 * len(body) / len(hits))
+        self.assertEqual(response.num_hits, 4)
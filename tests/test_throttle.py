@@ -0,0 +1,49 @@
+from tarentula.throttle import AdaptiveThrottle
+from .test_abstract import TestAbstract
+
+
+class TestThrottle(TestAbstract):
+
+    def test_throttle_is_fixed_without_target_latency(self):
+        throttle = AdaptiveThrottle(throttle=200, max_concurrency=4)
+        for _ in range(10):
+            throttle.record(5, 429)
+        self.assertEqual(throttle.delay, 0.2)
+        self.assertEqual(throttle.concurrency, 4)
+
+    def test_delay_decreases_when_requests_are_fast(self):
+        throttle = AdaptiveThrottle(throttle=100, target_latency=500)
+        for _ in range(100):
+            throttle.record(0.01)
+        self.assertEqual(throttle.delay, 0)
+
+    def test_concurrency_increases_when_requests_are_fast(self):
+        throttle = AdaptiveThrottle(target_latency=500, max_concurrency=4)
+        self.assertEqual(throttle.concurrency, 1)
+        for _ in range(100):
+            throttle.record(0.01)
+        self.assertEqual(throttle.concurrency, 4)
+
+    def test_concurrency_is_halved_when_requests_are_slow(self):
+        throttle = AdaptiveThrottle(target_latency=500, max_concurrency=8)
+        throttle.concurrency = 8
+        for _ in range(8):
+            throttle.record(2)
+        self.assertEqual(throttle.concurrency, 4)
+
+    def test_delay_doubles_when_requests_are_rejected(self):
+        throttle = AdaptiveThrottle(throttle=100, target_latency=500)
+        throttle.record(0.01, 429)
+        self.assertEqual(throttle.delay, 0.2)
+
+    def test_delay_is_capped_when_requests_are_rejected(self):
+        throttle = AdaptiveThrottle(throttle=100, target_latency=500, max_delay=1)
+        for _ in range(10):
+            throttle.record(0.01, 503)
+        self.assertEqual(throttle.delay, 1)
+
+    def test_delay_never_exceeds_target_latency_when_requests_are_slow(self):
+        throttle = AdaptiveThrottle(target_latency=50)
+        for _ in range(100):
+            throttle.record(2)
+        self.assertAlmostEqual(throttle.delay, 0.05)
@@ -0,0 +1,75 @@
+import json
+import responses
+from urllib.parse import parse_qs, urlsplit
+
+from os.path import join
+from tempfile import TemporaryDirectory
+
+from tarentula.datashare_client import DatashareClient
+from tarentula.trace import endpoint_template, RequestTrace
+from tarentula.transport import create_transport
+from .test_abstract import TestAbstract
+
+
+class TestTrace(TestAbstract):
+
+    def test_endpoint_template_hides_projects_and_ids(self):
+        self.assertEqual(endpoint_template('http://localhost:9200/my-project/_doc/abc?refresh'), '/*/_doc/*')
+        self.assertEqual(endpoint_template('http://localhost:8080/api/my-project/documents/src/abc'),
+                         '/api/*/documents/src/*')
+        self.assertEqual(endpoint_template('http://localhost:9200/_search/scroll'), '/_search/scroll')
+
+    def test_requests_are_written_in_the_trace_file(self):
+        with TemporaryDirectory() as directory:
+            trace = RequestTrace(join(directory, 'trace.jsonl'))
+            transport = create_transport(trace=trace)
+            with responses.RequestsMock() as resp:
+                resp.add(responses.POST, '%s/project/_search' % self.elasticsearch_url,
+                         body='{"took":12,"hits":{"hits":[]}}')
+                transport.post('%s/project/_search' % self.elasticsearch_url, json={})
+            trace.close()
+            with open(join(directory, 'trace.jsonl')) as trace_file:
+                entries = [json.loads(line) for line in trace_file]
+            self.assertEqual(len(entries), 1)
+            self.assertEqual(entries[0]['endpoint'], '/*/_search')
+            self.assertEqual(entries[0]['status'], 200)
+            self.assertEqual(entries[0]['took'], 12)
+            self.assertEqual(entries[0]['bytes'], 30)
+
+    def test_took_of_filtered_searches_is_written_in_the_trace_file(self):
+        def search(request):
+            # Elasticsearch only returns the fields listed in `filter_path`
+            filter_path = parse_qs(urlsplit(request.url).query)['filter_path'][0].split(',')
+            body = {'took': 7, 'hits': {'hits': []}}
+            return 200, {}, json.dumps({key: value for key, value in body.items() if key in filter_path})
+
+        with TemporaryDirectory() as directory:
+            client = DatashareClient(self.datashare_url, self.elasticsearch_url, 'project',
+                                     trace_file=join(directory, 'trace.jsonl'))
+            with responses.RequestsMock() as resp:
+                resp.add_callback(responses.POST, '%s/project/_search' % self.elasticsearch_url, callback=search)
+                list(client.query_all(index='project', size=1, limit=1, pagination='search-after'))
+            client.trace.close()
+            with open(join(directory, 'trace.jsonl')) as trace_file:
+                self.assertEqual(json.loads(trace_file.readline())['took'], 7)
+
+    def test_streamed_requests_are_written_once_closed(self):
+        with TemporaryDirectory() as directory:
+            trace = RequestTrace(join(directory, 'trace.jsonl'))
+            transport = create_transport(trace=trace)
+            with responses.RequestsMock() as resp:
+                resp.add(responses.GET, '%s/api/project/documents/src/abc' % self.datashare_url, body=b'content')
+                response = transport.get('%s/api/project/documents/src/abc' % self.datashare_url, stream=True)
+                self.assertEqual(trace.file.tell(), 0)
+                response.close()
+            trace.close()
+            with open(join(directory, 'trace.jsonl')) as trace_file:
+                self.assertEqual(json.loads(trace_file.readline())['endpoint'], '/api/*/documents/src/*')
+
+    def test_slow_requests_are_logged(self):
+        transport = create_transport(trace=RequestTrace(slow_request_ms=0.001))
+        with responses.RequestsMock() as resp:
+            resp.add(responses.GET, '%s/project/_count' % self.elasticsearch_url, json={'count': 0})
+            with self.assertLogs('tarentula', level='WARNING') as logs:
+                transport.get('%s/project/_count' % self.elasticsearch_url)
+            self.assertIn('Slow request: GET /*/_count', logs.output[0])
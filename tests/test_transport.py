@@ -0,0 +1,105 @@
+import gzip
+import json
+import httpx
+import requests
+import responses
+
+from tarentula.retry import RetryPolicy
+from tarentula.transport import create_transport, Http2Transport, RequestsTransport
+from .test_abstract import TestAbstract
+
+
+class TestTransport(TestAbstract):
+
+    def test_default_backend_is_requests(self):
+        self.assertIsInstance(create_transport(), RequestsTransport)
+
+    def test_unknown_backend_is_refused(self):
+        with self.assertRaises(ValueError):
+            create_transport('carrier-pigeon')
+
+    def test_params_without_value_are_dropped(self):
+        transport = create_transport()
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, '%s/_search' % self.elasticsearch_url, json={})
+            transport.post('%s/_search' % self.elasticsearch_url, params={'q': 'name:*', 'scroll': None})
+            self.assertTrue(resp.calls[0].request.url.endswith('_search?q=name%3A%2A'))
+
+    def test_large_body_is_compressed(self):
+        transport = create_transport(gzip_min_size=10)
+        body = {'name': 'Atypidae' * 10}
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, '%s/_bulk' % self.elasticsearch_url, json={})
+            transport.post('%s/_bulk' % self.elasticsearch_url, json=body, compress=True)
+            request = resp.calls[0].request
+            self.assertEqual(request.headers['Content-Encoding'], 'gzip')
+            self.assertEqual(json.loads(gzip.decompress(request.body)), body)
+
+    def test_small_body_is_not_compressed(self):
+        transport = create_transport(gzip_min_size=1024)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, '%s/_bulk' % self.elasticsearch_url, json={})
+            transport.post('%s/_bulk' % self.elasticsearch_url, json={'name': 'Atypidae'}, compress=True)
+            self.assertNotIn('Content-Encoding', resp.calls[0].request.headers)
+
+    def test_body_is_not_compressed_by_default(self):
+        transport = create_transport(gzip_min_size=10)
+        with responses.RequestsMock() as resp:
+            resp.add(responses.POST, '%s/_search' % self.elasticsearch_url, json={})
+            transport.post('%s/_search' % self.elasticsearch_url, json={'query': {'match_all': {}}})
+            self.assertNotIn('Content-Encoding', resp.calls[0].request.headers)
+
+    def http2_transport(self, handler, **options):
+        transport = create_transport('http2', **options)
+        # Requests are answered by the handler instead of a server
+        transport.client = httpx.Client(transport=httpx.MockTransport(handler))
+        return transport
+
+    def test_http2_backend(self):
+        self.assertIsInstance(create_transport('http2'), Http2Transport)
+
+    def test_http2_transport_returns_requests_responses(self):
+        transport = self.http2_transport(lambda request: httpx.Response(200, json={'name': 'Atypidae'}))
+        response = transport.get('%s/_doc/1' % self.elasticsearch_url)
+        self.assertIsInstance(response, requests.Response)
+        self.assertTrue(response.ok)
+        self.assertEqual(response.json(), {'name': 'Atypidae'})
+
+    def test_http2_transport_sends_params_body_and_cookies(self):
+        requests_sent = []
+
+        def handler(request):
+            requests_sent.append(request)
+            return httpx.Response(200, json={})
+        transport = self.http2_transport(handler)
+        transport.post('%s/_search' % self.elasticsearch_url, params={'q': 'name:*', 'scroll': None},
+                       json={'size': 10}, cookies={'_ds_session_id': 'Atypidae'})
+        request = requests_sent[0]
+        self.assertEqual(dict(request.url.params), {'q': 'name:*'})
+        self.assertEqual(json.loads(request.content), {'size': 10})
+        self.assertEqual(request.headers['Cookie'], '_ds_session_id=Atypidae')
+
+    def test_http2_transport_drops_encoding_of_decoded_bodies(self):
+        body = json.dumps({'name': 'Atypidae' * 100}).encode('utf-8')
+        compressed = gzip.compress(body)
+        headers = {'Content-Encoding': 'gzip', 'Content-Length': str(len(compressed))}
+        transport = self.http2_transport(lambda request: httpx.Response(200, headers=headers, content=compressed))
+        response = transport.get('%s/_search' % self.elasticsearch_url)
+        self.assertEqual(response.content, body)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertNotIn('Content-Length', response.headers)
+
+    def test_http2_transport_streams_raw_bodies(self):
+        body = b'%PDF' + b'0' * 100000
+        chunks = [body[start:start + 4096] for start in range(0, len(body), 4096)]
+        transport = self.http2_transport(lambda request: httpx.Response(200, content=iter(chunks)))
+        response = transport.get('%s/api/documents/src/1' % self.elasticsearch_url, stream=True)
+        self.assertEqual(response.raw.read(4), b'%PDF')
+        self.assertEqual(b''.join(response.iter_content(1000)), body[4:])
+
+    def test_http2_transport_translates_errors(self):
+        def handler(request):
+            raise httpx.ConnectError('Connection refused', request=request)
+        transport = self.http2_transport(handler, retry_policy=RetryPolicy(max_retries=0))
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            transport.get('%s/_search' % self.elasticsearch_url)